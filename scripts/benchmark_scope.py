@@ -0,0 +1,148 @@
+"""Benchmarks the compact scope of FnMiddleware against the default dict scope.
+
+First, only the mapping of the scope of an Fn call with typical OCI headers is
+timed. Then, the same Fn calls are sent in-process by fdk_asgi.testing.FnClient
+to an app that never looks at the headers and to a Starlette app reading one.
+
+    poetry run python scripts/benchmark_scope.py -n 2000 -c 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import timeit
+import typing
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.loadgen import LoadReport
+from fdk_asgi.testing import FnClient
+
+if typing.TYPE_CHECKING:
+    from fdk_asgi.types import ASGIApp, Receive, Scope, Send
+
+# as sent by the Fn agent for a call through the OCI API gateway
+FN_HEADERS = [
+    (b"host", b"localhost"),
+    (b"user-agent", b"lua-resty-http/0.16.1 (Lua) ngx_lua/10020"),
+    (b"transfer-encoding", b"chunked"),
+    (b"content-type", b"application/octet-stream"),
+    (b"date", b"Mon, 06 Nov 2023 16:44:57 GMT"),
+    (b"fn-call-id", b"01HEJRBSQ51BT0D2GZJ01EVJQE"),
+    (b"fn-deadline", b"2023-11-06T16:45:29Z"),
+    (b"fn-http-h-accept", b"*/*"),
+    (b"fn-http-h-cdn-loop", b"ptAeOAHRrYjjOEF75MRX6w"),
+    (b"fn-http-h-content-type", b"application/octet-stream"),
+    (b"fn-http-h-forwarded", b"for=123.123.123.123"),
+    (b"fn-http-h-host", b"example.apigateway.eu-frankfurt-1.oci.customer-oci.com"),
+    (b"fn-http-h-user-agent", b"curl/7.81.0"),
+    (b"fn-http-h-x-forwarded-for", b"123.123.123.123"),
+    (b"fn-http-h-x-real-ip", b"123.123.123.123"),
+    (b"fn-http-method", b"GET"),
+    (b"fn-http-request-url", b"/"),
+    (b"fn-intent", b"httprequest"),
+    (b"fn-invoke-type", b"sync"),
+    (b"oci-subject-compartment-id", b"ocid1.compartment.oc1..aaa"),
+    (b"oci-subject-id", b"ocid1.apigateway.oc1.eu-frankfurt-1.ama"),
+    (b"oci-subject-tenancy-id", b"ocid1.tenancy.oc1..aaa"),
+    (b"oci-subject-type", b"resource"),
+    (b"opc-request-id", b"/44F/Q4D"),
+    (b"x-content-sha256", b"47DEQpj8HBSa+/TImW+5JCeuQeRkm5NMpJWZG3hSuFU="),
+    (b"accept-encoding", b"gzip"),
+]
+
+
+def fn_scope() -> dict[str, typing.Any]:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "server": ("127.0.0.1", 8080),
+        "client": ("127.0.0.1", 54321),
+        "scheme": "http",
+        "root_path": "",
+        "headers": FN_HEADERS,
+        "state": {},
+        "method": "POST",
+        "path": "/call",
+        "raw_path": b"/call",
+        "query_string": b"",
+    }
+
+
+async def raw_app(scope: Scope, receive: Receive, send: Send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"Hello, world!"})
+
+
+async def starlette_app(scope: Scope, receive: Receive, send: Send) -> None:
+    request = Request(scope, receive)
+    await PlainTextResponse(request.headers["user-agent"])(scope, receive, send)
+
+
+APPS = {"headers not read": raw_app, "Starlette, headers read": starlette_app}
+
+
+def benchmark_mapping(*, compact_scope: bool, number: int) -> float:
+    """Returns the microseconds needed to map the scope of one Fn call."""
+    fn_app = FnMiddleware(raw_app, compact_scope=compact_scope)
+    seconds = timeit.timeit(lambda: fn_app._map_http_scope(fn_scope()), number=number)
+    return seconds / number * 1e6
+
+
+async def benchmark(
+    app: ASGIApp, *, compact_scope: bool, requests: int, concurrency: int
+) -> LoadReport:
+    report = LoadReport()
+    semaphore = asyncio.Semaphore(concurrency)
+    fn_app = FnMiddleware(app, compact_scope=compact_scope)
+    async with FnClient(fn_app, lifespan=False) as client:
+
+        async def send() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.call(FN_HEADERS)
+                if response.status == 200:
+                    report.latencies.append(time.perf_counter() - started)
+                else:
+                    report.errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send() for _ in range(requests)))
+        report.duration = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    scopes = {"dict": False, "compact": True}
+
+    print("mapping the scope only:")  # noqa: T201
+    for name, compact_scope in scopes.items():
+        microseconds = benchmark_mapping(
+            compact_scope=compact_scope, number=args.requests * 10
+        )
+        print(f"  {name:<8} {microseconds:.2f} µs per call")  # noqa: T201
+    for workload, app in APPS.items():
+        print(f"{workload}:")  # noqa: T201
+        for name, compact_scope in scopes.items():
+            report = asyncio.run(
+                benchmark(
+                    app,
+                    compact_scope=compact_scope,
+                    requests=args.requests,
+                    concurrency=args.concurrency,
+                )
+            )
+            print(f"  {name:<8} {report.summary()}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmarks fdk_asgi.wsgi.WSGIBridge against common third-party WSGI adapters.
+
+Each adapter wraps the same WSGI app in a FnMiddleware and is sent Fn calls
+in-process by fdk_asgi.testing.FnClient, so only the adapters themselves differ.
+Adapters that are not installed are skipped.
+
+    poetry run python scripts/benchmark_wsgi.py -n 500 -c 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import time
+import typing
+
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.loadgen import LoadReport
+from fdk_asgi.testing import FnClient
+from fdk_asgi.wsgi import WSGIBridge
+
+CHUNK = b"x" * 65536
+PAYLOAD = CHUNK * 16  # 1 MiB
+
+ADAPTERS = {
+    "fdk_asgi.wsgi": "fdk_asgi.wsgi:WSGIBridge",
+    "a2wsgi": "a2wsgi:WSGIMiddleware",
+    "asgiref": "asgiref.wsgi:WsgiToAsgi",
+    "starlette": "starlette.middleware.wsgi:WSGIMiddleware",
+    "uvicorn": "uvicorn.middleware.wsgi:WSGIMiddleware",
+}
+WORKLOADS = {
+    "small": ("GET", "/small", b""),
+    "upload 1 MiB": ("POST", "/upload", PAYLOAD),
+    "download 1 MiB": ("GET", "/download", b""),
+}
+
+
+def wsgi_app(
+    environ: dict[str, typing.Any], start_response: typing.Callable[..., typing.Any]
+) -> typing.Iterable[bytes]:
+    path = environ["PATH_INFO"]
+    start_response("200 OK", [("Content-Type", "application/octet-stream")])
+    if path == "/upload":
+        size = 0
+        while chunk := environ["wsgi.input"].read(65536):
+            size += len(chunk)
+        return [str(size).encode()]
+    if path == "/download":
+        return (CHUNK for _ in range(16))
+    return [b"Hello, world!"]
+
+
+def load_adapter(name: str) -> typing.Any:
+    module_name, _, attribute = ADAPTERS[name].partition(":")
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError:
+        return None
+    adapter = getattr(module, attribute)
+    return (
+        WSGIBridge(wsgi_app, workers=8) if adapter is WSGIBridge else adapter(wsgi_app)
+    )
+
+
+async def benchmark(
+    app: typing.Any, method: str, url: str, body: bytes, requests: int, concurrency: int
+) -> LoadReport:
+    report = LoadReport()
+    semaphore = asyncio.Semaphore(concurrency)
+    async with FnClient(FnMiddleware(app), lifespan=False) as client:
+
+        async def send() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.request(method, url, content=body)
+                if response.status == 200:
+                    report.latencies.append(time.perf_counter() - started)
+                else:
+                    report.errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send() for _ in range(requests)))
+        report.duration = time.perf_counter() - started
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    for workload, (method, url, body) in WORKLOADS.items():
+        print(f"{workload}:")  # noqa: T201
+        for name in ADAPTERS:
+            app = load_adapter(name)
+            if app is None:
+                print(f"  {name:<14} not installed")  # noqa: T201
+                continue
+            report = asyncio.run(
+                benchmark(app, method, url, body, args.requests, args.concurrency)
+            )
+            print(f"  {name:<14} {report.summary()}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
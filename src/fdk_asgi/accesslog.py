@@ -0,0 +1,220 @@
+"""An access log sink writing fixed-size binary records into a memory-mapped
+ring buffer, which costs next to nothing per request.
+
+The buffer file starts with a header holding MAGIC, the capacity,
+the record size and the total number of records written so far.
+Routes are stored only once, in a sidecar file with one route per line,
+and records refer to them by their line number."""
+
+from __future__ import annotations
+
+import mmap
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from fdk_asgi.types import Scope
+
+MAGIC = b"FDKALOG\x01"
+METHODS = ("GET", "HEAD", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "CONNECT")
+OTHER_METHOD = 255
+OTHER_ROUTE = 0xFFFFFFFF
+
+# magic, capacity, record size, total number of records written
+_HEADER = struct.Struct("<8sIIQ")
+_POSITION = struct.Struct("<Q")
+_POSITION_OFFSET = 16
+# timestamp, latency, status, method id, route id
+_RECORD = struct.Struct("<dfHBxI")
+_METHOD_IDS = {method: index for index, method in enumerate(METHODS)}
+
+
+def routes_path(path: Path) -> Path:
+    return path.with_name(path.name + ".routes")
+
+
+def route_of(scope: Scope) -> str:
+    """Returns the route of a request, e.g. /users/{username} instead of /users/foo.
+
+    That is the template of the matched route if the router puts the route into
+    the scope (like FastAPI does). Otherwise, the value of each path parameter
+    is replaced by its name where it first occurs as whole segments of the path."""
+    path: str = scope["path"]
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if isinstance(template, str):
+        # the route of a mounted app is relative to the mount
+        root_path: str = scope.get("route_root_path", scope.get("root_path", ""))
+        return (root_path if path.startswith(root_path) else "") + template
+
+    path_params = scope.get("path_params")
+    if not path_params:
+        return path
+    segments = path.split("/")
+    for name, value in path_params.items():
+        value_segments = str(value).split("/")
+        if value_segments == [""]:
+            continue
+        length = len(value_segments)
+        for index in range(1, len(segments) - length + 1):
+            if segments[index : index + length] == value_segments:
+                segments[index : index + length] = [f"{{{name}}}"]
+                break
+    return "/".join(segments)
+
+
+class AccessLogBuffer:
+    """Writes access log records into a memory-mapped ring buffer,
+    overwriting the oldest records once capacity records were written.
+
+    An existing buffer of the same capacity is continued."""
+
+    def __init__(
+        self, path: Path, *, capacity: int = 65536, max_routes: int = 4096
+    ) -> None:
+        self.path = path
+        self.capacity = capacity
+        self.max_routes = max_routes
+        self.routes: dict[str, int] = {}
+
+        size = _HEADER.size + capacity * _RECORD.size
+        with path.open("a+b") as file:
+            file.seek(0)
+            header = file.read(_HEADER.size)
+            reuse = len(header) == _HEADER.size and _HEADER.unpack(header)[:3] == (
+                MAGIC,
+                capacity,
+                _RECORD.size,
+            )
+            if not reuse:
+                file.truncate(0)
+            file.truncate(size)
+            self._mmap = mmap.mmap(file.fileno(), size)
+
+        if reuse:
+            (self.position,) = _POSITION.unpack_from(self._mmap, _POSITION_OFFSET)
+            self.routes = {
+                route: index for index, route in enumerate(read_routes(path))
+            }
+        else:
+            self.position = 0
+            _HEADER.pack_into(self._mmap, 0, MAGIC, capacity, _RECORD.size, 0)
+        self._routes_file = routes_path(path).open("ab" if reuse else "wb", buffering=0)
+
+    def record(self, scope: Scope, status: int, latency: float) -> None:
+        route = route_of(scope)
+        route_id = self.routes.get(route)
+        if route_id is None:
+            route_id = self._add_route(route)
+        slot = self.position % self.capacity
+        _RECORD.pack_into(
+            self._mmap,
+            _HEADER.size + slot * _RECORD.size,
+            time.time(),
+            latency,
+            status,
+            _METHOD_IDS.get(scope["method"], OTHER_METHOD),
+            route_id,
+        )
+        self.position += 1
+        _POSITION.pack_into(self._mmap, _POSITION_OFFSET, self.position)
+
+    def _add_route(self, route: str) -> int:
+        if len(self.routes) >= self.max_routes or "\n" in route:
+            return OTHER_ROUTE
+        self._routes_file.write(route.encode() + b"\n")
+        self.routes[route] = route_id = len(self.routes)
+        return route_id
+
+    def close(self) -> None:
+        if not self._mmap.closed:
+            self._mmap.close()
+            self._routes_file.close()
+
+
+@dataclass(frozen=True)
+class AccessRecord:
+    """A decoded access log record. Times are in seconds."""
+
+    timestamp: float
+    latency: float
+    status: int
+    method: str
+    route: str
+
+    def __str__(self) -> str:
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(self.timestamp))
+        return (
+            f"{timestamp} {self.status} {self.latency * 1000:8.2f} ms "
+            f"{self.method} {self.route}"
+        )
+
+
+def read_routes(path: Path) -> list[str]:
+    try:
+        data = routes_path(path).read_bytes()
+    except FileNotFoundError:
+        return []
+    # skip an incomplete last line
+    return [line.decode() for line in data.split(b"\n")[:-1]]
+
+
+def read_access_log(path: Path, *, since: int = 0) -> tuple[int, list[AccessRecord]]:
+    """Returns the total number of records written so far and all records
+    written after the first since records that were not overwritten yet.
+
+    Records being written while reading may be inconsistent."""
+    data = path.read_bytes()
+    magic, capacity, record_size, position = _HEADER.unpack_from(data)
+    if magic != MAGIC or record_size != _RECORD.size:
+        msg = f"{path} is not an access log buffer."
+        raise ValueError(msg)
+
+    routes = read_routes(path)
+    records = []
+    for index in range(max(since, position - capacity), position):
+        timestamp, latency, status, method_id, route_id = _RECORD.unpack_from(
+            data, _HEADER.size + index % capacity * _RECORD.size
+        )
+        records.append(
+            AccessRecord(
+                timestamp=timestamp,
+                latency=latency,
+                status=status,
+                method=METHODS[method_id] if method_id < len(METHODS) else "OTHER",
+                route=routes[route_id] if route_id < len(routes) else "<other>",
+            )
+        )
+    return position, records
+
+
+@dataclass
+class RouteSummary:
+    method: str
+    route: str
+    latencies: list[float]
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies)
+
+
+def summarize(records: Iterable[AccessRecord]) -> list[RouteSummary]:
+    """Groups records by method and route, busiest routes first.
+    Responses with a status of 500 and above count as errors."""
+    summaries: dict[tuple[str, str], RouteSummary] = {}
+    for record in records:
+        key = (record.method, record.route)
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = RouteSummary(record.method, record.route, [])
+        summary.latencies.append(record.latency)
+        if record.status >= 500:
+            summary.errors += 1
+    for summary in summaries.values():
+        summary.latencies.sort()
+    return sorted(summaries.values(), key=lambda summary: -summary.requests)
@@ -0,0 +1,159 @@
+"""A stand-in for the Fn agent, talking to a function over its unix socket."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Tuple
+
+from httptools import HttpResponseParser
+
+from fdk_asgi.app import (
+    FN_HTTP_H_,
+    FN_HTTP_REQUEST_METHOD,
+    FN_HTTP_REQUEST_URL,
+    FN_HTTP_STATUS,
+)
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def to_fn_headers(
+    method: str, url: bytes, headers: Iterable[tuple[bytes, bytes]]
+) -> Headers:
+    """Maps the headers of a regular HTTP request to those of an Fn call,
+    i.e. does the reverse of what FnMiddleware does to requests."""
+    fn_headers = [
+        (FN_HTTP_REQUEST_URL, url),
+        (FN_HTTP_REQUEST_METHOD, method.encode()),
+    ]
+    for key, value in headers:
+        if key.lower() == b"content-type":
+            fn_headers.append((key, value))
+        else:
+            fn_headers.append((FN_HTTP_H_ + key, value))
+    return fn_headers
+
+
+def from_fn_headers(
+    fn_headers: Iterable[tuple[bytes, bytes]],
+) -> tuple[int | None, Headers]:
+    """Maps the headers of an Fn call response to those of a regular HTTP response,
+    i.e. does the reverse of what FnMiddleware does to responses.
+    Returns the original status code (if any) and the unprefixed headers."""
+    status = None
+    headers = []
+    for key, value in fn_headers:
+        key_lower = key.lower()
+        if key_lower == FN_HTTP_STATUS:
+            status = int(value)
+        elif key_lower.startswith(FN_HTTP_H_):
+            headers.append((key[len(FN_HTTP_H_) :], value))
+        elif key_lower == b"content-type":
+            headers.append((key, value))
+    return status, headers
+
+
+@dataclass
+class FnRequest:
+    """A regular HTTP request that is sent to a function as an Fn call."""
+
+    method: str
+    url: bytes
+    headers: Headers = field(default_factory=list)
+    body: bytes = b""
+
+    @classmethod
+    def parse(cls, line: str) -> FnRequest:
+        """Parses requests like "GET /users" or "POST /users {...}"."""
+        method, url, *body = line.split(" ", 2)
+        return cls(method.upper(), url.encode(), body=body[0].encode() if body else b"")
+
+    def to_fn_headers(self) -> Headers:
+        headers = to_fn_headers(self.method, self.url, self.headers)
+        headers.append((b"content-length", str(len(self.body)).encode()))
+        return headers
+
+
+@dataclass
+class FnResponse:
+    """The response to an Fn call, with the original status and headers restored."""
+
+    fn_status: int
+    status: int
+    headers: Headers
+    body: bytes
+
+    @property
+    def text(self) -> str:
+        return self.body.decode()
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def get_header(self, name: str, default: str | None = None) -> str | None:
+        """Returns the first value of a header, looked up case-insensitively."""
+        key = name.lower().encode()
+        for raw_key, value in self.headers:
+            if raw_key.lower() == key:
+                return value.decode("latin-1")
+        return default
+
+
+class _ResponseParser:
+    def __init__(self) -> None:
+        self.parser = HttpResponseParser(self)
+        self.headers: Headers = []
+        self.body = bytearray()
+        self.complete = False
+
+    def on_header(self, name: bytes, value: bytes) -> None:
+        self.headers.append((name, value))
+
+    def on_body(self, body: bytes) -> None:
+        self.body += body
+
+    def on_message_complete(self) -> None:
+        self.complete = True
+
+
+class AgentConnection:
+    """A keep-alive connection to a function, sending Fn calls like the Fn agent."""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, path: str) -> AgentConnection:
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def call(self, request: FnRequest) -> FnResponse:
+        head = [b"POST /call HTTP/1.1", b"host: localhost"]
+        head.extend(key + b": " + value for key, value in request.to_fn_headers())
+        self.writer.write(b"\r\n".join(head) + b"\r\n\r\n" + request.body)
+
+        response = _ResponseParser()
+        while not response.complete:
+            data = await self.reader.read(65536)
+            if not data:
+                msg = "Connection closed before the response was complete."
+                raise ConnectionError(msg)
+            response.parser.feed_data(data)
+
+        fn_status = response.parser.get_status_code()
+        status, headers = from_fn_headers(response.headers)
+        return FnResponse(
+            fn_status=fn_status,
+            status=fn_status if status is None else status,
+            headers=headers,
+            body=bytes(response.body),
+        )
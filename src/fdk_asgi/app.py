@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from functools import partial
 from http import HTTPStatus
-from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable
 
 from httptools import parse_url
 
+from fdk_asgi import __version__
 from fdk_asgi.exceptions import (
     FnMiddlewareError,
     MethodNotAllowedError,
@@ -13,12 +18,27 @@ from fdk_asgi.exceptions import (
     MissingUrlError,
     PathNotFoundError,
 )
-from fdk_asgi.types import ASGIApp, Receive, Scope, Send
+from fdk_asgi.scope import CompactScope
 from fdk_asgi.utils import get_client_addr, get_path_with_query_string
 
+if TYPE_CHECKING:
+    from fdk_asgi.accesslog import AccessLogBuffer
+    from fdk_asgi.batch import BatchHandler
+    from fdk_asgi.body import BodyBuffering
+    from fdk_asgi.capture import TrafficCapture
+    from fdk_asgi.cors import CORSPolicy
+    from fdk_asgi.deferred import DeferredWork
+    from fdk_asgi.gc_policy import GCPolicy
+    from fdk_asgi.headers import HeaderPolicy
+    from fdk_asgi.pools import PoolRegistry
+    from fdk_asgi.ratelimit import RateLimiter
+    from fdk_asgi.static import StaticAssets
+    from fdk_asgi.tracing import Tracer
+    from fdk_asgi.types import ASGIApp, Message, Receive, Scope, Send
+
 FN_FDK_VERSION_HEADER = (
     b"fn-fdk-version",
-    f"fdk-asgi/{version(__package__)}".encode(),
+    f"fdk-asgi/{__version__}".encode(),
 )
 
 FN_HTTP_H_ = b"fn-http-h-"
@@ -31,6 +51,12 @@ FN_ALLOWED_RESPONSE_CODES = [
     HTTPStatus.GATEWAY_TIMEOUT,
 ]
 
+# see https://asgi.readthedocs.io/en/latest/extensions.html#path-send
+PATHSEND = "http.response.pathsend"
+PATHSEND_CHUNK_SIZE = 65536
+# advertised if the server does not support path send itself
+_EMULATED_PATHSEND: dict[str, Any] = {}
+
 logger = logging.getLogger(__name__)
 logger_access = logging.getLogger(f"{__package__}.access")
 
@@ -39,16 +65,82 @@ class FnMiddleware:
     """A pure ASGI middleware, wrapping a regular ASGI application
     and translating Fn <-> REST."""
 
-    def __init__(self, app: ASGIApp, prefix: str = "") -> None:
+    def __init__(
+        self,
+        app: ASGIApp,
+        prefix: str = "",
+        *,
+        gc_policy: GCPolicy | None = None,
+        capture: TrafficCapture | None = None,
+        access_log: AccessLogBuffer | None = None,
+        batch: BatchHandler | None = None,
+        static: StaticAssets | None = None,
+        request_body: BodyBuffering | None = None,
+        header_policy: HeaderPolicy | None = None,
+        rate_limit: RateLimiter | None = None,
+        deferred: DeferredWork | None = None,
+        tracing: Tracer | None = None,
+        cors: CORSPolicy | None = None,
+        pools: PoolRegistry | None = None,
+        compact_scope: bool = False,
+    ) -> None:
         self.app = app
         self.prefix = prefix
+        self.gc_policy = gc_policy
+        self.capture = capture
+        self.access_log = access_log
+        self.batch = batch
+        self.static = static
+        self.request_body = request_body
+        self.header_policy = header_policy
+        self.rate_limit = rate_limit
+        self.deferred = deferred
+        self.tracing = tracing
+        self.cors = cors
+        self.pools = pools
+        self.compact_scope = compact_scope
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan" and (
+            self.gc_policy is not None
+            or self.capture is not None
+            or self.header_policy is not None
+            or self.deferred is not None
+            or self.tracing is not None
+            or self.pools is not None
+        ):
+            if self.pools is not None:
+                self.pools.add_to_state(scope)
+            return await self.app(scope, receive, self._wrap_lifespan_send(send))
+
         # leave all but HTTP connection scopes untouched
         # note that websockets are not supported by fn
         if scope["type"] != "http":
             return await self.app(scope, receive, send)
 
+        if self.gc_policy is None and self.pools is None:
+            return await self._handle_http(scope, receive, send)
+
+        if self.gc_policy is not None:
+            self.gc_policy.request_started()
+        if self.pools is not None:
+            self.pools.request_started()
+        try:
+            await self._handle_http(scope, receive, send)
+        finally:
+            if self.gc_policy is not None:
+                self.gc_policy.request_finished()
+            if self.pools is not None:
+                self.pools.request_finished()
+
+    async def _handle_http(self, scope: Scope, receive: Receive, send: Send) -> None:
+        recorder = None
+        if self.capture is not None and self.capture.sample():
+            recorder = self.capture.recorder(scope)
+            receive = recorder.wrap_receive(receive)
+            send = recorder.wrap_send(send)
+
+        fn_headers = scope["headers"]
         try:
             mapped_scope = self._map_http_scope(scope)
         except FnMiddlewareError as exception:
@@ -71,7 +163,41 @@ class FnMiddleware:
                 }
             )
             return
-        await self.app(mapped_scope, receive, self._wrap_send(send, scope))
+        if recorder is not None:
+            recorder.set_mapped_scope(mapped_scope)
+        send = self._wrap_send(send, mapped_scope)
+        if self.tracing is not None:
+            return await self.tracing.handle(
+                mapped_scope, fn_headers, receive, send, call=self._dispatch
+            )
+        await self._dispatch(mapped_scope, fn_headers, receive, send)
+
+    async def _dispatch(
+        self,
+        scope: Scope,
+        fn_headers: list[tuple[bytes, bytes]],
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        """Passes a mapped request on to the stage handling it, or else to the app."""
+        if self.rate_limit is not None and not await self.rate_limit.admit(scope, send):
+            return None
+        if self.cors is not None and self.cors.is_preflight(scope):
+            return await self.cors.send_preflight(scope, send)
+        if self.static is not None:
+            asset = self.static.lookup(scope)
+            if asset is not None:
+                return await self.static.send(asset, scope, fn_headers, send)
+        if self.batch is not None and self.batch.matches(scope):
+            return await self.batch.handle(scope, receive, send, call=self._handle_http)
+        app = (
+            self.app
+            if self.deferred is None
+            else partial(self.deferred.handle, app=self.app)
+        )
+        if self.request_body is not None:
+            return await self.request_body.handle(scope, receive, send, app)
+        await app(scope, receive, send)
 
     def _map_http_scope(self, scope: Scope) -> Scope:
         """Transforms headers etc. sent by Fn/API Gateway
@@ -84,19 +210,20 @@ class FnMiddleware:
         if scope["method"] != "POST":
             raise MethodNotAllowedError()
 
-        http_headers = []
-        request_url: bytes | None = None
-        request_method: bytes | None = None
-        for key, value in scope["headers"]:
-            key_lower = key.lower()
-            if key_lower.startswith(FN_HTTP_H_):
-                http_headers.append((key[len(FN_HTTP_H_) :], value))
-            elif key_lower == FN_HTTP_REQUEST_URL:
-                request_url = value
-            elif key_lower == FN_HTTP_REQUEST_METHOD:
-                request_method = value
-            else:
-                http_headers.append((key, value))
+        fn_headers = scope["headers"]
+        if self.compact_scope and self.header_policy is None:
+            scope = CompactScope(scope)
+            # translated once the headers are looked up for the first time
+            scope.defer_headers(lambda: self._map_headers(fn_headers)[0])
+            request_url, request_method = find_request_target(fn_headers)
+        else:
+            if self.compact_scope:
+                # filtered right away, so that the stats and errors of the header
+                # policy are not attributed to the app looking up the headers
+                scope = CompactScope(scope)
+            scope["headers"], request_url, request_method = self._map_headers(
+                fn_headers
+            )
 
         try:
             parsed_url = parse_url(request_url)
@@ -115,15 +242,108 @@ class FnMiddleware:
         scope["query_string"] = parsed_url.query or b""  # byte-string
         # scope has precedence over environment variable
         scope["root_path"] = self.prefix
-        scope["headers"] = http_headers
+        self._add_extensions(scope)
 
         return scope
 
+    def _map_headers(
+        self, headers: Iterable[tuple[bytes, bytes]]
+    ) -> tuple[list[tuple[bytes, bytes]], bytes | None, bytes | None]:
+        """Splits the headers of an Fn call into those of the HTTP request
+        (filtered by the header policy, if any), its URL and its method."""
+        header_filter = (
+            None if self.header_policy is None else self.header_policy.filter()
+        )
+        http_headers = []
+        request_url: bytes | None = None
+        request_method: bytes | None = None
+        for key, value in headers:
+            key_lower = key.lower()
+            if key_lower == FN_HTTP_REQUEST_URL:
+                request_url = value
+                continue
+            if key_lower == FN_HTTP_REQUEST_METHOD:
+                request_method = value
+                continue
+            if key_lower.startswith(FN_HTTP_H_):
+                key = key[len(FN_HTTP_H_) :]
+                key_lower = key_lower[len(FN_HTTP_H_) :]
+            if header_filter is None:
+                http_headers.append((key, value))
+            else:
+                header_filter.add(key, key_lower, value)
+
+        if header_filter is not None:
+            http_headers = header_filter.finish()
+        return http_headers, request_url, request_method
+
     @staticmethod
-    def _wrap_send(send: Send, scope: Scope) -> Send:
+    def _add_extensions(scope: Scope) -> None:
+        """Advertises the ASGI extensions that FnMiddleware emulates
+        if the server does not support them."""
+        extensions = scope.get("extensions") or {}
+        if PATHSEND not in extensions:
+            scope["extensions"] = {**extensions, PATHSEND: _EMULATED_PATHSEND}
+
+    def _wrap_lifespan_send(self, send: Send) -> Send:
+        async def wrapped_send(message: Message) -> None:
+            if message["type"] == "lifespan.startup.complete":
+                await self._startup_complete()
+            elif message["type"] == "lifespan.shutdown.complete":
+                await self._shutdown_complete()
+            await send(message)
+
+        return wrapped_send
+
+    async def _startup_complete(self) -> None:
+        """Prepares the stages once the app started, before any call is accepted."""
+        if self.gc_policy is not None:
+            self.gc_policy.startup_complete()
+        if self.pools is not None:
+            await self.pools.open()
+
+    async def _shutdown_complete(self) -> None:
+        """Cleans up the stages and logs their stats once the app shut down."""
+        if self.gc_policy is not None:
+            self.gc_policy.uninstall()
+            self.gc_policy.log_stats()
+        if self.capture is not None:
+            self.capture.close()
+            logger.info(
+                "Captured %d calls to %s.", self.capture.captured, self.capture.path
+            )
+        if self.header_policy is not None:
+            self.header_policy.log_stats()
+        if self.deferred is not None:
+            await self.deferred.drain()
+            self.deferred.log_stats()
+        if self.tracing is not None:
+            self.tracing.close()
+            logger.info(
+                "Exported %d spans to %s (%d dropped).",
+                self.tracing.exporter.exported,
+                self.tracing.exporter.target,
+                self.tracing.exporter.dropped,
+            )
+        if self.pools is not None:
+            await self.pools.close()
+            self.pools.log_stats()
+
+    def _wrap_send(self, send: Send, scope: Scope) -> Send:
+        access_log = self.access_log
+        started = time.perf_counter() if access_log is not None else 0.0
+        emulate_pathsend = (
+            scope.get("extensions", {}).get(PATHSEND) is _EMULATED_PATHSEND
+        )
+        cors_headers = [] if self.cors is None else self.cors.response_headers(scope)
+
         async def wrapped_send(message: Scope) -> None:
             # only process messages of type=http.response.start,
-            # leave message of other types untouched
+            # leave message of other types untouched,
+            # unless the server does not support path send
+            if message["type"] == PATHSEND and emulate_pathsend:
+                await send_file(send, message["path"])
+                return
             if message["type"] == "http.response.start":
                 new_headers = [
                     (key, value)
@@ -131,6 +351,7 @@ class FnMiddleware:
                     else (FN_HTTP_H_ + key, value)
                     for key, value in message["headers"]
                 ]
+                new_headers.extend(cors_headers)
                 new_headers.append((FN_HTTP_STATUS, str(message["status"]).encode()))
                 new_headers.append(FN_FDK_VERSION_HEADER)
 
@@ -140,15 +361,58 @@ class FnMiddleware:
                 if message["status"] not in FN_ALLOWED_RESPONSE_CODES:
                     message["status"] = HTTPStatus.OK
 
-                logger_access.info(
-                    '%s - "%s %s HTTP/%s" %d',
-                    get_client_addr(scope),
-                    scope["method"],
-                    get_path_with_query_string(scope),
-                    scope["http_version"],
-                    original_status_code,
-                )
+                if access_log is not None:
+                    access_log.record(
+                        scope, original_status_code, time.perf_counter() - started
+                    )
+                else:
+                    logger_access.info(
+                        '%s - "%s %s HTTP/%s" %d',
+                        get_client_addr(scope),
+                        scope["method"],
+                        get_path_with_query_string(scope),
+                        scope["http_version"],
+                        original_status_code,
+                    )
 
             await send(message)
 
         return wrapped_send
+
+
+def find_request_target(
+    headers: Iterable[tuple[bytes, bytes]],
+) -> tuple[bytes | None, bytes | None]:
+    """Returns the URL and the method of the HTTP request of an Fn call."""
+    request_url: bytes | None = None
+    request_method: bytes | None = None
+    # ASGI servers lowercase header names, so this is usually enough
+    for key, value in headers:
+        if key == FN_HTTP_REQUEST_URL:
+            request_url = value
+        elif key == FN_HTTP_REQUEST_METHOD:
+            request_method = value
+    if request_url is not None and request_method is not None:
+        return request_url, request_method
+    for key, value in headers:
+        key_lower = key.lower()
+        if key_lower == FN_HTTP_REQUEST_URL:
+            request_url = value
+        elif key_lower == FN_HTTP_REQUEST_METHOD:
+            request_method = value
+    return request_url, request_method
+
+
+async def send_file(
+    send: Send, path: str, chunk_size: int = PATHSEND_CHUNK_SIZE
+) -> None:
+    """Sends a file as response body in chunks, so that memory usage stays constant
+    no matter its size. Reads it in the default executor of the event loop."""
+    loop = asyncio.get_running_loop()
+    file = await loop.run_in_executor(None, Path(path).open, "rb")
+    try:
+        while chunk := await loop.run_in_executor(None, file.read, chunk_size):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    finally:
+        await loop.run_in_executor(None, file.close)
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,265 @@
+"""Running many logical requests within a single Fn call.
+
+A batch call is a POST request to the batch path with a JSON envelope like
+
+    {"requests": [{"method": "GET", "url": "/users", "headers": {...}, "body": ""}]}
+
+Headers may also be given as a list of [name, value] pairs. Bodies must be
+strings, e.g. JSON documents encoded as such, binary bodies are given as
+"body_base64" instead of "body".
+Each item is mapped and handled like an Fn call of its own,
+inheriting the headers of the batch call unless it overrides them.
+The response is an envelope like
+
+    {"responses": [{"status": 200, "headers": [[name, value]], "body": "..."}]}
+
+in the order of the requests, with "body_base64" for bodies that are not UTF-8."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import json
+import logging
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+
+from fdk_asgi.agent import Headers, from_fn_headers, to_fn_headers
+from fdk_asgi.app import PATHSEND
+
+if TYPE_CHECKING:
+    from fdk_asgi.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# marks the scopes of batch items
+BATCH_ITEM = "fdk_asgi.batch_item"
+
+# headers of the batch call that items do not inherit
+_NOT_INHERITED = frozenset({b"content-length", b"content-type", b"transfer-encoding"})
+
+
+class BatchError(Exception):
+    def __init__(self, msg: str, code: HTTPStatus = HTTPStatus.BAD_REQUEST) -> None:
+        super().__init__(msg)
+        self.code = code
+
+
+class BatchItem:
+    """A single logical request of a batch."""
+
+    def __init__(self, method: str, url: bytes, headers: Headers, body: bytes) -> None:
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+
+    @classmethod
+    def from_json(cls, item: Any) -> BatchItem:
+        if not isinstance(item, dict) or not isinstance(item.get("url"), str):
+            msg = "Each request needs at least a url."
+            raise BatchError(msg)
+        headers = item.get("headers") or {}
+        pairs = headers.items() if isinstance(headers, dict) else headers
+        if not isinstance(item.get("body", ""), str):
+            msg = "The body of a request must be a string, use body_base64 for bytes."
+            raise BatchError(msg)
+        try:
+            body = (
+                base64.b64decode(item["body_base64"], validate=True)
+                if "body_base64" in item
+                else item.get("body", "").encode()
+            )
+            return cls(
+                method=str(item.get("method", "GET")).upper(),
+                url=item["url"].encode(),
+                headers=[
+                    (str(key).lower().encode(), str(value).encode("latin-1"))
+                    for key, value in pairs
+                ],
+                body=body,
+            )
+        except (binascii.Error, ValueError, TypeError) as exception:
+            msg = f"Invalid request: {exception}"
+            raise BatchError(msg) from None
+
+
+class BatchHandler:
+    """Handles batch calls on behalf of an FnMiddleware.
+
+    At most concurrency items of a batch are handled at the same time."""
+
+    def __init__(
+        self, path: str = "/_batch", *, concurrency: int = 10, max_items: int = 100
+    ) -> None:
+        self.path = path
+        self.concurrency = concurrency
+        self.max_items = max_items
+
+    def matches(self, scope: Scope) -> bool:
+        return bool(scope["path"] == self.path)
+
+    async def handle(
+        self, scope: Scope, receive: Receive, send: Send, *, call: ASGIApp
+    ) -> None:
+        """Handles an already mapped batch call.
+        Items are passed to call as Fn calls of their own."""
+        try:
+            items = await self._read_items(scope, receive)
+        except BatchError as exception:
+            await _send_response(
+                send, exception.code, b"text/plain", str(exception).encode()
+            )
+            return
+
+        inherited = [
+            (key, value)
+            for key, value in scope["headers"]
+            if key.lower() not in _NOT_INHERITED
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(item: BatchItem) -> dict[str, Any]:
+            async with semaphore:
+                return await self._run_item(call, scope, inherited, item)
+
+        responses = await asyncio.gather(*(run(item) for item in items))
+        await _send_response(
+            send,
+            HTTPStatus.OK,
+            b"application/json",
+            json.dumps({"responses": responses}).encode(),
+        )
+
+    async def _read_items(self, scope: Scope, receive: Receive) -> list[BatchItem]:
+        if scope.get(BATCH_ITEM):
+            msg = "Nested batches are not supported."
+            raise BatchError(msg)
+        if scope["method"] != "POST":
+            msg = "Batch calls must use POST."
+            raise BatchError(msg, HTTPStatus.METHOD_NOT_ALLOWED)
+        body = await _read_body(receive)
+        try:
+            envelope = json.loads(body)
+        except ValueError:
+            msg = "The batch envelope is not valid JSON."
+            raise BatchError(msg) from None
+        requests = envelope.get("requests") if isinstance(envelope, dict) else None
+        if not isinstance(requests, list):
+            msg = 'The batch envelope needs a list of "requests".'
+            raise BatchError(msg)
+        if len(requests) > self.max_items:
+            msg = f"A batch must not have more than {self.max_items} requests."
+            raise BatchError(msg, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        return [BatchItem.from_json(item) for item in requests]
+
+    async def _run_item(
+        self,
+        call: ASGIApp,
+        batch_scope: Scope,
+        inherited: Headers,
+        item: BatchItem,
+    ) -> dict[str, Any]:
+        own = {key for key, _ in item.headers}
+        headers = [(key, value) for key, value in inherited if key not in own]
+        fn_headers = to_fn_headers(item.method, item.url, headers + item.headers)
+        fn_headers.append((b"content-length", str(len(item.body)).encode()))
+        scope = {
+            **batch_scope,
+            "method": "POST",
+            "path": "/call",
+            "raw_path": b"/call",
+            "query_string": b"",
+            "headers": fn_headers,
+            # let FnMiddleware emulate path send, as items are collected in memory
+            "extensions": {
+                key: value
+                for key, value in (batch_scope.get("extensions") or {}).items()
+                if key != PATHSEND
+            },
+            BATCH_ITEM: True,
+        }
+        item_call = _ItemCall(item.body)
+        try:
+            await call(scope, item_call.receive, item_call.send)
+        except Exception:
+            logger.exception("Exception in batch item %s %r", item.method, item.url)
+        finally:
+            item_call.response_complete.set()
+
+        start = item_call.response_start
+        if start is None:
+            return _item_response(HTTPStatus.INTERNAL_SERVER_ERROR, [], b"")
+        # errors of the Fn protocol itself come without an fn-http-status header
+        status, headers = from_fn_headers(start["headers"])
+        return _item_response(
+            start["status"] if status is None else status,
+            headers,
+            bytes(item_call.body),
+        )
+
+
+class _ItemCall:
+    def __init__(self, body: bytes) -> None:
+        self.request_body: bytes | None = body
+        self.response_start: Message | None = None
+        self.response_complete = asyncio.Event()
+        self.body = bytearray()
+
+    async def receive(self) -> Message:
+        if self.request_body is not None:
+            body, self.request_body = self.request_body, None
+            return {"type": "http.request", "body": body, "more_body": False}
+        await self.response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.response_start = message
+        elif message["type"] == "http.response.body":
+            self.body += message.get("body", b"")
+            if not message.get("more_body", False):
+                self.response_complete.set()
+
+
+def _item_response(status: int, headers: Headers, body: bytes) -> dict[str, Any]:
+    response: dict[str, Any] = {
+        "status": int(status),
+        "headers": [
+            [key.decode("latin-1"), value.decode("latin-1")] for key, value in headers
+        ],
+    }
+    try:
+        response["body"] = body.decode()
+    except UnicodeDecodeError:
+        response["body_base64"] = base64.b64encode(body).decode()
+    return response
+
+
+async def _read_body(receive: Receive) -> bytes:
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            msg = "The client disconnected."
+            raise BatchError(msg)
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return bytes(body)
+
+
+async def _send_response(
+    send: Send, status: int, content_type: bytes, body: bytes
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": int(status),
+            "headers": [
+                (b"content-type", content_type),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body, "more_body": False})
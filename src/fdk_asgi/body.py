@@ -0,0 +1,209 @@
+"""Receiving request bodies completely before passing them on to the app.
+
+Instead of a stream of chunks that frameworks join again and again,
+the app receives the whole body in one message. Bodies of a known size
+are assembled in a preallocated buffer, large bodies are spooled
+to a temporary file. As ASGI requires, the messages received by the app hold
+bytes, so they are copied once more. Apps can access the buffered body
+without that copy via the REQUEST_BODY scope extension:
+
+    body = scope["extensions"]["fdk_asgi.request_body"]["body"]
+    with body.view() as view:
+        ...
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import mmap
+import tempfile
+from typing import TYPE_CHECKING, BinaryIO, Callable, Iterator, TypeVar
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from fdk_asgi.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_BODY = "fdk_asgi.request_body"
+
+T = TypeVar("T")
+
+
+class BufferedBody:
+    """A completely received request body, held either in memory or in a file."""
+
+    def __init__(
+        self,
+        data: bytes | bytearray = b"",
+        *,
+        file: BinaryIO | None = None,
+        size: int | None = None,
+        chunk_size: int = 65536,
+    ) -> None:
+        self.data = data
+        self.file = file
+        self.size = len(data) if size is None else size
+        self.chunk_size = chunk_size
+        self._mmap: mmap.mmap | None = None
+
+    @property
+    def spooled(self) -> bool:
+        return self.file is not None
+
+    def view(self) -> memoryview:
+        """Returns a read-only view of the body, memory-mapping it if spooled."""
+        if self.file is None:
+            return memoryview(self.data).toreadonly()
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            # if still referenced by a view, it is closed once that is released
+            with contextlib.suppress(BufferError):
+                self._mmap.close()
+        if self.file is not None:
+            self.file.close()
+
+    def wrap_receive(self, receive: Receive, pending: Message | None = None) -> Receive:
+        """Returns a receive callable sending the whole body first.
+        Afterwards, pending (e.g. a disconnect) or further messages are passed on."""
+        chunks = iter(self._chunks())
+
+        async def wrapped_receive() -> Message:
+            nonlocal pending
+            chunk = next(chunks, None)
+            if chunk is not None:
+                body, more_body = chunk
+                return {"type": "http.request", "body": body, "more_body": more_body}
+            if pending is not None:
+                message, pending = pending, None
+                return message
+            return await receive()
+
+        return wrapped_receive
+
+    def _chunks(self) -> Iterator[tuple[bytes, bool]]:
+        if self.file is None or self.size == 0:
+            yield bytes(self.data), False  # not copied if already bytes
+            return
+        with self.view() as view:
+            for offset in range(0, self.size, self.chunk_size):
+                end = offset + self.chunk_size
+                yield bytes(view[offset:end]), end < self.size
+
+
+class _BodyWriter:
+    def __init__(
+        self,
+        content_length: int | None,
+        spool_threshold: int,
+        spool_directory: Path | None,
+    ) -> None:
+        self.spool_threshold = spool_threshold
+        self.spool_directory = spool_directory
+        self.size = 0
+        self.file: BinaryIO | None = None
+        self.spool = content_length is not None and content_length > spool_threshold
+        # preallocate the buffer if the final size is known
+        self.buffer = bytearray(
+            content_length if content_length is not None and not self.spool else 0
+        )
+
+    def _create_file(self) -> BinaryIO:
+        return tempfile.TemporaryFile(dir=self.spool_directory)
+
+    async def write(self, chunk: bytes) -> None:
+        end = self.size + len(chunk)
+        if self.file is None and (self.spool or end > self.spool_threshold):
+            self.file = await _run(self._create_file)
+            if self.size:
+                await _run(self.file.write, memoryview(self.buffer)[: self.size])
+            self.buffer = bytearray()
+        if self.file is not None:
+            await _run(self.file.write, chunk)
+        elif end <= len(self.buffer):
+            self.buffer[self.size : end] = chunk  # in place, without resizing
+        else:
+            # more than the content-length announced
+            del self.buffer[self.size :]
+            self.buffer += chunk
+        self.size = end
+
+    async def finish(self, chunk_size: int) -> BufferedBody:
+        if self.file is None:
+            del self.buffer[self.size :]  # shrunk in place
+            return BufferedBody(self.buffer, chunk_size=chunk_size)
+        await _run(self.file.flush)
+        return BufferedBody(file=self.file, size=self.size, chunk_size=chunk_size)
+
+
+class BodyBuffering:
+    """Receives request bodies completely before calling the app.
+
+    Bodies larger than spool_threshold bytes are spooled to a temporary file
+    in spool_directory, the app then receives them in chunks of chunk_size."""
+
+    def __init__(
+        self,
+        *,
+        spool_threshold: int = 2**20,
+        spool_directory: Path | None = None,
+        chunk_size: int = 65536,
+    ) -> None:
+        self.spool_threshold = spool_threshold
+        self.spool_directory = spool_directory
+        self.chunk_size = chunk_size
+
+    async def handle(
+        self, scope: Scope, receive: Receive, send: Send, app: ASGIApp
+    ) -> None:
+        body, pending = await self.read(scope, receive)
+        scope["extensions"] = {
+            **(scope.get("extensions") or {}),
+            REQUEST_BODY: {"body": body},
+        }
+        try:
+            await app(scope, body.wrap_receive(receive, pending), send)
+        finally:
+            body.close()
+
+    async def read(
+        self, scope: Scope, receive: Receive
+    ) -> tuple[BufferedBody, Message | None]:
+        """Receives the whole body. Also returns the message that ended
+        the body prematurely, if any (e.g. a disconnect)."""
+        message = await receive()
+        if message["type"] != "http.request":
+            return BufferedBody(chunk_size=self.chunk_size), message
+        if not message.get("more_body", False):
+            # a single chunk is used as it is
+            return BufferedBody(
+                message.get("body", b""), chunk_size=self.chunk_size
+            ), None
+
+        writer = _BodyWriter(
+            get_content_length(scope), self.spool_threshold, self.spool_directory
+        )
+        while message["type"] == "http.request":
+            await writer.write(message.get("body", b""))
+            if not message.get("more_body", False):
+                return await writer.finish(self.chunk_size), None
+            message = await receive()
+        return await writer.finish(self.chunk_size), message
+
+
+def get_content_length(scope: Scope) -> int | None:
+    for key, value in scope["headers"]:
+        if key.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _run(function: Callable[..., T], *args: object) -> T:
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
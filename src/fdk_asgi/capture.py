@@ -0,0 +1,303 @@
+"""Capturing a sample of Fn calls to replay them later, e.g. for benchmarking.
+
+Captured calls are appended to a compact binary log. It starts with MAGIC,
+followed by one record per call, each prefixed with its length."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Sequence
+
+from fdk_asgi.app import FN_HTTP_H_, FN_HTTP_REQUEST_URL, FN_HTTP_STATUS, PATHSEND
+
+if TYPE_CHECKING:
+    from fdk_asgi.agent import FnRequest, Headers
+    from fdk_asgi.loadgen import LoadReport
+    from fdk_asgi.testing import FnClient
+    from fdk_asgi.types import Message, Receive, Scope, Send
+
+MAGIC = b"FDKCAP\x01\n"
+DEFAULT_REDACTED_HEADERS = frozenset(
+    {
+        b"authorization",
+        b"cookie",
+        b"proxy-authorization",
+        b"x-api-key",
+        b"x-auth-token",
+    }
+)
+
+_LENGTH = struct.Struct("<I")
+# started, duration, status, body size, number of headers
+_RECORD = struct.Struct("<ddHIH")
+
+
+@dataclass
+class CapturedCall:
+    """A captured Fn call. The original Fn headers are kept for replaying,
+    the fields of the mapped scope for analysis. Times are in seconds."""
+
+    started: float
+    duration: float
+    status: int
+    fn_headers: Headers = field(default_factory=list)
+    method: bytes = b""
+    path: bytes = b""
+    query_string: bytes = b""
+    root_path: bytes = b""
+    body: bytes = b""
+    body_size: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.body) < self.body_size
+
+    def to_bytes(self) -> bytes:
+        fields = [self.method, self.path, self.query_string, self.root_path, self.body]
+        for key, value in self.fn_headers:
+            fields.extend((key, value))
+        parts = [
+            _RECORD.pack(
+                self.started,
+                self.duration,
+                self.status,
+                self.body_size,
+                len(self.fn_headers),
+            )
+        ]
+        for value in fields:
+            parts.extend((_LENGTH.pack(len(value)), value))
+        record = b"".join(parts)
+        return _LENGTH.pack(len(record)) + record
+
+    @classmethod
+    def from_bytes(cls, record: bytes) -> CapturedCall:
+        started, duration, status, body_size, header_count = _RECORD.unpack_from(record)
+        offset = _RECORD.size
+        fields = []
+        while offset < len(record):
+            (length,) = _LENGTH.unpack_from(record, offset)
+            offset += _LENGTH.size
+            fields.append(record[offset : offset + length])
+            offset += length
+        method, path, query_string, root_path, body, *headers = fields
+        return cls(
+            started=started,
+            duration=duration,
+            status=status,
+            fn_headers=list(zip(headers[0 : 2 * header_count : 2], headers[1::2])),
+            method=method,
+            path=path,
+            query_string=query_string,
+            root_path=root_path,
+            body=body,
+            body_size=body_size,
+        )
+
+    def replay_headers(self) -> Headers:
+        """Returns the Fn headers with the content-length fixed
+        to match a possibly truncated body."""
+        return [
+            (key, str(len(self.body)).encode())
+            if key.lower() == b"content-length"
+            else (key, value)
+            for key, value in self.fn_headers
+        ]
+
+    def to_request(self) -> FnRequest:
+        """Returns the HTTP request of the call, e.g. to generate load with."""
+        from fdk_asgi.agent import FnRequest
+
+        url = b""
+        headers = []
+        for key, value in self.fn_headers:
+            key_lower = key.lower()
+            if key_lower == FN_HTTP_REQUEST_URL:
+                url = value
+            elif key_lower == b"content-type":
+                headers.append((key, value))
+            elif (
+                key_lower.startswith(FN_HTTP_H_)
+                # set again to match a possibly truncated body
+                and key_lower[len(FN_HTTP_H_) :] != b"content-length"
+            ):
+                headers.append((key[len(FN_HTTP_H_) :], value))
+        return FnRequest(self.method.decode(), url, headers, self.body)
+
+
+class TrafficCapture:
+    """Appends a random sample of Fn calls to a capture file.
+
+    Bodies are cut off after max_body_size bytes. The values of headers
+    in redacted_headers are masked, keeping their original length."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        sample_rate: float = 1.0,
+        max_body_size: int = 65536,
+        redacted_headers: Iterable[bytes] = DEFAULT_REDACTED_HEADERS,
+    ) -> None:
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body_size = max_body_size
+        self.redacted_headers = frozenset(key.lower() for key in redacted_headers)
+        self.captured = 0
+        self._file: BinaryIO | None = None
+
+    def sample(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate  # noqa: S311
+
+    def recorder(self, scope: Scope) -> CallRecorder:
+        return CallRecorder(self, scope)
+
+    def write(self, call: CapturedCall) -> None:
+        if self._file is None:
+            # unbuffered, so every record is appended with a single write
+            self._file = self.path.open("ab", buffering=0)
+            if self._file.tell() == 0:
+                self._file.write(MAGIC)
+        call.fn_headers = self.redact(call.fn_headers)
+        self._file.write(call.to_bytes())
+        self.captured += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def redact(self, fn_headers: Headers) -> Headers:
+        redacted = []
+        for key, value in fn_headers:
+            name = key.lower()
+            if name.startswith(FN_HTTP_H_):
+                name = name[len(FN_HTTP_H_) :]
+            if name in self.redacted_headers:
+                value = b"*" * len(value)
+            redacted.append((key, value))
+        return redacted
+
+
+class CallRecorder:
+    """Records a single Fn call while it is handled by an FnMiddleware."""
+
+    def __init__(self, capture: TrafficCapture, scope: Scope) -> None:
+        self.capture = capture
+        self.call = CapturedCall(
+            started=time.time(),
+            duration=0.0,
+            status=0,
+            fn_headers=list(scope["headers"]),
+            method=scope["method"].encode(),
+            path=scope.get("raw_path") or scope["path"].encode(),
+            query_string=scope.get("query_string", b""),
+            root_path=scope.get("root_path", "").encode(),
+        )
+        self.body = bytearray()
+        self._started = time.perf_counter()
+
+    def set_mapped_scope(self, scope: Scope) -> None:
+        # copy the fields now, as the app may modify the scope in place
+        self.call.method = scope["method"].encode()
+        self.call.path = scope["raw_path"]
+        self.call.query_string = scope["query_string"]
+        self.call.root_path = scope["root_path"].encode()
+
+    def wrap_receive(self, receive: Receive) -> Receive:
+        async def wrapped_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                self.call.body_size += len(chunk)
+                missing = self.capture.max_body_size - len(self.body)
+                if missing > 0:
+                    self.body += chunk[:missing]
+            return message
+
+        return wrapped_receive
+
+    def wrap_send(self, send: Send) -> Send:
+        async def wrapped_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self.call.status = message["status"]
+                for key, value in message.get("headers", []):
+                    if key.lower() == FN_HTTP_STATUS:
+                        self.call.status = int(value)
+            await send(message)
+            if message["type"] == PATHSEND or (
+                message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+            ):
+                self.finish()
+
+        return wrapped_send
+
+    def finish(self) -> None:
+        self.call.duration = time.perf_counter() - self._started
+        self.call.body = bytes(self.body)
+        self.capture.write(self.call)
+
+
+def read_capture(path: Path) -> Iterator[CapturedCall]:
+    """Yields all calls of a capture file,
+    skipping an incomplete last record (e.g. after a crash)."""
+    with path.open("rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            msg = f"{path} is not a capture file."
+            raise ValueError(msg)
+        while len(prefix := file.read(_LENGTH.size)) == _LENGTH.size:
+            (length,) = _LENGTH.unpack(prefix)
+            record = file.read(length)
+            if len(record) < length:
+                return
+            yield CapturedCall.from_bytes(record)
+
+
+async def replay(
+    client: FnClient,
+    calls: Sequence[CapturedCall],
+    *,
+    speed: float = 1.0,
+    concurrency: int = 100,
+) -> LoadReport:
+    """Sends captured calls in the order and at the pace they were captured,
+    sped up by the given factor. A speed of 0 sends them as fast as possible.
+    At most concurrency calls are in flight at any time."""
+    from fdk_asgi.loadgen import LoadReport
+
+    report = LoadReport()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(call: CapturedCall) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.call(call.replay_headers(), call.body)
+            except Exception:
+                report.errors += 1
+                return
+            # the status of the app, which Fn sends with a 200 unless it is 502 or 504
+            if response.status >= 500:
+                report.errors += 1
+            else:
+                report.latencies.append(time.perf_counter() - started)
+
+    calls = sorted(calls, key=lambda call: call.started)
+    tasks = []
+    started = time.perf_counter()
+    for call in calls:
+        if speed > 0:
+            offset = (call.started - calls[0].started) / speed
+            delay = offset - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send(call)))
+    await asyncio.gather(*tasks)
+    report.duration = time.perf_counter() - started
+    return report
@@ -1,8 +1,7 @@
 import logging
-import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 if sys.version_info >= (3, 9):
     from typing import Annotated
@@ -15,59 +14,30 @@ except ModuleNotFoundError as exception:  # pragma: no cover
     msg = f"Using {__name__} requires the typer package to be installed."
     raise RuntimeError(msg) from exception
 
-try:
-    import uvicorn
-    from uvicorn.importer import import_from_string
-except ModuleNotFoundError as exception:  # pragma: no cover
-    msg = f"Using {__name__} requires the uvicorn package to be installed."
-    raise RuntimeError(msg) from exception
-
-from fdk_asgi.app import FnMiddleware
-from fdk_asgi.types import HTTPProtocolType, LifespanType, LoopSetupType
-
-UDS_PREFIX = "unix:"
-DEFAULT_LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "()": "uvicorn.logging.DefaultFormatter",
-            "fmt": "%(levelprefix)s %(message)s",
-            "use_colors": None,
-        },
-        "access": {
-            "()": "uvicorn.logging.AccessFormatter",
-            "fmt": '%(levelprefix)s %(client_addr)s - "%(request_line)s" %(status_code)s',
-        },
-    },
-    "handlers": {
-        "default": {
-            "formatter": "default",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stderr",
-        },
-        "access": {
-            "formatter": "access",
-            "class": "logging.StreamHandler",
-            "stream": "ext://sys.stdout",
-        },
-    },
-    "loggers": {
-        "fdk_asgi": {"handlers": ["default"], "level": "INFO"},
-        "fdk_asgi.access": {
-            "handlers": ["access"],
-            "level": "INFO",
-            "propagate": False,
-        },
-        "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
-        "uvicorn.error": {"level": "INFO"},
-    },
-}
+from fdk_asgi.tuning import TUNING_FILE
+from fdk_asgi.types import (
+    DeferredPolicy,
+    GCMode,
+    HTTPProtocolType,
+    InterfaceType,
+    LifespanType,
+    LoopSetupType,
+    RecycleMode,
+)
 
 app = typer.Typer()
+cli = typer.Typer()
 logger = logging.getLogger(__name__)
 
 
+def positive(value: Optional[float]) -> Optional[float]:
+    if value is not None and not value > 0:
+        msg = "must be positive"
+        raise typer.BadParameter(msg)
+    return value
+
+
+@cli.command()
 @app.command()
 def serve(
     app_uri: Annotated[str, typer.Argument(metavar="APP")],
@@ -80,11 +50,19 @@ def serve(
         ),
     ] = "unix:./fdk-asgi.socket",
     loop: Annotated[
-        LoopSetupType, typer.Option(envvar="FDK_ASGI_LOOP")
-    ] = LoopSetupType.none,
+        Optional[LoopSetupType],
+        typer.Option(
+            envvar="FDK_ASGI_LOOP",
+            help="Event loop, defaults to the tuned one or none.",
+        ),
+    ] = None,
     http: Annotated[
-        HTTPProtocolType, typer.Option(envvar="FDK_ASGI_HTTP")
-    ] = HTTPProtocolType.auto,
+        Optional[HTTPProtocolType],
+        typer.Option(
+            envvar="FDK_ASGI_HTTP",
+            help="HTTP protocol, defaults to the tuned one or auto.",
+        ),
+    ] = None,
     lifespan: Annotated[
         LifespanType, typer.Option(envvar="FDK_ASGI_LIFESPAN")
     ] = LifespanType.auto,
@@ -137,50 +115,769 @@ def serve(
     h11_max_incomplete_event_size: Annotated[
         Optional[int], typer.Option(envvar="FDK_ASGI_H11_MAX_INCOMPLETE_EVENT_SIZE")
     ] = None,
+    default_executor_workers: Annotated[
+        Optional[int],
+        typer.Option(
+            envvar="FDK_ASGI_DEFAULT_EXECUTOR_WORKERS",
+            help="Install an instrumented default thread pool executor "
+            "with the given number of worker threads.",
+        ),
+    ] = None,
+    executor_wait_warning: Annotated[
+        Optional[float],
+        typer.Option(
+            envvar="FDK_ASGI_EXECUTOR_WAIT_WARNING",
+            help="Warn when tasks wait longer than the given number of seconds "
+            "for a thread of the default executor.",
+        ),
+    ] = None,
+    gc_mode: Annotated[
+        GCMode,
+        typer.Option(
+            envvar="FDK_ASGI_GC_MODE",
+            help="Suspend automatic garbage collection (or raise its generation 0 "
+            "threshold) while requests are in flight and collect between them. "
+            "Also freezes all objects allocated during lifespan startup.",
+        ),
+    ] = GCMode.off,
+    gc_busy_threshold: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_GC_BUSY_THRESHOLD",
+            help="Generation 0 threshold while requests are in flight "
+            "when using --gc-mode=thresholds. With --gc-mode=suspend, a collection "
+            "is forced between overlapping requests after as many allocations.",
+        ),
+    ] = 50_000,
+    limit_max_requests: Annotated[
+        Optional[int],
+        typer.Option(
+            envvar="FDK_ASGI_LIMIT_MAX_REQUESTS",
+            help="Recycle the server after handling the given number of requests.",
+        ),
+    ] = None,
+    limit_max_memory: Annotated[
+        Optional[int],
+        typer.Option(
+            envvar="FDK_ASGI_LIMIT_MAX_MEMORY",
+            help="Recycle the server once its resident set size exceeds "
+            "the given number of MiB.",
+        ),
+    ] = None,
+    recycle: Annotated[
+        RecycleMode,
+        typer.Option(
+            envvar="FDK_ASGI_RECYCLE",
+            help="After draining in-flight requests, either exit (and let the Fn "
+            "agent start a fresh container) or restart the server in-process.",
+        ),
+    ] = RecycleMode.exit,
+    preload_manifest: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_PRELOAD_MANIFEST",
+            help="Import the modules recorded by the prepare command "
+            "before importing APP.",
+        ),
+    ] = None,
+    preload_background: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_PRELOAD_BACKGROUND",
+            help="Import the modules of the preload manifest in a background thread "
+            "while APP is imported and the socket is bound.",
+        ),
+    ] = False,
+    capture_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_CAPTURE_FILE",
+            help="Append a sample of incoming Fn calls to the given file, "
+            "to be replayed by the replay command.",
+        ),
+    ] = None,
+    capture_sample_rate: Annotated[
+        float,
+        typer.Option(
+            envvar="FDK_ASGI_CAPTURE_SAMPLE_RATE",
+            help="Fraction of Fn calls to capture.",
+        ),
+    ] = 0.01,
+    capture_max_body_size: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_CAPTURE_MAX_BODY_SIZE",
+            help="Number of bytes of request bodies to capture at most.",
+        ),
+    ] = 4096,
+    access_log_buffer: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_ACCESS_LOG_BUFFER",
+            help="Write the access log into a memory-mapped ring buffer at the given "
+            "path instead of stdout. Read it with the access-log command.",
+        ),
+    ] = None,
+    access_log_buffer_size: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_ACCESS_LOG_BUFFER_SIZE",
+            help="Number of records the access log buffer holds.",
+        ),
+    ] = 65536,
+    batch_path: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_BATCH_PATH",
+            help="Accept batch calls carrying many requests at the given path.",
+        ),
+    ] = None,
+    batch_concurrency: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_BATCH_CONCURRENCY",
+            help="Number of requests of a batch call handled concurrently.",
+        ),
+    ] = 10,
+    static_directory: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_STATIC_DIRECTORY",
+            help="Load the files of the given directory at startup and serve them "
+            "from memory, with ETags and compressed variants, without entering APP.",
+        ),
+    ] = None,
+    static_path: Annotated[
+        str,
+        typer.Option(
+            envvar="FDK_ASGI_STATIC_PATH",
+            help="URL path to serve the static directory at.",
+        ),
+    ] = "/static",
+    buffer_request_body: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_BUFFER_REQUEST_BODY",
+            help="Receive request bodies completely before calling APP "
+            "and pass them on in a single message.",
+        ),
+    ] = False,
+    spool_threshold: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_SPOOL_THRESHOLD",
+            help="Spool buffered request bodies larger than the given number "
+            "of bytes to a temporary file.",
+        ),
+    ] = 2**20,
+    header_allow: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_HEADER_ALLOW",
+            help="Comma-separated request header names (or prefixes ending in *) "
+            "to pass on to APP, dropping all others.",
+        ),
+    ] = None,
+    header_deny: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_HEADER_DENY",
+            help="Comma-separated request header names (or prefixes ending in *) "
+            "to drop before calling APP, e.g. 'oci-*,fn-*'.",
+        ),
+    ] = None,
+    header_collapse: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_HEADER_COLLAPSE",
+            help="Comma-separated request header names (or prefixes ending in *) "
+            "whose repetitions are joined into a single header.",
+        ),
+    ] = None,
+    rate_limit: Annotated[
+        Optional[float],
+        typer.Option(
+            envvar="FDK_ASGI_RATE_LIMIT",
+            callback=positive,
+            help="Number of requests per second allowed per client on average. "
+            "Excess requests are answered with 429 Too Many Requests.",
+        ),
+    ] = None,
+    rate_limit_burst: Annotated[
+        Optional[int],
+        typer.Option(
+            envvar="FDK_ASGI_RATE_LIMIT_BURST",
+            min=1,
+            help="Number of requests a client may send at once "
+            "(defaults to the rate limit, rounded up).",
+        ),
+    ] = None,
+    rate_limit_header: Annotated[
+        str,
+        typer.Option(
+            envvar="FDK_ASGI_RATE_LIMIT_HEADER",
+            help="Request header whose last address identifies the client.",
+        ),
+    ] = "x-forwarded-for",
+    interface: Annotated[
+        InterfaceType,
+        typer.Option(
+            envvar="FDK_ASGI_INTERFACE",
+            help="Whether APP is an ASGI or a WSGI application.",
+        ),
+    ] = InterfaceType.asgi,
+    wsgi_workers: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_WSGI_WORKERS",
+            help="Number of worker threads running a WSGI application.",
+        ),
+    ] = 8,
+    deferred_work: Annotated[
+        Optional[DeferredPolicy],
+        typer.Option(
+            envvar="FDK_ASGI_DEFERRED_WORK",
+            help="Track work running after the response (e.g. background tasks), "
+            "as the container may be frozen meanwhile. Either finish it before "
+            "the response is complete or let it drain while no requests are in "
+            "flight. Its cost per route is logged at shutdown.",
+        ),
+    ] = None,
+    trace_file: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_TRACE_FILE",
+            help="Open a trace span per Fn call, continuing traceparent or b3 "
+            "headers, and export them as OTLP/JSON lines to the given file "
+            "(or unix:PATH socket).",
+        ),
+    ] = None,
+    trace_sample_rate: Annotated[
+        float,
+        typer.Option(
+            envvar="FDK_ASGI_TRACE_SAMPLE_RATE",
+            help="Fraction of traces to sample that the caller did not decide on.",
+        ),
+    ] = 0.1,
+    tuning_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_TUNING_FILE",
+            help="Use the loop and HTTP protocol saved by the autotune command, "
+            "unless --loop or --http are given.",
+        ),
+    ] = None,
+    cors_allow_origins: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_CORS_ALLOW_ORIGINS",
+            help="Comma-separated origins (or *) allowed to send cross-origin "
+            "requests. CORS preflights are answered without calling APP.",
+        ),
+    ] = None,
+    cors_allow_methods: Annotated[
+        str,
+        typer.Option(
+            envvar="FDK_ASGI_CORS_ALLOW_METHODS",
+            help="Comma-separated methods allowed in cross-origin requests.",
+        ),
+    ] = "GET,HEAD,POST,PUT,PATCH,DELETE",
+    cors_allow_headers: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="FDK_ASGI_CORS_ALLOW_HEADERS",
+            help="Comma-separated request headers (or *) allowed "
+            "in cross-origin requests.",
+        ),
+    ] = None,
+    cors_max_age: Annotated[
+        int,
+        typer.Option(
+            envvar="FDK_ASGI_CORS_MAX_AGE",
+            help="Number of seconds browsers may cache preflight responses.",
+        ),
+    ] = 600,
+    cors_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_CORS_FILE",
+            help="Read the CORS configuration (allow_origins, allow_methods, "
+            "allow_headers, expose_headers, allow_credentials and max_age) "
+            "from a JSON file instead.",
+        ),
+    ] = None,
+    pools_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            envvar="FDK_ASGI_POOLS_FILE",
+            help="Open the TCP connection pools configured in a JSON file before "
+            "accepting calls and keep them warm between calls. APP finds them "
+            "in the lifespan state under fdk_asgi_pools.",
+        ),
+    ] = None,
+    pool_refresh_interval: Annotated[
+        float,
+        typer.Option(
+            envvar="FDK_ASGI_POOL_REFRESH_INTERVAL",
+            help="Idle pooled connections are validated and refreshed as soon "
+            "as no call is in flight, and again every given number of seconds.",
+        ),
+    ] = 10.0,
+    compact_scope: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_COMPACT_SCOPE",
+            help="Pass compact scopes to APP that translate the headers of the "
+            "HTTP request only when they are looked up (unless a header policy "
+            "filters them).",
+        ),
+    ] = False,
 ) -> None:
-    asgi_app = import_from_string(app_uri)
-    if factory:
-        asgi_app = asgi_app()
-    fn_asgi_app = FnMiddleware(asgi_app, prefix)
-
-    socket = Path(uds[len(UDS_PREFIX) :]) if uds.startswith(UDS_PREFIX) else Path(uds)
-    # os.umask(0o666)  # todo: check if this is necessary
-
-    config = uvicorn.Config(
-        app=fn_asgi_app,
-        uds=str(socket),
-        loop=loop.value,
-        http=http.value,
-        ws="none",
-        lifespan=lifespan.value,
+    from fdk_asgi.server import run
+
+    run(
+        app_uri,
+        uds=uds,
+        loop=loop,
+        http=http,
+        lifespan=lifespan,
         env_file=env_file,
-        log_config=DEFAULT_LOGGING_CONFIG
-        if log_config is None
-        else os.fspath(log_config),
+        log_config=log_config,
         log_level=log_level,
-        access_log=False,
-        # use_colors: Optional[bool] = None,
-        interface="asgi3",
-        workers=1,
-        proxy_headers=proxy_headers,  # todo: check if Functions supports this header
-        server_header=server_header,  # todo: check if Functions supports this header
-        date_header=date_header,  # todo: check if Functions supports this header
-        # forwarded_allow_ips: Optional[Union[List[str], str]] = None,
-        # root_path="",
-        # limit_concurrency: Optional[int] = None,
-        # limit_max_requests: Optional[int] = None,
-        # backlog: int = 2048,
+        proxy_headers=proxy_headers,
+        server_header=server_header,
+        date_header=date_header,
+        prefix=prefix,
         timeout_keep_alive=timeout_keep_alive,
-        # timeout_notify: int = 30,
-        # timeout_graceful_shutdown: Optional[int] = None,
-        # callback_notify: Optional[Callable[..., Awaitable[None]]] = None,
-        # headers: Optional[List[Tuple[str, str]]] = None,
-        factory=False,
+        factory=factory,
         h11_max_incomplete_event_size=h11_max_incomplete_event_size,
+        default_executor_workers=default_executor_workers,
+        executor_wait_warning=executor_wait_warning,
+        gc_mode=gc_mode,
+        gc_busy_threshold=gc_busy_threshold,
+        limit_max_requests=limit_max_requests,
+        limit_max_memory=limit_max_memory,
+        recycle=recycle,
+        preload_manifest=preload_manifest,
+        preload_background=preload_background,
+        capture_file=capture_file,
+        capture_sample_rate=capture_sample_rate,
+        capture_max_body_size=capture_max_body_size,
+        access_log_buffer=access_log_buffer,
+        access_log_buffer_size=access_log_buffer_size,
+        batch_path=batch_path,
+        batch_concurrency=batch_concurrency,
+        static_directory=static_directory,
+        static_path=static_path,
+        buffer_request_body=buffer_request_body,
+        spool_threshold=spool_threshold,
+        header_allow=header_allow,
+        header_deny=header_deny,
+        header_collapse=header_collapse,
+        rate_limit=rate_limit,
+        rate_limit_burst=rate_limit_burst,
+        rate_limit_header=rate_limit_header,
+        interface=interface,
+        wsgi_workers=wsgi_workers,
+        deferred_work=deferred_work,
+        trace_file=trace_file,
+        trace_sample_rate=trace_sample_rate,
+        tuning_file=tuning_file,
+        cors_allow_origins=cors_allow_origins,
+        cors_allow_methods=cors_allow_methods,
+        cors_allow_headers=cors_allow_headers,
+        cors_max_age=cors_max_age,
+        cors_file=cors_file,
+        pools_file=pools_file,
+        pool_refresh_interval=pool_refresh_interval,
+        compact_scope=compact_scope,
     )
 
-    server = uvicorn.Server(config)
-    try:
-        server.run()
-    finally:
-        socket.unlink(missing_ok=True)
+
+@cli.command()
+def prepare(
+    app_uri: Annotated[str, typer.Argument(metavar="APP")],
+    manifest: Annotated[
+        Path,
+        typer.Option(
+            envvar="FDK_ASGI_PRELOAD_MANIFEST",
+            help="Where to write the preload manifest to.",
+        ),
+    ] = Path("fdk-asgi.preload.json"),
+    factory: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_FACTORY",
+            help="Treat APP as an application factory, "
+            "i.e. a () -> <ASGI app> callable.",
+        ),
+    ] = False,
+    compile_bytecode: Annotated[
+        bool,
+        typer.Option(
+            "--compile/--no-compile",
+            help="Byte-compile all packages imported by APP, "
+            "except for the standard library.",
+        ),
+    ] = True,
+    unchecked_hash: Annotated[
+        bool,
+        typer.Option(
+            help="Write hash-based .pyc files that are never checked "
+            "against their sources. Only use this for immutable images.",
+        ),
+    ] = False,
+) -> None:
+    """Prepares a function image for fast cold starts.
+
+    Warms up APP in a fresh interpreter, byte-compiles everything it imports
+    and records a preload manifest for the serve command."""
+    from py_compile import PycInvalidationMode
+
+    from fdk_asgi.prepare import (
+        build_manifest,
+        byte_compile,
+        find_compile_roots,
+        warm_up,
+    )
+
+    before = warm_up(app_uri, factory=factory)
+
+    if compile_bytecode:
+        roots = find_compile_roots(before.module_files)
+        invalidation_mode = (
+            PycInvalidationMode.UNCHECKED_HASH if unchecked_hash else None
+        )
+        if not byte_compile(roots, invalidation_mode=invalidation_mode):
+            typer.echo("Some files could not be byte-compiled.", err=True)
+        typer.echo(f"Byte-compiled {len(roots)} packages and modules.")
+
+    preload_manifest = build_manifest(app_uri, before)
+    preload_manifest.dump(manifest)
+    typer.echo(
+        f"Wrote preload manifest for {len(preload_manifest.modules)} modules "
+        f"to {manifest}."
+    )
+    after = warm_up(app_uri, factory=factory, manifest=manifest)
+
+    typer.echo(
+        f"Import time: {before.total_time / 1000:.1f} ms before, "
+        f"{after.total_time / 1000:.1f} ms after."
+    )
+    typer.echo("Slowest imports:")
+    for record in sorted(after.records, key=lambda record: -record.self_time)[:10]:
+        typer.echo(f"  {record.self_time / 1000:8.1f} ms  {record.name}")
+
+
+@cli.command()
+def bench(
+    app_uri: Annotated[
+        Optional[str],
+        typer.Argument(
+            metavar="[APP]",
+            help="Serve APP with every available loop and HTTP protocol "
+            "and compare them. Without APP, an already running function is called.",
+            show_default=False,
+        ),
+    ] = None,
+    uds: Annotated[
+        str,
+        typer.Option(
+            envvar="FN_LISTENER",
+            help="Path to the UNIX domain socket of the running function, "
+            'prefixed with "unix:".',
+        ),
+    ] = "unix:./fdk-asgi.socket",
+    request: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--request",
+            "-r",
+            help='Requests to send in turn, e.g. "GET /users" or "POST /users {...}". '
+            'Defaults to "GET /".',
+            show_default=False,
+        ),
+    ] = None,
+    requests: Annotated[
+        int, typer.Option("--requests", "-n", help="Number of requests to send.")
+    ] = 1000,
+    concurrency: Annotated[
+        int, typer.Option("--concurrency", "-c", help="Number of connections.")
+    ] = 1,
+    warm_up: Annotated[
+        int, typer.Option(help="Number of requests to send before measuring.")
+    ] = 100,
+    factory: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_FACTORY",
+            help="Treat APP as an application factory, "
+            "i.e. a () -> <ASGI app> callable.",
+        ),
+    ] = False,
+) -> None:
+    """Sends Fn calls like the Fn agent does and reports throughput and latencies."""
+    import asyncio
+
+    from fdk_asgi.agent import FnRequest
+    from fdk_asgi.loadgen import (
+        available_loops,
+        available_protocols,
+        benchmark_server,
+        generate_load,
+    )
+    from fdk_asgi.server import socket_path_from_uds
+
+    fn_requests = [FnRequest.parse(line) for line in request or ["GET /"]]
+
+    if app_uri is None:
+        report = asyncio.run(
+            generate_load(
+                str(socket_path_from_uds(uds)),
+                fn_requests,
+                total=requests,
+                concurrency=concurrency,
+                warm_up=warm_up,
+            )
+        )
+        typer.echo(report.summary())
+        return
+
+    for loop in available_loops():
+        for http in available_protocols():
+            report = benchmark_server(
+                app_uri,
+                fn_requests,
+                loop=loop,
+                http=http,
+                total=requests,
+                concurrency=concurrency,
+                warm_up=warm_up,
+                env={"FDK_ASGI_FACTORY": str(factory)},
+            )
+            typer.echo(f"--loop {loop:<8} --http {http:<10} {report.summary()}")
+
+
+@cli.command()
+def autotune(
+    app_uri: Annotated[str, typer.Argument(metavar="APP")],
+    request: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            "--request",
+            "-r",
+            help='Requests to send in turn, e.g. "GET /users" or "POST /users {...}". '
+            'Defaults to "GET /" unless --capture-file is given.',
+            show_default=False,
+        ),
+    ] = None,
+    capture_file: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="Send the calls of a file written by serve --capture-file in turn.",
+            show_default=False,
+        ),
+    ] = None,
+    requests: Annotated[
+        int, typer.Option("--requests", "-n", help="Number of requests to send.")
+    ] = 1000,
+    concurrency: Annotated[
+        int, typer.Option("--concurrency", "-c", help="Number of connections.")
+    ] = 1,
+    warm_up: Annotated[
+        int, typer.Option(help="Number of requests to send before measuring.")
+    ] = 100,
+    factory: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_FACTORY",
+            help="Treat APP as an application factory, "
+            "i.e. a () -> <ASGI app> callable.",
+        ),
+    ] = False,
+    tuning_file: Annotated[
+        Path,
+        typer.Option(
+            envvar="FDK_ASGI_TUNING_FILE",
+            help="Where to save the fastest loop and HTTP protocol for serve.",
+        ),
+    ] = TUNING_FILE,
+) -> None:
+    """Serves APP with every available loop and HTTP protocol
+    and saves the fastest combination for later serve runs."""
+    from fdk_asgi.agent import FnRequest
+    from fdk_asgi.capture import read_capture
+    from fdk_asgi.tuning import autotune as run_autotune
+
+    fn_requests = [FnRequest.parse(line) for line in request or []]
+    if capture_file is not None:
+        fn_requests.extend(call.to_request() for call in read_capture(capture_file))
+    if not fn_requests:
+        fn_requests.append(FnRequest.parse("GET /"))
+
+    results = run_autotune(
+        app_uri,
+        fn_requests,
+        total=requests,
+        concurrency=concurrency,
+        warm_up=warm_up,
+        env={"FDK_ASGI_FACTORY": str(factory)},
+    )
+    typer.echo(
+        f"  {'loop':<8} {'http':<10} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>6}"
+    )
+    for rank, (tuning, report) in enumerate(results):
+        typer.echo(
+            f"{'*' if rank == 0 else ' '} {tuning.loop:<8} {tuning.http:<10} "
+            f"{report.throughput:9.1f} "
+            + " ".join(
+                f"{report.percentile(percent) * 1000:8.2f}" for percent in (50, 90, 99)
+            )
+            + f" {report.errors:6d}"
+        )
+
+    best, report = results[0]
+    if report.errors:
+        typer.echo("Every combination failed some requests, not saving any.", err=True)
+        raise typer.Exit(code=1)
+    best.save(tuning_file)
+    typer.echo(
+        f"Saved --loop {best.loop} --http {best.http} to {tuning_file}, "
+        f"pass --tuning-file {tuning_file} to serve to use them."
+    )
+
+
+@cli.command()
+def replay(
+    app_uri: Annotated[str, typer.Argument(metavar="APP")],
+    capture_file: Annotated[
+        Path,
+        typer.Argument(
+            metavar="CAPTURE",
+            help="A file written by serve --capture-file.",
+            show_default=False,
+        ),
+    ],
+    speed: Annotated[
+        float,
+        typer.Option(
+            help="Replay the calls this many times faster than they were captured. "
+            "Use 0 to send them as fast as possible.",
+        ),
+    ] = 1.0,
+    concurrency: Annotated[
+        int,
+        typer.Option("--concurrency", "-c", help="Number of calls in flight at most."),
+    ] = 100,
+    prefix: Annotated[
+        str,
+        typer.Option(
+            envvar="FDK_ASGI_PREFIX",
+            help="Strips the given prefix from URL paths. "
+            "Also sets root_path to this value.",
+            show_default=False,
+        ),
+    ] = "",
+    factory: Annotated[
+        bool,
+        typer.Option(
+            envvar="FDK_ASGI_FACTORY",
+            help="Treat APP as an application factory, "
+            "i.e. a () -> <ASGI app> callable.",
+        ),
+    ] = False,
+    interface: Annotated[
+        InterfaceType,
+        typer.Option(
+            envvar="FDK_ASGI_INTERFACE",
+            help="Whether APP is an ASGI or a WSGI application.",
+        ),
+    ] = InterfaceType.asgi,
+) -> None:
+    """Replays captured Fn calls against APP in-process and reports latencies."""
+    import asyncio
+
+    from fdk_asgi.app import FnMiddleware
+    from fdk_asgi.capture import read_capture
+    from fdk_asgi.capture import replay as replay_calls
+    from fdk_asgi.server import load_app
+    from fdk_asgi.testing import FnClient
+
+    calls = list(read_capture(capture_file))
+    truncated = sum(call.truncated for call in calls)
+    typer.echo(
+        f"Replaying {len(calls)} calls ({truncated} with truncated bodies) "
+        f"from {capture_file}."
+    )
+
+    async def run() -> None:
+        fn_app = FnMiddleware(
+            load_app(app_uri, factory=factory, interface=interface), prefix
+        )
+        async with FnClient(fn_app) as client:
+            report = await replay_calls(
+                client, calls, speed=speed, concurrency=concurrency
+            )
+        typer.echo(report.summary())
+
+    asyncio.run(run())
+
+
+@cli.command()
+def access_log(
+    buffer: Annotated[
+        Path,
+        typer.Argument(
+            envvar="FDK_ASGI_ACCESS_LOG_BUFFER",
+            help="A buffer written by serve --access-log-buffer.",
+            show_default=False,
+        ),
+    ],
+    tail: Annotated[
+        Optional[int],
+        typer.Option(
+            "--tail",
+            "-n",
+            help="Print the last records instead of a summary per route.",
+            show_default=False,
+        ),
+    ] = None,
+    follow: Annotated[
+        bool,
+        typer.Option(
+            "--follow", "-f", help="Keep printing new records as they are written."
+        ),
+    ] = False,
+) -> None:
+    """Decodes an access log buffer and summarizes latencies per route."""
+    import time
+
+    from fdk_asgi.accesslog import read_access_log, summarize
+    from fdk_asgi.loadgen import percentile
+
+    position, records = read_access_log(buffer)
+
+    if tail is None and not follow:
+        typer.echo(
+            f"{'requests':>8} {'errors':>6} {'p50 ms':>8} {'p90 ms':>8} "
+            f"{'p99 ms':>8}  route"
+        )
+        for summary in summarize(records):
+            typer.echo(
+                f"{summary.requests:8d} {summary.errors:6d} "
+                + " ".join(
+                    f"{percentile(summary.latencies, percent) * 1000:8.2f}"
+                    for percent in (50, 90, 99)
+                )
+                + f"  {summary.method} {summary.route}"
+            )
+        return
+
+    for record in records[-tail:] if tail else []:
+        typer.echo(str(record))
+    while follow:
+        time.sleep(0.5)
+        position, records = read_access_log(buffer, since=position)
+        for record in records:
+            typer.echo(str(record))
@@ -0,0 +1,212 @@
+"""Answering CORS preflight requests without calling the app.
+
+Browsers send an OPTIONS preflight before many cross-origin requests. Its response
+only depends on the configuration, so FnMiddleware answers it from precomputed
+headers instead of dispatching it to the app. The CORS headers of all other
+responses are added while FnMiddleware rewrites their headers anyway.
+
+Do not combine this with a CORS middleware of the app itself."""
+
+from __future__ import annotations
+
+import json
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Iterable
+
+from fdk_asgi.app import FN_HTTP_H_
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from fdk_asgi.types import Scope, Send
+
+DEFAULT_ALLOW_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE")
+# maximum number of distinct origins whose headers are cached
+MAX_CACHED_ORIGINS = 1024
+# keyword arguments of CORSPolicy that a CORS configuration file gives as lists
+_LIST_OPTIONS = ("allow_origins", "allow_methods", "allow_headers", "expose_headers")
+
+
+def _check_config(config: object) -> str | None:
+    """Returns what is wrong with the contents of a CORS configuration file, if any."""
+    if not isinstance(config, dict):
+        return "not a JSON object"
+    for key in _LIST_OPTIONS:
+        # a single string would be taken as a list of characters
+        value = config.get(key, [])
+        if not isinstance(value, list) or not all(
+            isinstance(item, str) for item in value
+        ):
+            return f"{key} is not a list of strings"
+    return None
+
+
+def _split(value: str | None) -> list[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class CORSPolicy:
+    """Allows cross-origin requests from allow_origins ("*" for any origin)."""
+
+    def __init__(
+        self,
+        *,
+        allow_origins: Iterable[str] = ("*",),
+        allow_methods: Iterable[str] = DEFAULT_ALLOW_METHODS,
+        allow_headers: Iterable[str] = (),
+        expose_headers: Iterable[str] = (),
+        allow_credentials: bool = False,
+        max_age: int = 600,
+    ) -> None:
+        origins = {origin.encode("latin-1") for origin in allow_origins}
+        self.allow_any_origin = b"*" in origins
+        self.allow_origins = frozenset(origins - {b"*"})
+        self.allow_methods = frozenset(
+            method.upper().encode() for method in allow_methods
+        )
+        allow_headers = [header.lower() for header in allow_headers]
+        self.allow_any_header = "*" in allow_headers
+        self.allow_credentials = allow_credentials
+        self.preflights = 0
+
+        # headers of all responses to allowed origins, already prefixed for Fn
+        response_headers = []
+        if allow_credentials:
+            response_headers.append((b"access-control-allow-credentials", b"true"))
+        if expose_headers:
+            response_headers.append(
+                (b"access-control-expose-headers", ", ".join(expose_headers).encode())
+            )
+        self._response_headers = [
+            (FN_HTTP_H_ + key, value) for key, value in response_headers
+        ]
+        # only the origin itself may be allowed if credentials are included
+        self._echo_origin = bool(self.allow_origins) or allow_credentials
+        if self._echo_origin:
+            self._response_headers.append((FN_HTTP_H_ + b"vary", b"Origin"))
+        self._wildcard_headers = [
+            (FN_HTTP_H_ + b"access-control-allow-origin", b"*"),
+            *self._response_headers,
+        ]
+        self._origin_headers: dict[bytes, list[tuple[bytes, bytes]]] = {}
+
+        self._preflight_headers = [
+            (
+                b"access-control-allow-methods",
+                ", ".join(
+                    sorted(method.decode() for method in self.allow_methods)
+                ).encode(),
+            ),
+            (b"access-control-max-age", str(max_age).encode()),
+        ]
+        if allow_headers and not self.allow_any_header:
+            self._preflight_headers.append(
+                (b"access-control-allow-headers", ", ".join(allow_headers).encode())
+            )
+
+    @classmethod
+    def from_options(
+        cls,
+        allow_origins: str,
+        allow_methods: str,
+        allow_headers: str | None,
+        max_age: int,
+    ) -> CORSPolicy:
+        """Creates a policy from comma-separated lists."""
+        return cls(
+            allow_origins=_split(allow_origins),
+            allow_methods=_split(allow_methods),
+            allow_headers=_split(allow_headers),
+            max_age=max_age,
+        )
+
+    @classmethod
+    def from_file(cls, path: Path) -> CORSPolicy:
+        """Creates a policy from a JSON object with the keyword arguments of CORSPolicy,
+        e.g. {"allow_origins": ["https://example.com"], "allow_credentials": true}."""
+        config = json.loads(path.read_text())
+        problem = _check_config(config)
+        if problem is not None:
+            msg = f"Invalid CORS configuration in {path}: {problem}"
+            raise ValueError(msg)
+        try:
+            return cls(**config)
+        except TypeError as exception:
+            msg = f"Invalid CORS configuration in {path}: {exception}"
+            raise ValueError(msg) from exception
+
+    def allows(self, origin: bytes) -> bool:
+        return self.allow_any_origin or origin in self.allow_origins
+
+    def response_headers(self, scope: Scope) -> list[tuple[bytes, bytes]]:
+        """Returns the (Fn-prefixed) CORS headers to add to the response to a request."""
+        origin = get_origin(scope)
+        if origin is None or not self.allows(origin):
+            return []
+        if not self._echo_origin:
+            return self._wildcard_headers
+        headers = self._origin_headers.get(origin)
+        if headers is None:
+            headers = [
+                (FN_HTTP_H_ + b"access-control-allow-origin", origin),
+                *self._response_headers,
+            ]
+            if len(self._origin_headers) < MAX_CACHED_ORIGINS:
+                self._origin_headers[origin] = headers
+        return headers
+
+    @staticmethod
+    def is_preflight(scope: Scope) -> bool:
+        if scope["method"] != "OPTIONS":
+            return False
+        names = {key.lower() for key, _ in scope["headers"]}
+        return b"origin" in names and b"access-control-request-method" in names
+
+    async def send_preflight(self, scope: Scope, send: Send) -> None:
+        """Answers a preflight request. Its origin specific headers
+        are added by FnMiddleware like for any other response."""
+        self.preflights += 1
+        origin = get_origin(scope) or b""
+        headers = list(self._preflight_headers)
+        requested_method = b""
+        for key, value in scope["headers"]:
+            key_lower = key.lower()
+            if key_lower == b"access-control-request-method":
+                requested_method = value.upper()
+            elif (
+                key_lower == b"access-control-request-headers" and self.allow_any_header
+            ):
+                headers.append((b"access-control-allow-headers", value))
+
+        failure = None
+        if not self.allows(origin):
+            failure = b"Disallowed CORS origin"
+        elif requested_method not in self.allow_methods:
+            failure = b"Disallowed CORS method"
+        if failure is not None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": int(HTTPStatus.BAD_REQUEST),
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+                }
+            )
+            await send({"type": "http.response.body", "body": failure})
+            return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(HTTPStatus.NO_CONTENT),
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+
+def get_origin(scope: Scope) -> bytes | None:
+    origin: bytes | None = None
+    for key, value in scope["headers"]:
+        if key.lower() == b"origin":
+            origin = value
+            break
+    return origin
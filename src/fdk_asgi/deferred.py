@@ -0,0 +1,171 @@
+"""Running work deferred until after the response without it stalling in a frozen container.
+
+Fn may freeze the container as soon as a response is complete, so work still
+running afterwards (e.g. Starlette's background tasks) stalls until the next
+call and slows that one down instead. DeferredWork tracks such work and,
+depending on its policy, either finishes it before the final body message is
+forwarded, or lets it drain once no requests are in flight.
+
+Apps may also defer work explicitly via the DEFERRED scope extension:
+
+    scope["extensions"]["fdk_asgi.deferred"]["defer"](send_email, user)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+from fdk_asgi.accesslog import route_of
+from fdk_asgi.app import PATHSEND
+from fdk_asgi.types import DeferredPolicy
+
+if TYPE_CHECKING:
+    from fdk_asgi.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFERRED = "fdk_asgi.deferred"
+OTHER_ROUTES = "<other>"
+
+logger = logging.getLogger(__name__)
+
+DeferredCallable = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class DeferredCost:
+    """Time spent on deferred work of a route, in seconds."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class _Call:
+    """Keeps track of a single request and of the work it defers."""
+
+    def __init__(self, send: Send, *, hold: bool) -> None:
+        self.send = send
+        self.hold = hold
+        self.held: Message | None = None
+        self.response_complete: float | None = None
+        self.deferred: list[DeferredCallable] = []
+
+    def defer(self, function: Callable[..., Awaitable[Any]], *args: Any) -> None:
+        self.deferred.append(partial(function, *args))
+
+    async def wrapped_send(self, message: Message) -> None:
+        if message["type"] == PATHSEND or (
+            message["type"] == "http.response.body"
+            and not message.get("more_body", False)
+        ):
+            self.response_complete = time.perf_counter()
+            if self.hold:
+                self.held = message
+                return
+        await self.send(message)
+
+
+class DeferredWork:
+    """Tracks work running after the response and the cost of it per route.
+
+    With DeferredPolicy.before_response, the final body message is held back
+    until the app returned and all explicitly deferred work is done.
+    With DeferredPolicy.idle, responses are forwarded right away and explicitly
+    deferred work runs once no requests are in flight any more."""
+
+    def __init__(
+        self,
+        policy: DeferredPolicy = DeferredPolicy.before_response,
+        *,
+        max_routes: int = 1024,
+    ) -> None:
+        self.policy = policy
+        self.max_routes = max_routes
+        self.costs: dict[str, DeferredCost] = {}
+        self.in_flight = 0
+        self._queue: list[tuple[str, DeferredCallable]] = []
+        self._drain_task: asyncio.Task[None] | None = None
+
+    async def handle(
+        self, scope: Scope, receive: Receive, send: Send, *, app: ASGIApp
+    ) -> None:
+        call = _Call(send, hold=self.policy == DeferredPolicy.before_response)
+        scope["extensions"] = {
+            **(scope.get("extensions") or {}),
+            DEFERRED: {"defer": call.defer},
+        }
+        self.in_flight += 1
+        try:
+            await app(scope, receive, call.wrapped_send)
+        finally:
+            self.in_flight -= 1
+            await self._finish(scope, call)
+
+    async def _finish(self, scope: Scope, call: _Call) -> None:
+        route = route_of(scope)
+        if call.response_complete is not None:
+            # whatever the app did after completing the response
+            self.record(route, time.perf_counter() - call.response_complete)
+        if call.hold:
+            for function in call.deferred:
+                await self._run(route, function)
+            if call.held is not None:
+                await call.send(call.held)
+            return
+        self._queue.extend((route, function) for function in call.deferred)
+        if self._queue and not self.in_flight and self._drain_task is None:
+            self._drain_task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while self._queue and not self.in_flight:
+                route, function = self._queue.pop(0)
+                await self._run(route, function)
+        finally:
+            self._drain_task = None
+        # requests that arrived meanwhile start draining again once they are done
+
+    async def _run(self, route: str, function: DeferredCallable) -> None:
+        started = time.perf_counter()
+        try:
+            await function()
+        except Exception:
+            logger.exception("Exception in deferred work of %s", route)
+        self.record(route, time.perf_counter() - started)
+
+    async def drain(self) -> None:
+        """Runs all deferred work that is still queued, e.g. before shutdown."""
+        if self._drain_task is not None:
+            await self._drain_task
+        while self._queue:
+            await self._run(*self._queue.pop(0))
+
+    def record(self, route: str, duration: float) -> None:
+        cost = self.costs.get(route)
+        if cost is None:
+            if len(self.costs) >= self.max_routes:
+                route = OTHER_ROUTES
+            cost = self.costs.setdefault(route, DeferredCost())
+        cost.count += 1
+        cost.total += duration
+        cost.max = max(cost.max, duration)
+
+    def log_stats(self) -> None:
+        for route, cost in sorted(self.costs.items(), key=lambda item: -item[1].total):
+            logger.info(
+                "Deferred work of %s: %d time(s), %.3fs in total, "
+                "mean %.3fs, max %.3fs.",
+                route,
+                cost.count,
+                cost.total,
+                cost.mean,
+                cost.max,
+            )
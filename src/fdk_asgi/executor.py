@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExecutorStats:
+    """Counters collected by an InstrumentedThreadPoolExecutor.
+    All times are in seconds."""
+
+    submitted: int = 0
+    started: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+    slow_tasks: int = 0
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.total_wait_time / self.started if self.started else 0.0
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """A thread pool executor keeping track of its queue depth
+    and of the time tasks spend waiting for a free worker thread."""
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        *,
+        wait_warning_threshold: float | None = None,
+        warning_interval: float = 1.0,
+        thread_name_prefix: str = "fdk-asgi",
+        name: str = "Default executor",
+    ) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.name = name
+        self.wait_warning_threshold = wait_warning_threshold
+        self.warning_interval = warning_interval
+        self.stats = ExecutorStats()
+        self._stats_lock = threading.Lock()
+        self._last_warning = float("-inf")
+        self._slow_tasks_since_warning = 0
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def submit(  # type: ignore[override]
+        self, fn: Callable[..., T], /, *args: Any, **kwargs: Any
+    ) -> Future[T]:
+        enqueued_at = time.perf_counter()
+        with self._stats_lock:
+            self.stats.submitted += 1
+            self.stats.queue_depth += 1
+            self.stats.max_queue_depth = max(
+                self.stats.max_queue_depth, self.stats.queue_depth
+            )
+
+        def run() -> T:
+            self._record_start(time.perf_counter() - enqueued_at)
+            return fn(*args, **kwargs)
+
+        return super().submit(run)
+
+    def _record_start(self, wait_time: float) -> None:
+        with self._stats_lock:
+            self.stats.started += 1
+            self.stats.queue_depth -= 1
+            self.stats.total_wait_time += wait_time
+            self.stats.max_wait_time = max(self.stats.max_wait_time, wait_time)
+
+            if (
+                self.wait_warning_threshold is None
+                or wait_time <= self.wait_warning_threshold
+            ):
+                return
+            self.stats.slow_tasks += 1
+            self._slow_tasks_since_warning += 1
+
+            # do not flood the logs while the executor is saturated
+            now = time.monotonic()
+            if now - self._last_warning < self.warning_interval:
+                return
+            self._last_warning = now
+            slow_tasks, self._slow_tasks_since_warning = (
+                self._slow_tasks_since_warning,
+                0,
+            )
+            queue_depth = self.stats.queue_depth
+
+        logger.warning(
+            "%s saturated: %d task(s) waited longer than %.3fs "
+            "for one of %d worker threads (last wait %.3fs, queue depth %d).",
+            self.name,
+            slow_tasks,
+            self.wait_warning_threshold,
+            self.max_workers,
+            wait_time,
+            queue_depth,
+        )
+
+    def log_stats(self) -> None:
+        stats = self.stats
+        logger.info(
+            "%s: %d task(s) on %d worker threads, "
+            "max queue depth %d, mean wait %.3fs, max wait %.3fs, %d slow task(s).",
+            self.name,
+            stats.started,
+            self.max_workers,
+            stats.max_queue_depth,
+            stats.mean_wait_time,
+            stats.max_wait_time,
+            stats.slow_tasks,
+        )
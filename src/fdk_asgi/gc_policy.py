@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import gc
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from fdk_asgi.types import GCMode
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GCStats:
+    """Garbage collections observed while a GCPolicy was installed.
+    All times are in seconds."""
+
+    collections: list[int] = field(default_factory=lambda: [0, 0, 0])
+    idle_collections: int = 0
+    busy_collections: int = 0
+    total_pause: float = 0.0
+    max_pause: float = 0.0
+    busy_pause: float = 0.0
+
+
+class GCPolicy:
+    """Moves garbage collections out of requests and into the idle time
+    between Fn invocations.
+
+    While at least one request is in flight, automatic collections are either
+    suspended (GCMode.suspend) or become less frequent because the generation 0
+    threshold is raised to busy_threshold (GCMode.thresholds).
+    As soon as no request is active anymore, the collections
+    that automatic garbage collection would have run are run instead.
+
+    So that overlapping requests cannot grow the heap without bound, suspended
+    collections are forced whenever a request starts or finishes while others
+    are still in flight, once busy_threshold allocations have piled up."""
+
+    def __init__(
+        self,
+        mode: GCMode = GCMode.suspend,
+        *,
+        busy_threshold: int = 50_000,
+        freeze_after_startup: bool = True,
+    ) -> None:
+        self.mode = mode
+        self.busy_threshold = busy_threshold
+        self.freeze_after_startup = freeze_after_startup
+        self.stats = GCStats()
+        self.in_flight = 0
+        self._thresholds = gc.get_threshold()
+        self._collection_started: float | None = None
+        self._installed = False
+
+    def install(self) -> None:
+        if self._installed or self.mode == GCMode.off:
+            return
+        self._thresholds = gc.get_threshold()
+        gc.callbacks.append(self._on_collection)
+        self._installed = True
+
+    def uninstall(self) -> None:
+        if not self._installed:
+            return
+        gc.callbacks.remove(self._on_collection)
+        self._set_idle()
+        self._installed = False
+
+    def startup_complete(self) -> None:
+        """Moves everything allocated during application startup
+        into the permanent generation, so later collections skip it."""
+        if self.mode == GCMode.off or not self.freeze_after_startup:
+            return
+        self.install()
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            "Froze %d objects after application startup.", gc.get_freeze_count()
+        )
+
+    def request_started(self) -> None:
+        if not self._installed:
+            self.install()
+        self.in_flight += 1
+        if self.in_flight == 1 and self._installed:
+            self._set_busy()
+        elif self._installed:
+            self._collect_if_overdue()
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        if self.in_flight == 0 and self._installed:
+            self._set_idle()
+            self._collect_if_due()
+        elif self._installed:
+            self._collect_if_overdue()
+
+    def log_stats(self) -> None:
+        stats = self.stats
+        logger.info(
+            "Garbage collections: %d/%d/%d (gen 0/1/2), %d while idle, "
+            "%d during requests pausing them for %.3fs, max pause %.3fs.",
+            *stats.collections,
+            stats.idle_collections,
+            stats.busy_collections,
+            stats.busy_pause,
+            stats.max_pause,
+        )
+
+    def _set_busy(self) -> None:
+        if self.mode == GCMode.suspend:
+            gc.disable()
+        elif self.mode == GCMode.thresholds:
+            gc.set_threshold(
+                max(self.busy_threshold, self._thresholds[0]), *self._thresholds[1:]
+            )
+
+    def _set_idle(self) -> None:
+        if self.mode == GCMode.suspend:
+            gc.enable()
+        elif self.mode == GCMode.thresholds:
+            gc.set_threshold(*self._thresholds)
+
+    def _collect_if_due(self) -> None:
+        """Runs the collection automatic garbage collection would run next."""
+        counts = gc.get_count()
+        if counts[0] >= self._thresholds[0]:
+            self._collect(counts)
+
+    def _collect_if_overdue(self) -> None:
+        """Runs the collection that has been suspended for busy_threshold
+        allocations, even though requests are still in flight."""
+        counts = gc.get_count()
+        if self.mode == GCMode.suspend and counts[0] >= self.busy_threshold:
+            self._collect(counts)
+
+    def _collect(self, counts: tuple[int, int, int]) -> None:
+        generation = 0
+        if counts[1] >= self._thresholds[1]:
+            generation = 2 if counts[2] >= self._thresholds[2] else 1
+        gc.collect(generation)
+
+    def _on_collection(self, phase: str, info: dict[str, Any]) -> None:
+        if phase == "start":
+            self._collection_started = time.perf_counter()
+            return
+        if self._collection_started is None:
+            return
+        pause = time.perf_counter() - self._collection_started
+        self._collection_started = None
+
+        stats = self.stats
+        stats.collections[info["generation"]] += 1
+        stats.total_pause += pause
+        stats.max_pause = max(stats.max_pause, pause)
+        if self.in_flight:
+            stats.busy_collections += 1
+            stats.busy_pause += pause
+        else:
+            stats.idle_collections += 1
@@ -0,0 +1,165 @@
+"""Filtering the request headers passed on to the app.
+
+OCI API Gateway and the Fn agent add lots of infrastructure headers
+(fn-*, oci-*, tracing and forwarding headers) that most apps never look at.
+A HeaderPolicy drops them while FnMiddleware translates the Fn call anyway,
+so neither the app nor its logging has to scan them again.
+
+Patterns are header names, matched case-insensitively against the names
+the app would see (i.e. without the fn-http-h- prefix), or name prefixes
+ending in an asterisk, e.g. "oci-*"."""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# never dropped by allow-lists, as apps cannot read bodies without them
+ALWAYS_ALLOWED = (
+    "content-type",
+    "content-length",
+    "content-encoding",
+    "transfer-encoding",
+)
+# maximum number of distinct header names whose verdict is cached
+MAX_CACHED_NAMES = 4096
+
+
+@dataclass
+class HeaderStats:
+    requests: int = 0
+    headers_removed: int = 0
+    bytes_removed: int = 0
+    max_headers_removed: int = 0
+    max_bytes_removed: int = 0
+
+
+class Patterns:
+    """A compiled set of header name patterns."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        names = set()
+        prefixes = set()
+        for pattern in patterns:
+            pattern = pattern.strip().lower()
+            if pattern.endswith("*"):
+                prefixes.add(pattern[:-1].encode("latin-1"))
+            elif pattern:
+                names.add(pattern.encode("latin-1"))
+        self.names = frozenset(names)
+        self.prefixes = tuple(sorted(prefixes))
+
+    def __bool__(self) -> bool:
+        return bool(self.names or self.prefixes)
+
+    def match(self, name: bytes) -> bool:
+        """Returns whether a lower-case header name matches any of the patterns."""
+        return name in self.names or (
+            bool(self.prefixes) and name.startswith(self.prefixes)
+        )
+
+
+class HeaderPolicy:
+    """Drops request headers not matching allow (if given) or matching deny.
+    Repeated headers matching collapse are joined into one, separated by commas
+    (or semicolons for cookie, see RFC 6265, section 5.4).
+
+    Verdicts are cached per header name, so each name is only matched once."""
+
+    def __init__(
+        self,
+        *,
+        allow: Iterable[str] | None = None,
+        deny: Iterable[str] = (),
+        collapse: Iterable[str] = (),
+    ) -> None:
+        self.allow = None if allow is None else Patterns([*allow, *ALWAYS_ALLOWED])
+        self.deny = Patterns(deny)
+        self.collapse = Patterns(collapse)
+        self.stats = HeaderStats()
+        self._keep: dict[bytes, bool] = {}
+
+    @classmethod
+    def from_options(
+        cls, allow: str | None, deny: str | None, collapse: str | None
+    ) -> HeaderPolicy:
+        """Creates a policy from comma-separated patterns."""
+        return cls(
+            allow=None if allow is None else allow.split(","),
+            deny=(deny or "").split(","),
+            collapse=(collapse or "").split(","),
+        )
+
+    def keeps(self, name: bytes) -> bool:
+        """Returns whether to keep a header, given its lower-case name."""
+        keep = self._keep.get(name)
+        if keep is None:
+            keep = (
+                self.allow is None or self.allow.match(name)
+            ) and not self.deny.match(name)
+            if len(self._keep) < MAX_CACHED_NAMES:
+                self._keep[name] = keep
+        return keep
+
+    def filter(self) -> HeaderFilter:
+        """Returns a filter collecting the headers of a single request."""
+        return HeaderFilter(self)
+
+    def record(self, headers_removed: int, bytes_removed: int) -> None:
+        stats = self.stats
+        stats.requests += 1
+        stats.headers_removed += headers_removed
+        stats.bytes_removed += bytes_removed
+        stats.max_headers_removed = max(stats.max_headers_removed, headers_removed)
+        stats.max_bytes_removed = max(stats.max_bytes_removed, bytes_removed)
+
+    def log_stats(self) -> None:
+        stats = self.stats
+        requests = max(stats.requests, 1)
+        logger.info(
+            "Removed %.1f request headers (%.0f bytes) per request on average, "
+            "at most %d headers (%d bytes), from %d requests.",
+            stats.headers_removed / requests,
+            stats.bytes_removed / requests,
+            stats.max_headers_removed,
+            stats.max_bytes_removed,
+            stats.requests,
+        )
+
+
+class HeaderFilter:
+    """Collects the headers of a single request, applying a HeaderPolicy."""
+
+    def __init__(self, policy: HeaderPolicy) -> None:
+        self.policy = policy
+        self.headers: list[tuple[bytes, bytes]] = []
+        self.headers_removed = 0
+        self.bytes_removed = 0
+        # index of the first header of each collapsed name
+        self._collapsed: dict[bytes, int] = {}
+
+    def add(self, key: bytes, name: bytes, value: bytes) -> None:
+        """Adds a header, given its lower-case name, unless the policy drops it."""
+        policy = self.policy
+        if not policy.keeps(name):
+            self.headers_removed += 1
+            self.bytes_removed += len(key) + len(value)
+            return
+        if policy.collapse and policy.collapse.match(name):
+            index = self._collapsed.get(name)
+            if index is not None:
+                first_key, first_value = self.headers[index]
+                separator = b"; " if name == b"cookie" else b", "
+                self.headers[index] = (first_key, first_value + separator + value)
+                self.headers_removed += 1
+                self.bytes_removed += len(key)
+                return
+            self._collapsed[name] = len(self.headers)
+        self.headers.append((key, value))
+
+    def finish(self) -> list[tuple[bytes, bytes]]:
+        self.policy.record(self.headers_removed, self.bytes_removed)
+        return self.headers
@@ -0,0 +1,65 @@
+"""Helpers for measuring module import times via `python -X importtime`."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Mapping
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+@dataclass(frozen=True)
+class ImportRecord:
+    """A single line of `-X importtime` output. All times are in microseconds."""
+
+    name: str
+    self_time: int
+    cumulative_time: int
+    depth: int
+
+
+def parse(output: str) -> list[ImportRecord]:
+    """Parses `-X importtime` output into records in the order modules finished
+    importing, i.e. every module is listed after all the modules it imports."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_time, cumulative_time, name = line[len(IMPORT_TIME_PREFIX) :].split("|")
+        if not self_time.strip().isdigit():
+            continue  # the header line
+        stripped_name = name.lstrip()
+        records.append(
+            ImportRecord(
+                name=stripped_name.rstrip(),
+                self_time=int(self_time),
+                cumulative_time=int(cumulative_time),
+                depth=(len(name) - len(stripped_name) - 1) // 2,
+            )
+        )
+    return records
+
+
+def measure(
+    code: str,
+    *args: str,
+    python: str = sys.executable,
+    env: Mapping[str, str] | None = None,
+) -> list[ImportRecord]:
+    """Runs code in a fresh interpreter and returns the imports it caused.
+    Any further arguments are passed on via sys.argv."""
+    process = subprocess.run(  # noqa: S603
+        [python, "-X", "importtime", "-c", code, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    return parse(process.stderr)
+
+
+def total_time(records: list[ImportRecord]) -> int:
+    """Returns the time spent importing all top level modules in microseconds."""
+    return sum(record.cumulative_time for record in records if record.depth == 0)
@@ -0,0 +1,170 @@
+"""Generating load on a function the way the Fn agent would."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import itertools
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Sequence
+
+from fdk_asgi.agent import AgentConnection, FnRequest
+from fdk_asgi.types import HTTPProtocolType, LoopSetupType
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Returns the given percentile of already sorted values (nearest rank)."""
+    if not sorted_values:
+        return math.nan
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+@dataclass
+class LoadReport:
+    """Outcome of a load test. All times are in seconds."""
+
+    duration: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, percent: float) -> float:
+        return percentile(sorted(self.latencies), percent)
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests ({self.errors} errors) "
+            f"in {self.duration:.2f}s: {self.throughput:.1f} req/s, "
+            f"p50 {self.percentile(50) * 1000:.2f} ms, "
+            f"p90 {self.percentile(90) * 1000:.2f} ms, "
+            f"p99 {self.percentile(99) * 1000:.2f} ms"
+        )
+
+
+async def generate_load(
+    socket_path: str,
+    requests: Sequence[FnRequest],
+    *,
+    total: int,
+    concurrency: int = 1,
+    warm_up: int = 0,
+) -> LoadReport:
+    """Sends total Fn calls cycling through requests over concurrency connections.
+    The first warm_up calls are not part of the report."""
+    mix = itertools.cycle(requests)
+    remaining = itertools.count(total + warm_up, -1)
+    report = LoadReport()
+
+    async def worker() -> None:
+        connection = await AgentConnection.open(socket_path)
+        try:
+            while (left := next(remaining)) > 0:
+                started = time.perf_counter()
+                try:
+                    response = await connection.call(next(mix))
+                except ConnectionError:
+                    report.errors += 1
+                    await connection.close()
+                    connection = await AgentConnection.open(socket_path)
+                    continue
+                if left <= total:
+                    # the status of the app, which Fn sends with a 200 unless it is
+                    # 502 or 504 (or that of the Fn call, if the call itself failed)
+                    if response.status >= 500:
+                        report.errors += 1
+                    else:
+                        report.latencies.append(time.perf_counter() - started)
+        finally:
+            await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report.duration = time.perf_counter() - started
+    return report
+
+
+def available_loops() -> list[LoopSetupType]:
+    loops = [LoopSetupType.asyncio]
+    if importlib.util.find_spec("uvloop") is not None:
+        loops.append(LoopSetupType.uvloop)
+    return loops
+
+
+def available_protocols() -> list[HTTPProtocolType]:
+    return [
+        protocol
+        for protocol in (HTTPProtocolType.h11, HTTPProtocolType.httptools)
+        if importlib.util.find_spec(protocol.value) is not None
+    ]
+
+
+def wait_for_socket(
+    path: Path, process: subprocess.Popen[bytes], *, timeout: float = 30
+) -> None:
+    deadline = time.monotonic() + timeout
+    while not path.exists():
+        if process.poll() is not None:
+            msg = f"serve exited with code {process.returncode}."
+            raise RuntimeError(msg)
+        if time.monotonic() > deadline:
+            msg = f"serve did not create {path} within {timeout}s."
+            raise TimeoutError(msg)
+        time.sleep(0.05)
+
+
+def benchmark_server(
+    app_uri: str,
+    requests: Sequence[FnRequest],
+    *,
+    loop: LoopSetupType,
+    http: HTTPProtocolType,
+    total: int,
+    concurrency: int = 1,
+    warm_up: int = 0,
+    env: dict[str, str] | None = None,
+) -> LoadReport:
+    """Starts `fdk-asgi-serve APP` with the given loop and HTTP protocol
+    in a subprocess and generates load on it."""
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = Path(directory) / "fdk-asgi.socket"
+        process = subprocess.Popen(  # noqa: S603
+            [sys.executable, "-c", "from fdk_asgi.main import serve; serve()", app_uri],
+            env={
+                **os.environ,
+                **(env or {}),
+                "FN_LISTENER": f"unix:{socket_path}",
+                "FDK_ASGI_LOOP": loop.value,
+                "FDK_ASGI_HTTP": http.value,
+                "FDK_ASGI_LOG_LEVEL": "warning",
+            },
+            stdout=subprocess.DEVNULL,  # skip the access log
+        )
+        try:
+            wait_for_socket(socket_path, process)
+            return asyncio.run(
+                generate_load(
+                    str(socket_path),
+                    requests,
+                    total=total,
+                    concurrency=concurrency,
+                    warm_up=warm_up,
+                )
+            )
+        finally:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,176 @@
+"""Entry points of the command line interface.
+
+Importing typer costs more than everything else at cold start.
+When Fn starts a function, all options are usually taken from environment variables,
+so the plain `fdk-asgi-serve APP` case skips typer and parses those directly."""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Mapping
+
+from fdk_asgi.types import (
+    DeferredPolicy,
+    GCMode,
+    HTTPProtocolType,
+    InterfaceType,
+    LifespanType,
+    LoopSetupType,
+    RecycleMode,
+)
+
+# same values as accepted by click.BOOL
+TRUE_VALUES = frozenset({"1", "true", "t", "yes", "y", "on"})
+FALSE_VALUES = frozenset({"0", "false", "f", "no", "n", "off"})
+
+
+def to_bool(value: str) -> bool:
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    msg = f"{value!r} is not a valid boolean."
+    raise ValueError(msg)
+
+
+def to_positive_float(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        msg = f"{value!r} is not positive."
+        raise ValueError(msg)
+    return number
+
+
+def to_positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        msg = f"{value!r} is not positive."
+        raise ValueError(msg)
+    return number
+
+
+# keep in sync with the options of fdk_asgi.cli.serve (including their validation)
+ENV_OPTIONS: dict[str, tuple[str, Callable[[str], Any]]] = {
+    "uds": ("FN_LISTENER", str),
+    "loop": ("FDK_ASGI_LOOP", LoopSetupType),
+    "http": ("FDK_ASGI_HTTP", HTTPProtocolType),
+    "lifespan": ("FDK_ASGI_LIFESPAN", LifespanType),
+    "env_file": ("FDK_ASGI_ENV_FILE", Path),
+    "log_config": ("FDK_ASGI_LOG_CONFIG", Path),
+    "log_level": ("FDK_ASGI_LOG_LEVEL", str),
+    "proxy_headers": ("FDK_ASGI_PROXY_HEADERS", to_bool),
+    "server_header": ("FDK_ASGI_SERVER_HEADER", to_bool),
+    "date_header": ("FDK_ASGI_DATE_HEADER", to_bool),
+    "prefix": ("FDK_ASGI_PREFIX", str),
+    "timeout_keep_alive": ("FDK_ASGI_TIMEOUT_KEEP_ALIVE", int),
+    "factory": ("FDK_ASGI_FACTORY", to_bool),
+    "h11_max_incomplete_event_size": ("FDK_ASGI_H11_MAX_INCOMPLETE_EVENT_SIZE", int),
+    "default_executor_workers": ("FDK_ASGI_DEFAULT_EXECUTOR_WORKERS", int),
+    "executor_wait_warning": ("FDK_ASGI_EXECUTOR_WAIT_WARNING", float),
+    "gc_mode": ("FDK_ASGI_GC_MODE", GCMode),
+    "gc_busy_threshold": ("FDK_ASGI_GC_BUSY_THRESHOLD", int),
+    "limit_max_requests": ("FDK_ASGI_LIMIT_MAX_REQUESTS", int),
+    "limit_max_memory": ("FDK_ASGI_LIMIT_MAX_MEMORY", int),
+    "recycle": ("FDK_ASGI_RECYCLE", RecycleMode),
+    "preload_manifest": ("FDK_ASGI_PRELOAD_MANIFEST", Path),
+    "preload_background": ("FDK_ASGI_PRELOAD_BACKGROUND", to_bool),
+    "capture_file": ("FDK_ASGI_CAPTURE_FILE", Path),
+    "capture_sample_rate": ("FDK_ASGI_CAPTURE_SAMPLE_RATE", float),
+    "capture_max_body_size": ("FDK_ASGI_CAPTURE_MAX_BODY_SIZE", int),
+    "access_log_buffer": ("FDK_ASGI_ACCESS_LOG_BUFFER", Path),
+    "access_log_buffer_size": ("FDK_ASGI_ACCESS_LOG_BUFFER_SIZE", int),
+    "batch_path": ("FDK_ASGI_BATCH_PATH", str),
+    "batch_concurrency": ("FDK_ASGI_BATCH_CONCURRENCY", int),
+    "static_directory": ("FDK_ASGI_STATIC_DIRECTORY", Path),
+    "static_path": ("FDK_ASGI_STATIC_PATH", str),
+    "buffer_request_body": ("FDK_ASGI_BUFFER_REQUEST_BODY", to_bool),
+    "spool_threshold": ("FDK_ASGI_SPOOL_THRESHOLD", int),
+    "header_allow": ("FDK_ASGI_HEADER_ALLOW", str),
+    "header_deny": ("FDK_ASGI_HEADER_DENY", str),
+    "header_collapse": ("FDK_ASGI_HEADER_COLLAPSE", str),
+    "rate_limit": ("FDK_ASGI_RATE_LIMIT", to_positive_float),
+    "rate_limit_burst": ("FDK_ASGI_RATE_LIMIT_BURST", to_positive_int),
+    "rate_limit_header": ("FDK_ASGI_RATE_LIMIT_HEADER", str),
+    "interface": ("FDK_ASGI_INTERFACE", InterfaceType),
+    "wsgi_workers": ("FDK_ASGI_WSGI_WORKERS", int),
+    "deferred_work": ("FDK_ASGI_DEFERRED_WORK", DeferredPolicy),
+    "trace_file": ("FDK_ASGI_TRACE_FILE", str),
+    "trace_sample_rate": ("FDK_ASGI_TRACE_SAMPLE_RATE", float),
+    "tuning_file": ("FDK_ASGI_TUNING_FILE", Path),
+    "cors_allow_origins": ("FDK_ASGI_CORS_ALLOW_ORIGINS", str),
+    "cors_allow_methods": ("FDK_ASGI_CORS_ALLOW_METHODS", str),
+    "cors_allow_headers": ("FDK_ASGI_CORS_ALLOW_HEADERS", str),
+    "cors_max_age": ("FDK_ASGI_CORS_MAX_AGE", int),
+    "cors_file": ("FDK_ASGI_CORS_FILE", Path),
+    "pools_file": ("FDK_ASGI_POOLS_FILE", Path),
+    "pool_refresh_interval": ("FDK_ASGI_POOL_REFRESH_INTERVAL", float),
+    "compact_scope": ("FDK_ASGI_COMPACT_SCOPE", to_bool),
+}
+
+
+def options_from_env(environ: Mapping[str, str]) -> dict[str, Any]:
+    """Reads all options of the serve command from environment variables.
+    Raises ValueError if any of them cannot be parsed."""
+    options = {}
+    for name, (envvar, convert) in ENV_OPTIONS.items():
+        value = environ.get(envvar)
+        # click ignores empty environment variables as well
+        if value:
+            options[name] = convert(value)
+    return options
+
+
+# the arguments of the serve command, kept to restart the server (see restart_command)
+serve_args: list[str] | None = None
+
+
+def restart_command() -> list[str]:
+    """Returns the command line that runs the serve command again with the same arguments.
+    sys.argv[0] may be a console script or the path of a module, which the interpreter
+    cannot reliably run again, so the entry point is imported explicitly."""
+    args = sys.argv[1:] if serve_args is None else serve_args
+    return [sys.executable, "-c", "from fdk_asgi.main import serve; serve()", *args]
+
+
+def serve_from_env(args: list[str]) -> bool:
+    """Serves the app if args consist of APP only and all options are valid.
+    Returns False if the command line needs to be parsed by typer."""
+    if len(args) != 1 or args[0].startswith("-"):
+        return False
+    try:
+        options = options_from_env(os.environ)
+    except ValueError:
+        return False  # let typer report the invalid value
+
+    from fdk_asgi.server import run
+
+    run(args[0], **options)
+    return True
+
+
+def serve() -> None:
+    """Runs the fdk-asgi-serve command."""
+    global serve_args
+    serve_args = sys.argv[1:]
+    if serve_from_env(serve_args):
+        return
+
+    from fdk_asgi.cli import app
+
+    app()
+
+
+def main() -> None:
+    """Runs the fdk-asgi command."""
+    global serve_args
+    if sys.argv[1:2] == ["serve"]:
+        serve_args = sys.argv[2:]
+        if serve_from_env(serve_args):
+            return
+
+    from fdk_asgi.cli import cli
+
+    cli()
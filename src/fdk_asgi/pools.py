@@ -0,0 +1,353 @@
+"""Keeping outbound connection pools warm across Fn invocations.
+
+Fn freezes the container between bursts of calls, so pooled connections to
+downstream services go stale meanwhile, and the first call of the next burst
+pays for reconnecting. A PoolRegistry opens the minimum number of connections
+of each pool before the server accepts calls, and validates and refreshes idle
+connections as soon as no call is in flight, i.e. in the idle window before the
+container is frozen. FnMiddleware puts it into the lifespan state, so apps find
+it in the state of each request:
+
+    pool = request.state.fdk_asgi_pools["users"]
+    async with pool.connection() as connection:
+        connection.writer.write(...)
+
+Pools of TCP connections can be configured in a JSON file, for example
+{"users": {"host": "users.internal", "port": 443, "ssl": true, "min_size": 2}}.
+Apps may also add their own pools while handling the lifespan startup event."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import ssl as ssl_module
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    NamedTuple,
+    TypeVar,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from fdk_asgi.types import Scope
+
+# a valid identifier, for request.state.fdk_asgi_pools in Starlette apps
+POOLS = "fdk_asgi_pools"
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class PoolStats:
+    """What happened to the connections of a pool.
+    Reconnects are connections opened to replace stale or broken ones."""
+
+    opened: int = 0
+    reconnects: int = 0
+    stale: int = 0
+    broken: int = 0
+    validated: int = 0
+
+
+class _Pooled(Generic[T]):
+    __slots__ = ("connection", "last_used")
+
+    def __init__(self, connection: T) -> None:
+        self.connection = connection
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool(Generic[T]):
+    """A pool of up to max_size connections opened by connect.
+
+    Idle connections rejected by validate are closed instead of being handed out.
+    Without validate, idle connections older than max_idle seconds are closed
+    instead, though their age includes the time the container was frozen.
+    Connections whose user raised an exception are closed as well,
+    as their state is unknown."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[T]],
+        *,
+        close: Callable[[T], Awaitable[None]] | None = None,
+        validate: Callable[[T], Awaitable[bool]] | None = None,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 60.0,
+    ) -> None:
+        self._connect = connect
+        self._close = close
+        self._validate = validate
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.stats = PoolStats()
+        self.size = 0
+        self._idle: deque[_Pooled[T]] = deque()
+        # created lazily, as it binds to the running loop on Python < 3.10
+        self._semaphore: asyncio.Semaphore | None = None
+        # connections discarded but not replaced yet
+        self._discarded = 0
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[T]:
+        pooled = await self.acquire()
+        try:
+            yield pooled.connection
+        except BaseException:
+            self.stats.broken += 1
+            await self.discard(pooled)
+            raise
+        self.release(pooled)
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limits the connections that are in use or being opened or validated."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_size)
+        return self._semaphore
+
+    async def acquire(self) -> _Pooled[T]:
+        await self.semaphore.acquire()
+        try:
+            while self._idle:
+                pooled = self._idle.pop()  # the most recently used one
+                if await self._is_usable(pooled):
+                    return pooled
+                await self._discard(pooled)
+            return await self._open()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    def release(self, pooled: _Pooled[T]) -> None:
+        pooled.last_used = time.monotonic()
+        self._idle.append(pooled)
+        self.semaphore.release()
+
+    async def discard(self, pooled: _Pooled[T]) -> None:
+        """Closes an acquired connection instead of releasing it."""
+        try:
+            await self._discard(pooled)
+        finally:
+            self.semaphore.release()
+
+    async def open(self) -> None:
+        """Opens connections until there are at least min_size."""
+        min_size = min(self.min_size, self.max_size)
+        while self.size < min_size:
+            async with self.semaphore:
+                if self.size >= min_size:
+                    break
+                self._idle.appendleft(await self._open())
+
+    async def refresh(self) -> None:
+        """Closes stale or invalid idle connections and opens new ones
+        until there are at least min_size again."""
+        for _ in range(len(self._idle)):
+            async with self.semaphore:
+                if not self._idle:
+                    break
+                pooled = self._idle.popleft()  # the least recently used one
+                if await self._is_usable(pooled):
+                    self._idle.append(pooled)
+                else:
+                    await self._discard(pooled)
+        await self.open()
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._discard(self._idle.pop())
+        self._discarded = 0
+
+    async def _open(self) -> _Pooled[T]:
+        pooled = _Pooled(await self._connect())
+        self.size += 1
+        self.stats.opened += 1
+        if self._discarded:
+            self._discarded -= 1
+            self.stats.reconnects += 1
+        return pooled
+
+    async def _discard(self, pooled: _Pooled[T]) -> None:
+        self.size -= 1
+        self._discarded += 1
+        if self._close is None:
+            return
+        try:
+            await self._close(pooled.connection)
+        except Exception:
+            logger.debug("Exception while closing a pooled connection.", exc_info=True)
+
+    async def _is_usable(self, pooled: _Pooled[T]) -> bool:
+        if self._validate is None:
+            usable = time.monotonic() - pooled.last_used <= self.max_idle
+        else:
+            self.stats.validated += 1
+            try:
+                usable = await self._validate(pooled.connection)
+            except Exception:
+                usable = False
+        if not usable:
+            self.stats.stale += 1
+        return usable
+
+
+class TCPConnection(NamedTuple):
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+
+def tcp_pool(
+    host: str,
+    port: int,
+    *,
+    ssl: ssl_module.SSLContext | bool | None = None,
+    min_size: int = 1,
+    max_size: int = 10,
+) -> ConnectionPool[TCPConnection]:
+    """Returns a pool of (TLS) connections to host and port. Idle connections
+    are considered valid as long as the other side did not close them."""
+
+    async def connect() -> TCPConnection:
+        return TCPConnection(*await asyncio.open_connection(host, port, ssl=ssl))
+
+    async def close(connection: TCPConnection) -> None:
+        connection.writer.close()
+        await connection.writer.wait_closed()
+
+    async def validate(connection: TCPConnection) -> bool:
+        return not (connection.reader.at_eof() or connection.writer.is_closing())
+
+    return ConnectionPool(
+        connect,
+        close=close,
+        validate=validate,
+        min_size=min_size,
+        max_size=max_size,
+    )
+
+
+class PoolRegistry:
+    """Named connection pools, refreshed as soon as the last call in flight
+    finished, and every refresh_interval seconds afterwards for as long as
+    no call arrives (and the container is not frozen)."""
+
+    def __init__(self, *, refresh_interval: float = 10.0) -> None:
+        self.refresh_interval = refresh_interval
+        self.pools: dict[str, ConnectionPool[object]] = {}
+        self.in_flight = 0
+        self._refresh_timer: asyncio.TimerHandle | None = None
+        self._refresh_task: asyncio.Task[None] | None = None
+
+    @classmethod
+    def from_file(cls, path: Path, *, refresh_interval: float = 10.0) -> PoolRegistry:
+        """Creates a registry of TCP connection pools, configured by
+        a JSON object mapping names to the keyword arguments of tcp_pool."""
+        registry = cls(refresh_interval=refresh_interval)
+        name = None
+        try:
+            for name, options in json.loads(path.read_text()).items():
+                registry.add(name, tcp_pool(**options))
+        except TypeError as exception:
+            msg = f"Invalid connection pool {name} in {path}: {exception}"
+            raise ValueError(msg) from exception
+        return registry
+
+    def add_to_state(self, scope: Scope) -> None:
+        """Puts the registry into the state of a lifespan scope, if supported."""
+        if "state" in scope:
+            scope["state"][POOLS] = self
+
+    def add(self, name: str, pool: ConnectionPool[T]) -> ConnectionPool[T]:
+        self.pools[name] = pool  # type: ignore[assignment]
+        return pool
+
+    def __getitem__(self, name: str) -> ConnectionPool[object]:
+        return self.pools[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.pools
+
+    async def open(self) -> None:
+        """Opens the minimum number of connections of all pools.
+        Pools that cannot be opened are logged and retried when refreshing."""
+        results = await asyncio.gather(
+            *(pool.open() for pool in self.pools.values()), return_exceptions=True
+        )
+        for name, result in zip(self.pools, results):
+            if isinstance(result, Exception):
+                logger.error("Could not open connection pool %s: %r", name, result)
+
+    async def refresh(self) -> None:
+        for name, pool in self.pools.items():
+            if self.in_flight:
+                return  # a burst started, leave the connections to it
+            try:
+                await pool.refresh()
+            except Exception:
+                logger.exception("Could not refresh connection pool %s.", name)
+
+    async def close(self) -> None:
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if self._refresh_task is not None:
+            await self._refresh_task
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        if not self.in_flight and self.pools:
+            self._start_refresh()
+
+    def _schedule_refresh(self) -> None:
+        if self.pools and self._refresh_timer is None:
+            self._refresh_timer = asyncio.get_running_loop().call_later(
+                self.refresh_interval, self._start_refresh
+            )
+
+    def _start_refresh(self) -> None:
+        self._refresh_timer = None
+        if self._refresh_task is None and not self.in_flight:
+            self._refresh_task = asyncio.ensure_future(self._run_refresh())
+
+    async def _run_refresh(self) -> None:
+        try:
+            await self.refresh()
+        finally:
+            self._refresh_task = None
+        if not self.in_flight:
+            self._schedule_refresh()
+
+    def log_stats(self) -> None:
+        for name, pool in self.pools.items():
+            logger.info(
+                "Connection pool %s: %d connections opened, %d reconnects, "
+                "%d stale, %d broken, %d validations.",
+                name,
+                pool.stats.opened,
+                pool.stats.reconnects,
+                pool.stats.stale,
+                pool.stats.broken,
+                pool.stats.validated,
+            )
@@ -0,0 +1,128 @@
+"""Importing the modules recorded by `fdk-asgi prepare` ahead of the application."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import logging
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from fdk_asgi.types import ASGIApp, Message
+
+logger = logging.getLogger(__name__)
+
+PYTHON_VERSION = ".".join(map(str, sys.version_info[:3]))
+
+
+@dataclass
+class PreloadManifest:
+    """Modules imported while warming up an application,
+    ordered such that every module comes after the modules it imports."""
+
+    app: str
+    modules: list[str] = field(default_factory=list)
+    python: str = PYTHON_VERSION
+
+    def dump(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> PreloadManifest:
+        return cls(**json.loads(path.read_text()))
+
+
+def preload(modules: Iterable[str]) -> int:
+    """Imports the given modules in order, skipping those that fail to import.
+    Returns the number of newly imported modules."""
+    imported = 0
+    for name in modules:
+        if name in sys.modules or name == "__main__":
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception:
+            logger.debug("Could not preload module %s.", name, exc_info=True)
+        else:
+            imported += 1
+    return imported
+
+
+def preload_manifest(path: Path, *, background: bool = False) -> None:
+    """Preloads the modules listed in a manifest,
+    either right away or in a daemon thread."""
+    try:
+        manifest = PreloadManifest.load(path)
+    except (OSError, ValueError, TypeError) as exception:
+        logger.warning("Ignoring preload manifest %s: %s", path, exception)
+        return
+    if manifest.python != PYTHON_VERSION:
+        logger.warning(
+            "Ignoring preload manifest %s recorded with Python %s.",
+            path,
+            manifest.python,
+        )
+        return
+
+    if background:
+        threading.Thread(
+            target=preload,
+            args=(manifest.modules,),
+            name="fdk-asgi-preload",
+            daemon=True,
+        ).start()
+    else:
+        preload(manifest.modules)
+
+
+def warm_up(
+    app_uri: str,
+    *,
+    factory: bool = False,
+    manifest: Path | None = None,
+    module_files: Path | None = None,
+) -> None:
+    """Loads an application like the serve command does and runs its lifespan,
+    so that modules imported lazily during startup get imported as well.
+
+    Optionally writes the source files of all loaded modules to module_files."""
+    from fdk_asgi.app import FnMiddleware
+    from fdk_asgi.server import load_app
+
+    if manifest is not None:
+        preload_manifest(manifest)
+    asyncio.run(run_lifespan(FnMiddleware(load_app(app_uri, factory=factory))))
+
+    if module_files is not None:
+        files = {
+            name: getattr(module, "__file__", None)
+            for name, module in list(sys.modules.items())
+        }
+        module_files.write_text(json.dumps(files))
+
+
+async def run_lifespan(app: ASGIApp) -> None:
+    """Runs the lifespan startup and, right after it, the shutdown of an app."""
+    messages = iter(({"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}))
+
+    async def receive() -> Message:
+        return next(messages)
+
+    async def send(message: Message) -> None:
+        if message["type"].endswith(".failed"):
+            raise RuntimeError(message.get("message", ""))
+
+    scope = {
+        "type": "lifespan",
+        "asgi": {"version": "3.0", "spec_version": "2.0"},
+        "state": {},
+    }
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        logger.info("Application does not support the lifespan protocol.")
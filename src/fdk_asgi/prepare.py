@@ -0,0 +1,119 @@
+"""Build time preparation of function images for fast cold starts."""
+
+from __future__ import annotations
+
+import compileall
+import json
+import py_compile
+import sysconfig
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from fdk_asgi import importtime
+from fdk_asgi.preload import PreloadManifest
+
+WARM_UP_CODE = """\
+import sys
+from pathlib import Path
+from fdk_asgi.preload import warm_up
+warm_up(
+    sys.argv[1],
+    factory=sys.argv[2] == "factory",
+    manifest=Path(sys.argv[3]) if sys.argv[3] else None,
+    module_files=Path(sys.argv[4]),
+)
+"""
+
+
+@dataclass
+class WarmUpRun:
+    """Imports recorded while warming up an application in a fresh interpreter."""
+
+    records: list[importtime.ImportRecord]
+    module_files: dict[str, str | None]
+
+    @property
+    def total_time(self) -> int:
+        return importtime.total_time(self.records)
+
+
+def warm_up(
+    app_uri: str, *, factory: bool = False, manifest: Path | None = None
+) -> WarmUpRun:
+    with tempfile.TemporaryDirectory() as directory:
+        module_files = Path(directory) / "module-files.json"
+        records = importtime.measure(
+            WARM_UP_CODE,
+            app_uri,
+            "factory" if factory else "",
+            "" if manifest is None else str(manifest),
+            str(module_files),
+        )
+        return WarmUpRun(records, json.loads(module_files.read_text()))
+
+
+def build_manifest(app_uri: str, run: WarmUpRun) -> PreloadManifest:
+    modules = []
+    seen = set()
+    for record in run.records:
+        if record.name not in seen and record.name in run.module_files:
+            seen.add(record.name)
+            modules.append(record.name)
+    return PreloadManifest(app=app_uri, modules=modules)
+
+
+def find_compile_roots(module_files: dict[str, str | None]) -> list[Path]:
+    """Returns the directories of all imported top level packages and the files
+    of all imported top level modules, except for those of the standard library."""
+    roots = set()
+    for name, file in module_files.items():
+        if file is None or not file.endswith(".py"):
+            continue
+        path = Path(file).resolve()
+        depth = name.count(".") + (path.name == "__init__.py")
+        root = path.parents[depth - 1] if depth else path
+        if not is_stdlib(root):
+            roots.add(root)
+    return sorted(roots)
+
+
+@lru_cache(maxsize=None)
+def get_install_paths() -> dict[str, Path]:
+    return {
+        name: Path(value).resolve() for name, value in sysconfig.get_paths().items()
+    }
+
+
+def is_stdlib(path: Path) -> bool:
+    paths = get_install_paths()
+    if is_within(path, paths["purelib"]) or is_within(path, paths["platlib"]):
+        return False
+    return is_within(path, paths["stdlib"]) or is_within(path, paths["platstdlib"])
+
+
+def is_within(path: Path, directory: Path) -> bool:
+    return path == directory or directory in path.parents
+
+
+def byte_compile(
+    roots: list[Path],
+    *,
+    invalidation_mode: py_compile.PycInvalidationMode | None = None,
+) -> bool:
+    success = True
+    for root in roots:
+        if root.is_dir():
+            success &= bool(
+                compileall.compile_dir(
+                    root, quiet=1, workers=0, invalidation_mode=invalidation_mode
+                )
+            )
+        else:
+            success &= bool(
+                compileall.compile_file(
+                    root, quiet=1, invalidation_mode=invalidation_mode
+                )
+            )
+    return success
@@ -0,0 +1,104 @@
+"""Rate limiting requests per client, before they reach the app.
+
+Each client gets a token bucket refilled at a constant rate. The table
+of buckets is bounded: once it is full, the least recently seen client
+is evicted, which is the same as granting it a full bucket again."""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from fdk_asgi.types import Scope, Send
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Allows each client rate requests per second on average, in bursts of up to
+    burst requests. Excess requests are answered with 429 Too Many Requests.
+
+    Clients are told apart by the last address in the given header, i.e. the one
+    added by the API Gateway, as all others may be forged by the client.
+    Without that header, the client address of the scope is used, and requests
+    without either share a single bucket."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int | None = None,
+        *,
+        key_header: str = "x-forwarded-for",
+        max_clients: int = 65536,
+    ) -> None:
+        if not rate > 0:
+            msg = f"The rate limit must be positive, not {rate}."
+            raise ValueError(msg)
+        if burst is not None and burst < 1:
+            msg = f"The burst must be at least 1, not {burst}."
+            raise ValueError(msg)
+        self.rate = rate
+        self.burst = max(1, math.ceil(rate)) if burst is None else burst
+        self.key_header = key_header.lower().encode("latin-1")
+        self.max_clients = max_clients
+        self.buckets: OrderedDict[bytes, TokenBucket] = OrderedDict()
+        self.rejected = 0
+
+    def client_key(self, scope: Scope) -> bytes:
+        value: bytes | None = None
+        for key, header_value in scope["headers"]:
+            if key.lower() == self.key_header:
+                value = header_value  # the last one wins
+        if value is not None:
+            return value.rpartition(b",")[2].strip()
+        client = scope.get("client")
+        return b"" if not client else str(client[0]).encode()
+
+    def acquire(self, key: bytes, now: float | None = None) -> float:
+        """Takes a token from the bucket of a client. Returns 0 on success,
+        otherwise the number of seconds until the next token is available."""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.burst, now)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.tokens = min(
+                self.burst, bucket.tokens + (now - bucket.updated) * self.rate
+            )
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+    async def admit(self, scope: Scope, send: Send) -> bool:
+        """Returns whether a request may pass, otherwise sends the rejection."""
+        retry_after = self.acquire(self.client_key(scope))
+        if not retry_after:
+            return True
+        self.rejected += 1
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(HTTPStatus.TOO_MANY_REQUESTS),
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"retry-after", str(math.ceil(retry_after)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"Too Many Requests"})
+        return False
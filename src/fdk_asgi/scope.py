@@ -0,0 +1,133 @@
+"""A compact representation of HTTP connection scopes.
+
+FnMiddleware usually rewrites the dict scope of the server in place and translates
+all headers of the Fn call into a new list on every call. With compact_scope, it
+maps the scope into a CompactScope instead: the standard keys of HTTP connection
+scopes are stored in slots, and the headers of the HTTP request are only translated
+once they are looked up for the first time, so apps (and stages) that never look at
+them skip that entirely. A header policy filters them right away, though."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, List, MutableMapping, Tuple
+
+Headers = List[Tuple[bytes, bytes]]
+
+# see https://asgi.readthedocs.io/en/latest/specs/www.html#http-connection-scope
+FIELDS = (
+    "type",
+    "asgi",
+    "http_version",
+    "method",
+    "scheme",
+    "path",
+    "raw_path",
+    "query_string",
+    "root_path",
+    "headers",
+    "client",
+    "server",
+    "state",
+    "extensions",
+)
+_FIELDS = frozenset(FIELDS)
+
+
+class CompactScope(MutableMapping[str, Any]):
+    """A scope storing the standard keys in slots and any others in a dict.
+    The headers may be deferred, i.e. computed by a function when first looked up."""
+
+    __slots__ = (*FIELDS, "_extra", "_deferred_headers")
+
+    def __init__(self, scope: MutableMapping[str, Any] | None = None) -> None:
+        self._extra: dict[str, Any] | None = None
+        self._deferred_headers: Callable[[], Headers] | None = None
+        if scope is not None:
+            for key, value in scope.items():
+                if key in _FIELDS:
+                    setattr(self, key, value)
+                else:
+                    self[key] = value
+
+    def defer_headers(self, translate: Callable[[], Headers]) -> None:
+        """Sets the headers to the outcome of translate, once they are looked up."""
+        self._deferred_headers = translate
+        if hasattr(self, "headers"):
+            del self.headers
+
+    def _resolve_headers(self) -> None:
+        translate = self._deferred_headers
+        if translate is not None:
+            self._deferred_headers = None
+            self.headers = translate()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                if key == "headers" and self._deferred_headers is not None:
+                    self._resolve_headers()
+                    return self.headers
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELDS:
+            if key == "headers":
+                self._deferred_headers = None
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELDS:
+            if key == "headers" and self._deferred_headers is not None:
+                self._deferred_headers = None
+                return
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key: object) -> bool:
+        if isinstance(key, str) and key in _FIELDS:
+            if key == "headers" and self._deferred_headers is not None:
+                return True
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if key in self:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # faster than the default implementation relying on KeyError
+        if key in _FIELDS:
+            if key == "headers" and self._deferred_headers is not None:
+                self._resolve_headers()
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def copy(self) -> dict[str, Any]:
+        """Returns a shallow copy as a dict, like dict.copy() would."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.copy()!r})"
@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import resource
+import socket
+import sys
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+try:
+    import uvicorn
+    from uvicorn.importer import import_from_string
+except ModuleNotFoundError as exception:  # pragma: no cover
+    msg = f"Using {__name__} requires the uvicorn package to be installed."
+    raise RuntimeError(msg) from exception
+
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.executor import InstrumentedThreadPoolExecutor
+from fdk_asgi.gc_policy import GCPolicy
+from fdk_asgi.main import restart_command
+from fdk_asgi.tuning import Tuning
+from fdk_asgi.types import (
+    ASGIApp,
+    DeferredPolicy,
+    GCMode,
+    HTTPProtocolType,
+    InterfaceType,
+    LifespanType,
+    LoopSetupType,
+    RecycleMode,
+)
+
+if typing.TYPE_CHECKING:
+    from fdk_asgi.cors import CORSPolicy
+    from fdk_asgi.pools import PoolRegistry
+    from fdk_asgi.tracing import Tracer
+
+UDS_PREFIX = "unix:"
+DEFAULT_LOGGING_CONFIG = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {
+            "()": "uvicorn.logging.DefaultFormatter",
+            "fmt": "%(levelprefix)s %(message)s",
+            "use_colors": None,
+        },
+        "access": {
+            "()": "uvicorn.logging.AccessFormatter",
+            "fmt": '%(levelprefix)s %(client_addr)s - "%(request_line)s" %(status_code)s',
+        },
+    },
+    "handlers": {
+        "default": {
+            "formatter": "default",
+            "class": "logging.StreamHandler",
+            "stream": "ext://sys.stderr",
+        },
+        "access": {
+            "formatter": "access",
+            "class": "logging.StreamHandler",
+            "stream": "ext://sys.stdout",
+        },
+    },
+    "loggers": {
+        "fdk_asgi": {"handlers": ["default"], "level": "INFO"},
+        "fdk_asgi.access": {
+            "handlers": ["access"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "uvicorn": {"handlers": ["default"], "level": "INFO", "propagate": False},
+        "uvicorn.error": {"level": "INFO"},
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RecycleLimits:
+    """Limits after which the server drains and exits,
+    so that it can be replaced by a fresh process."""
+
+    max_requests: int | None = None
+    max_memory: int | None = None  # resident set size in bytes
+
+
+class Server(uvicorn.Server):
+    """A uvicorn server with some tweaks for running inside an Fn container."""
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        *,
+        default_executor: InstrumentedThreadPoolExecutor | None = None,
+        recycle_limits: RecycleLimits | None = None,
+    ) -> None:
+        super().__init__(config)
+        self.default_executor = default_executor
+        self.recycle_limits = recycle_limits
+        self.recycle_reason: str | None = None
+
+    async def serve(self, sockets: list[socket.socket] | None = None) -> None:
+        if self.default_executor is not None:
+            asyncio.get_running_loop().set_default_executor(self.default_executor)
+        try:
+            await super().serve(sockets)
+        finally:
+            if self.default_executor is not None:
+                self.default_executor.log_stats()
+
+    async def startup(self, sockets: list[socket.socket] | None = None) -> None:
+        if self.default_executor is not None:
+            _limit_anyio_worker_threads(self.default_executor.max_workers)
+        await super().startup(sockets)
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        # checking memory once per second is plenty
+        if self.recycle_limits is None or counter % 10 != 0:
+            return False
+
+        self.recycle_reason = self._check_recycle_limits(self.recycle_limits)
+        if self.recycle_reason is None:
+            return False
+        logger.warning(
+            "Recycling server process [%d]: %s. "
+            "Finishing in-flight requests before shutting down.",
+            os.getpid(),
+            self.recycle_reason,
+        )
+        return True
+
+    def _check_recycle_limits(self, limits: RecycleLimits) -> str | None:
+        total_requests = self.server_state.total_requests
+        if limits.max_requests is not None and total_requests >= limits.max_requests:
+            return f"handled {total_requests} of at most {limits.max_requests} requests"
+        if limits.max_memory is not None:
+            rss = get_rss()
+            if rss >= limits.max_memory:
+                return (
+                    f"resident set size of {rss / 2**20:.1f} MiB "
+                    f"exceeds the limit of {limits.max_memory / 2**20:.1f} MiB"
+                )
+        return None
+
+
+def get_rss() -> int:
+    """Returns the current resident set size of this process in bytes."""
+    try:
+        statm = Path("/proc/self/statm").read_bytes()
+        return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # pragma: no cover
+        # not on Linux, fall back to the peak resident set size
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _limit_anyio_worker_threads(max_workers: int) -> None:
+    """Starlette and FastAPI run sync endpoints via anyio's own worker threads
+    instead of the loop's default executor, so size those alike."""
+    if "anyio" not in sys.modules:
+        return
+    from anyio.to_thread import current_default_thread_limiter
+
+    current_default_thread_limiter().total_tokens = max_workers
+
+
+def socket_path_from_uds(uds: str) -> Path:
+    return Path(uds[len(UDS_PREFIX) :]) if uds.startswith(UDS_PREFIX) else Path(uds)
+
+
+def load_app(
+    app_uri: str,
+    *,
+    factory: bool = False,
+    interface: InterfaceType = InterfaceType.asgi,
+    wsgi_workers: int = 8,
+) -> ASGIApp:
+    asgi_app = import_from_string(app_uri)
+    if factory:
+        asgi_app = asgi_app()
+    if interface == InterfaceType.wsgi:
+        from fdk_asgi.wsgi import WSGIBridge
+
+        asgi_app = WSGIBridge(asgi_app, workers=wsgi_workers)
+    return typing.cast(ASGIApp, asgi_app)
+
+
+def create_middleware(
+    asgi_app: ASGIApp,
+    prefix: str = "",
+    *,
+    gc_mode: GCMode = GCMode.off,
+    gc_busy_threshold: int = 50_000,
+    capture_file: Path | None = None,
+    capture_sample_rate: float = 0.01,
+    capture_max_body_size: int = 4096,
+    access_log_buffer: Path | None = None,
+    access_log_buffer_size: int = 65536,
+    batch_path: str | None = None,
+    batch_concurrency: int = 10,
+    static_directory: Path | None = None,
+    static_path: str = "/static",
+    buffer_request_body: bool = False,
+    spool_threshold: int = 2**20,
+    header_allow: str | None = None,
+    header_deny: str | None = None,
+    header_collapse: str | None = None,
+    rate_limit: float | None = None,
+    rate_limit_burst: int | None = None,
+    rate_limit_header: str = "x-forwarded-for",
+    deferred_work: DeferredPolicy | None = None,
+    trace_file: str | None = None,
+    trace_sample_rate: float = 0.1,
+    cors_allow_origins: str | None = None,
+    cors_allow_methods: str = "GET,HEAD,POST,PUT,PATCH,DELETE",
+    cors_allow_headers: str | None = None,
+    cors_max_age: int = 600,
+    cors_file: Path | None = None,
+    pools_file: Path | None = None,
+    pool_refresh_interval: float = 10.0,
+    compact_scope: bool = False,
+) -> FnMiddleware:
+    """Wraps an ASGI app in a FnMiddleware with all stages enabled
+    that the given options of the serve command ask for."""
+    capture = None
+    if capture_file is not None:
+        from fdk_asgi.capture import TrafficCapture
+
+        capture = TrafficCapture(
+            capture_file,
+            sample_rate=capture_sample_rate,
+            max_body_size=capture_max_body_size,
+        )
+
+    access_log = None
+    if access_log_buffer is not None:
+        from fdk_asgi.accesslog import AccessLogBuffer
+
+        access_log = AccessLogBuffer(access_log_buffer, capacity=access_log_buffer_size)
+
+    batch = None
+    if batch_path is not None:
+        from fdk_asgi.batch import BatchHandler
+
+        batch = BatchHandler(batch_path, concurrency=batch_concurrency)
+
+    static = None
+    if static_directory is not None:
+        from fdk_asgi.static import StaticAssets
+
+        static = StaticAssets(static_directory, static_path)
+
+    request_body = None
+    if buffer_request_body:
+        from fdk_asgi.body import BodyBuffering
+
+        request_body = BodyBuffering(spool_threshold=spool_threshold)
+
+    header_policy = None
+    if (
+        header_allow is not None
+        or header_deny is not None
+        or header_collapse is not None
+    ):
+        from fdk_asgi.headers import HeaderPolicy
+
+        header_policy = HeaderPolicy.from_options(
+            header_allow, header_deny, header_collapse
+        )
+
+    rate_limiter = None
+    if rate_limit is not None:
+        from fdk_asgi.ratelimit import RateLimiter
+
+        rate_limiter = RateLimiter(
+            rate_limit, rate_limit_burst, key_header=rate_limit_header
+        )
+
+    deferred = None
+    if deferred_work is not None:
+        from fdk_asgi.deferred import DeferredWork
+
+        deferred = DeferredWork(deferred_work)
+
+    return FnMiddleware(
+        asgi_app,
+        prefix,
+        gc_policy=None
+        if gc_mode == GCMode.off
+        else GCPolicy(gc_mode, busy_threshold=gc_busy_threshold),
+        capture=capture,
+        access_log=access_log,
+        batch=batch,
+        static=static,
+        request_body=request_body,
+        header_policy=header_policy,
+        rate_limit=rate_limiter,
+        deferred=deferred,
+        tracing=None
+        if trace_file is None
+        else _create_tracer(trace_file, trace_sample_rate),
+        cors=None
+        if cors_file is None and cors_allow_origins is None
+        else _create_cors(
+            cors_allow_origins,
+            cors_allow_methods,
+            cors_allow_headers,
+            cors_max_age,
+            cors_file,
+        ),
+        pools=None
+        if pools_file is None
+        else _create_pools(pools_file, pool_refresh_interval),
+        compact_scope=compact_scope,
+    )
+
+
+def _create_tracer(trace_file: str, sample_rate: float) -> Tracer:
+    from fdk_asgi.tracing import SpanExporter, Tracer
+
+    return Tracer(SpanExporter(trace_file), sample_rate=sample_rate)
+
+
+def _create_pools(pools_file: Path, refresh_interval: float) -> PoolRegistry:
+    from fdk_asgi.pools import PoolRegistry
+
+    return PoolRegistry.from_file(pools_file, refresh_interval=refresh_interval)
+
+
+def _create_cors(
+    allow_origins: str | None,
+    allow_methods: str,
+    allow_headers: str | None,
+    max_age: int,
+    file: Path | None,
+) -> CORSPolicy:
+    from fdk_asgi.cors import CORSPolicy
+
+    if file is not None:
+        return CORSPolicy.from_file(file)
+    return CORSPolicy.from_options(
+        allow_origins or "*", allow_methods, allow_headers, max_age
+    )
+
+
+def run(
+    app_uri: str,
+    *,
+    uds: str = "unix:./fdk-asgi.socket",
+    loop: LoopSetupType | None = None,
+    http: HTTPProtocolType | None = None,
+    lifespan: LifespanType = LifespanType.auto,
+    env_file: Path | None = None,
+    log_config: Path | None = None,
+    log_level: str | None = None,
+    proxy_headers: bool = True,
+    server_header: bool = True,
+    date_header: bool = True,
+    prefix: str = "",
+    timeout_keep_alive: int = 5,
+    factory: bool = False,
+    h11_max_incomplete_event_size: int | None = None,
+    default_executor_workers: int | None = None,
+    executor_wait_warning: float | None = None,
+    gc_mode: GCMode = GCMode.off,
+    gc_busy_threshold: int = 50_000,
+    limit_max_requests: int | None = None,
+    limit_max_memory: int | None = None,
+    recycle: RecycleMode = RecycleMode.exit,
+    preload_manifest: Path | None = None,
+    preload_background: bool = False,
+    capture_file: Path | None = None,
+    capture_sample_rate: float = 0.01,
+    capture_max_body_size: int = 4096,
+    access_log_buffer: Path | None = None,
+    access_log_buffer_size: int = 65536,
+    batch_path: str | None = None,
+    batch_concurrency: int = 10,
+    static_directory: Path | None = None,
+    static_path: str = "/static",
+    buffer_request_body: bool = False,
+    spool_threshold: int = 2**20,
+    header_allow: str | None = None,
+    header_deny: str | None = None,
+    header_collapse: str | None = None,
+    rate_limit: float | None = None,
+    rate_limit_burst: int | None = None,
+    rate_limit_header: str = "x-forwarded-for",
+    interface: InterfaceType = InterfaceType.asgi,
+    wsgi_workers: int = 8,
+    deferred_work: DeferredPolicy | None = None,
+    trace_file: str | None = None,
+    trace_sample_rate: float = 0.1,
+    tuning_file: Path | None = None,
+    cors_allow_origins: str | None = None,
+    cors_allow_methods: str = "GET,HEAD,POST,PUT,PATCH,DELETE",
+    cors_allow_headers: str | None = None,
+    cors_max_age: int = 600,
+    cors_file: Path | None = None,
+    pools_file: Path | None = None,
+    pool_refresh_interval: float = 10.0,
+    compact_scope: bool = False,
+) -> None:
+    """Serves the ASGI app APP_URI wrapped in a FnMiddleware.
+    See the serve command of fdk_asgi.cli for a description of all options."""
+    if preload_manifest is not None:
+        from fdk_asgi.preload import preload_manifest as preload
+
+        preload(preload_manifest, background=preload_background)
+
+    fn_asgi_app = create_middleware(
+        load_app(
+            app_uri, factory=factory, interface=interface, wsgi_workers=wsgi_workers
+        ),
+        prefix,
+        gc_mode=gc_mode,
+        gc_busy_threshold=gc_busy_threshold,
+        capture_file=capture_file,
+        capture_sample_rate=capture_sample_rate,
+        capture_max_body_size=capture_max_body_size,
+        access_log_buffer=access_log_buffer,
+        access_log_buffer_size=access_log_buffer_size,
+        batch_path=batch_path,
+        batch_concurrency=batch_concurrency,
+        static_directory=static_directory,
+        static_path=static_path,
+        buffer_request_body=buffer_request_body,
+        spool_threshold=spool_threshold,
+        header_allow=header_allow,
+        header_deny=header_deny,
+        header_collapse=header_collapse,
+        rate_limit=rate_limit,
+        rate_limit_burst=rate_limit_burst,
+        rate_limit_header=rate_limit_header,
+        deferred_work=deferred_work,
+        trace_file=trace_file,
+        trace_sample_rate=trace_sample_rate,
+        cors_allow_origins=cors_allow_origins,
+        cors_allow_methods=cors_allow_methods,
+        cors_allow_headers=cors_allow_headers,
+        cors_max_age=cors_max_age,
+        cors_file=cors_file,
+        pools_file=pools_file,
+        pool_refresh_interval=pool_refresh_interval,
+        compact_scope=compact_scope,
+    )
+
+    tuning = None if tuning_file is None else Tuning.load(tuning_file)
+    if tuning is not None:
+        loop, http = tuning.apply(loop, http)
+    loop = LoopSetupType.none if loop is None else loop
+    http = HTTPProtocolType.auto if http is None else http
+
+    socket_path = socket_path_from_uds(uds)
+    # os.umask(0o666)  # todo: check if this is necessary
+
+    config = uvicorn.Config(
+        app=fn_asgi_app,
+        uds=str(socket_path),
+        loop=loop.value,
+        http=http.value,
+        ws="none",
+        lifespan=lifespan.value,
+        env_file=env_file,
+        log_config=DEFAULT_LOGGING_CONFIG
+        if log_config is None
+        else os.fspath(log_config),
+        log_level=log_level,
+        access_log=False,
+        # use_colors: Optional[bool] = None,
+        interface="asgi3",
+        workers=1,
+        proxy_headers=proxy_headers,  # todo: check if Functions supports this header
+        server_header=server_header,  # todo: check if Functions supports this header
+        date_header=date_header,  # todo: check if Functions supports this header
+        # forwarded_allow_ips: Optional[Union[List[str], str]] = None,
+        # root_path="",
+        # limit_concurrency: Optional[int] = None,
+        # limit_max_requests: Optional[int] = None,
+        # backlog: int = 2048,
+        timeout_keep_alive=timeout_keep_alive,
+        # timeout_notify: int = 30,
+        # timeout_graceful_shutdown: Optional[int] = None,
+        # callback_notify: Optional[Callable[..., Awaitable[None]]] = None,
+        # headers: Optional[List[Tuple[str, str]]] = None,
+        factory=False,
+        h11_max_incomplete_event_size=h11_max_incomplete_event_size,
+    )
+
+    if tuning is not None:
+        logger.info(
+            "Using --loop %s --http %s (tuned in %s).",
+            loop.value,
+            http.value,
+            tuning_file,
+        )
+
+    default_executor = None
+    if default_executor_workers is not None or executor_wait_warning is not None:
+        default_executor = InstrumentedThreadPoolExecutor(
+            default_executor_workers, wait_warning_threshold=executor_wait_warning
+        )
+
+    recycle_limits = None
+    if limit_max_requests is not None or limit_max_memory is not None:
+        recycle_limits = RecycleLimits(
+            max_requests=limit_max_requests,
+            max_memory=None if limit_max_memory is None else limit_max_memory * 2**20,
+        )
+
+    server = Server(
+        config, default_executor=default_executor, recycle_limits=recycle_limits
+    )
+    try:
+        server.run()
+    finally:
+        socket_path.unlink(missing_ok=True)
+        if fn_asgi_app.capture is not None:
+            fn_asgi_app.capture.close()
+        if fn_asgi_app.access_log is not None:
+            fn_asgi_app.access_log.close()
+        if fn_asgi_app.tracing is not None:
+            fn_asgi_app.tracing.close()
+
+    if server.recycle_reason is not None and recycle == RecycleMode.restart:
+        logger.info("Restarting server process [%d].", os.getpid())
+        os.execv(sys.executable, restart_command())  # noqa: S606
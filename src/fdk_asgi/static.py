@@ -0,0 +1,283 @@
+"""Serving static assets from memory, without entering the app.
+
+All assets are read at startup, along with their ETag and compressed variants.
+Variants found on disk (e.g. app.js.gz next to app.js) are used as they are,
+all others are compressed once with gzip (and brotli, if installed)."""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+from fdk_asgi.app import FN_HTTP_H_, PATHSEND
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from fdk_asgi.types import Scope, Send
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# content types worth compressing besides text/*
+COMPRESSIBLE_TYPES = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/manifest+json",
+        "application/wasm",
+        "application/xml",
+        "image/svg+xml",
+    }
+)
+# content types to add a charset to besides text/*
+TEXT_TYPES = frozenset({"application/javascript", "application/json"})
+
+
+@dataclass
+class Variant:
+    body: bytes
+    etag: bytes
+
+
+@dataclass
+class Asset:
+    """A static asset with its variants by encoding. Assets too large to be kept
+    in memory have no variants at all and are sent by path instead."""
+
+    path: Path
+    content_type: bytes
+    size: int
+    etag: bytes
+    variants: dict[str, Variant] = field(default_factory=dict)
+
+    def choose(self, accept_encoding: bytes) -> str:
+        """Returns the preferred encoding that is acceptable to the client."""
+        if len(self.variants) > 1 and accept_encoding:
+            accepted = parse_accept_encoding(accept_encoding)
+            for encoding in ENCODING_SUFFIXES:
+                if encoding in self.variants and accepted.get(
+                    encoding, accepted.get("*", 0)
+                ):
+                    return encoding
+        return "identity"
+
+
+def parse_accept_encoding(value: bytes) -> dict[str, float]:
+    accepted = {}
+    for item in value.decode("latin-1").split(","):
+        encoding, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[encoding.strip().lower()] = quality
+    return accepted
+
+
+def make_etag(data: bytes, suffix: str = "") -> bytes:
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return f'"{digest}{suffix}"'.encode()
+
+
+def guess_content_type(path: Path) -> bytes:
+    content_type, _ = mimetypes.guess_type(path.name)
+    if content_type is None:
+        return b"application/octet-stream"
+    if content_type.startswith("text/") or content_type in TEXT_TYPES:
+        content_type += "; charset=utf-8"
+    return content_type.encode()
+
+
+def is_compressible(content_type: bytes) -> bool:
+    media_type = content_type.split(b";")[0].decode()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def compress(data: bytes, encoding: str) -> bytes | None:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ModuleNotFoundError:
+        return None
+    return bytes(brotli.compress(data))
+
+
+class StaticAssets:
+    """Serves the files of a directory below the given URL path from memory.
+
+    index.html files are served for their directory as well, whose path without
+    a trailing slash is redirected to the one with it (like /static to /static/).
+    Files larger than max_size are not kept in memory but sent by path.
+    Compressed variants are only kept if they save at least 10 percent."""
+
+    def __init__(
+        self,
+        directory: Path,
+        path: str = "/static",
+        *,
+        max_size: int = 2**20,
+        min_compress_size: int = 256,
+        cache_control: str | None = None,
+    ) -> None:
+        self.directory = directory
+        self.path = path.rstrip("/")
+        self.max_size = max_size
+        self.min_compress_size = min_compress_size
+        self.cache_control = None if cache_control is None else cache_control.encode()
+        self.assets: dict[str, Asset] = {}
+        # paths of directories with an index.html, but without a trailing slash
+        self.redirects: set[str] = set()
+        self.load()
+
+    def load(self) -> None:
+        self.assets = {}
+        self.redirects = set()
+        files = sorted(path for path in self.directory.rglob("*") if path.is_file())
+        precompressed = {
+            path
+            for path in files
+            for suffix in ENCODING_SUFFIXES.values()
+            if path.suffix == suffix and path.with_suffix("") in files
+        }
+        for file in files:
+            if file in precompressed:
+                continue
+            asset = self._load_asset(file)
+            url_path = f"{self.path}/{file.relative_to(self.directory).as_posix()}"
+            self.assets[url_path] = asset
+            if file.name == "index.html":
+                directory = url_path[: -len("/index.html")]
+                self.assets[directory + "/"] = asset
+                if directory:
+                    self.assets[directory] = asset
+                    self.redirects.add(directory)
+        logger.info(
+            "Loaded %d static assets from %s (%d bytes in memory).",
+            len(files) - len(precompressed),
+            self.directory,
+            self.memory_size,
+        )
+
+    @property
+    def memory_size(self) -> int:
+        # index.html files are registered several times
+        unique_assets = {id(asset): asset for asset in self.assets.values()}
+        return sum(
+            len(variant.body)
+            for asset in unique_assets.values()
+            for variant in asset.variants.values()
+        )
+
+    def _load_asset(self, file: Path) -> Asset:
+        size = file.stat().st_size
+        content_type = guess_content_type(file)
+        if size > self.max_size:
+            return Asset(file, content_type, size, _file_etag(file))
+
+        data = file.read_bytes()
+        etag = make_etag(data)
+        asset = Asset(file, content_type, size, etag, {"identity": Variant(data, etag)})
+        if size < self.min_compress_size or not is_compressible(content_type):
+            return asset
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            precompressed = file.with_name(file.name + suffix)
+            body = (
+                precompressed.read_bytes()
+                if precompressed.is_file()
+                else compress(data, encoding)
+            )
+            if body is not None and len(body) < 0.9 * size:
+                asset.variants[encoding] = Variant(
+                    body, make_etag(body, f"-{encoding}")
+                )
+        return asset
+
+    def lookup(self, scope: Scope) -> Asset | None:
+        if scope["method"] not in {"GET", "HEAD"}:
+            return None
+        return self.assets.get(scope["path"])
+
+    async def send(
+        self,
+        asset: Asset,
+        scope: Scope,
+        fn_headers: Iterable[tuple[bytes, bytes]],
+        send: Send,
+    ) -> None:
+        """Sends an asset, using the original headers of the Fn call to
+        tell the headers of the client apart from those of the Fn agent."""
+        if scope["path"] in self.redirects:
+            return await self._send_redirect(scope, send)
+        accept_encoding, if_none_match = _client_headers(fn_headers)
+        encoding = asset.choose(accept_encoding)
+        variant = asset.variants.get(encoding)
+        etag = asset.etag if variant is None else variant.etag
+        headers = [(b"etag", etag), (b"content-type", asset.content_type)]
+        if len(asset.variants) > 1:
+            headers.append((b"vary", b"accept-encoding"))
+        if self.cache_control is not None:
+            headers.append((b"cache-control", self.cache_control))
+
+        if if_none_match is not None and (
+            if_none_match.strip() == b"*"
+            or etag in (tag.strip() for tag in if_none_match.split(b","))
+        ):
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": headers}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+        size = asset.size if variant is None else len(variant.body)
+        headers.append((b"content-length", str(size).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif variant is None:
+            await send({"type": PATHSEND, "path": str(asset.path)})
+        else:
+            await send({"type": "http.response.body", "body": variant.body})
+
+    @staticmethod
+    async def _send_redirect(scope: Scope, send: Send) -> None:
+        # so that relative URLs in the index.html resolve below the directory
+        location = scope["root_path"] + scope["path"] + "/"
+        if scope["query_string"]:
+            location += "?" + scope["query_string"].decode("latin-1")
+        headers = [(b"location", location.encode("latin-1"))]
+        await send({"type": "http.response.start", "status": 308, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _client_headers(
+    fn_headers: Iterable[tuple[bytes, bytes]],
+) -> tuple[bytes, bytes | None]:
+    """Returns the Accept-Encoding and If-None-Match headers sent by the client."""
+    accept_encoding = b""
+    if_none_match = None
+    for key, value in fn_headers:
+        key_lower = key.lower()
+        if key_lower == FN_HTTP_H_ + b"accept-encoding":
+            accept_encoding = value
+        elif key_lower == FN_HTTP_H_ + b"if-none-match":
+            if_none_match = value
+    return accept_encoding, if_none_match
+
+
+def _file_etag(file: Path) -> bytes:
+    hasher = hashlib.blake2b(digest_size=16)
+    with file.open("rb") as stream:
+        while chunk := stream.read(2**20):
+            hasher.update(chunk)
+    return f'"{hasher.hexdigest()}"'.encode()
@@ -0,0 +1,266 @@
+"""Test clients calling an FnMiddleware in-process, like the Fn agent would.
+
+Unlike starlette.testclient.TestClient, these clients build Fn-style scopes directly
+and call the application on the current event loop, without any thread hops."""
+
+from __future__ import annotations
+
+import asyncio
+import json as json_module
+import typing
+from types import TracebackType
+from typing import Any, Iterable, Mapping
+
+from fdk_asgi.agent import FnRequest, FnResponse, Headers, from_fn_headers
+from fdk_asgi.app import FN_ALLOWED_RESPONSE_CODES, FN_HTTP_H_, FN_HTTP_STATUS
+
+if typing.TYPE_CHECKING:
+    from fdk_asgi.types import ASGIApp, Message, Scope
+
+HeadersLike = typing.Union[Mapping[str, str], Iterable[typing.Tuple[str, str]]]
+
+
+def encode_headers(headers: HeadersLike | None) -> Headers:
+    if headers is None:
+        return []
+    items = headers.items() if isinstance(headers, Mapping) else headers
+    return [(key.lower().encode(), value.encode("latin-1")) for key, value in items]
+
+
+class FnClient:
+    """An async client sending Fn calls to an ASGI application in-process.
+
+    Use it as an async context manager to run the lifespan protocol."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        base_url: str = "http://testserver",
+        lifespan: bool = True,
+    ) -> None:
+        self.app = app
+        self.base_url = base_url.rstrip("/").encode()
+        self.lifespan = lifespan
+        self.state: dict[str, Any] = {}
+        self._lifespan_task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> FnClient:
+        if self.lifespan:
+            await self._start_lifespan()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._lifespan_task is not None:
+            await self._lifespan_receive.put({"type": "lifespan.shutdown"})
+            message = await self._lifespan_send.get()
+            assert message["type"] in {
+                "lifespan.shutdown.complete",
+                "lifespan.shutdown.failed",
+            }
+            await self._lifespan_task
+            self._lifespan_task = None
+
+    async def _start_lifespan(self) -> None:
+        self._lifespan_receive: asyncio.Queue[Message] = asyncio.Queue()
+        self._lifespan_send: asyncio.Queue[Message] = asyncio.Queue()
+        scope = {
+            "type": "lifespan",
+            "asgi": {"version": "3.0", "spec_version": "2.0"},
+            "state": self.state,
+        }
+
+        async def run() -> None:
+            try:
+                await self.app(
+                    scope, self._lifespan_receive.get, self._lifespan_send.put
+                )
+            finally:
+                # unblock startup/shutdown if the app does not support lifespan
+                await self._lifespan_send.put({"type": "lifespan.unsupported"})
+
+        self._lifespan_task = asyncio.ensure_future(run())
+        await self._lifespan_receive.put({"type": "lifespan.startup"})
+        message = await self._lifespan_send.get()
+        if message["type"] == "lifespan.startup.failed":
+            raise RuntimeError(message.get("message", "Lifespan startup failed."))
+        if message["type"] == "lifespan.unsupported":
+            # mirror servers with lifespan=auto and ignore the error
+            await asyncio.gather(self._lifespan_task, return_exceptions=True)
+            self._lifespan_task = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: HeadersLike | None = None,
+        content: bytes = b"",
+        json: Any = None,
+    ) -> FnResponse:
+        encoded_headers = encode_headers(headers)
+        if json is not None:
+            content = json_module.dumps(json).encode()
+            encoded_headers.append((b"content-type", b"application/json"))
+        return await self.send(
+            FnRequest(method.upper(), url.encode(), encoded_headers, content)
+        )
+
+    async def get(self, url: str, **kwargs: Any) -> FnResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> FnResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def send(self, request: FnRequest) -> FnResponse:
+        url = (
+            request.url
+            if request.url.startswith(b"http")
+            else self.base_url + request.url
+        )
+        fn_request = FnRequest(request.method, url, request.headers, request.body)
+        return await self.call(fn_request.to_fn_headers(), request.body)
+
+    async def gather(
+        self, requests: Iterable[FnRequest], *, concurrency: int = 100
+    ) -> list[FnResponse]:
+        """Sends many requests concurrently and returns the responses in order."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(request: FnRequest) -> FnResponse:
+            async with semaphore:
+                return await self.send(request)
+
+        return list(await asyncio.gather(*(send(request) for request in requests)))
+
+    async def call(self, fn_headers: Headers, body: bytes = b"") -> FnResponse:
+        """Sends an Fn call with the given, already Fn-style headers."""
+        scope: Scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "server": ("localhost", 80),
+            "client": ("127.0.0.1", 50000),
+            "scheme": "http",
+            "method": "POST",
+            "root_path": "",
+            "path": "/call",
+            "raw_path": b"/call",
+            "query_string": b"",
+            "headers": [(b"host", b"localhost"), *fn_headers],
+            "state": self.state.copy(),
+        }
+        request_complete = False
+        response_complete = asyncio.Event()
+        response_start: Message | None = None
+        response_body = bytearray()
+
+        async def receive() -> Message:
+            nonlocal request_complete
+            if not request_complete:
+                request_complete = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Message) -> None:
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                assert response_start is None, "Response already started."
+                response_start = message
+            elif message["type"] == "http.response.body":
+                assert response_start is not None, "Response not started yet."
+                assert not response_complete.is_set(), "Response already complete."
+                response_body.extend(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_complete.set()
+
+        assert response_start is not None, "No response was sent."
+        return _to_response(response_start, bytes(response_body))
+
+
+def _to_response(start: Message, body: bytes) -> FnResponse:
+    fn_headers = list(start.get("headers", []))
+    status, headers = from_fn_headers(fn_headers)
+    if status is not None:
+        # only validate actual Fn responses, not errors of the Fn protocol itself
+        assert start["status"] in FN_ALLOWED_RESPONSE_CODES
+        for key, _ in fn_headers:
+            key_lower = key.lower()
+            assert key_lower == b"content-type" or key_lower.startswith(b"fn-")
+            assert key_lower != FN_HTTP_H_ + b"content-type"
+        assert sum(key.lower() == FN_HTTP_STATUS for key, _ in fn_headers) == 1
+    return FnResponse(
+        fn_status=start["status"],
+        status=start["status"] if status is None else status,
+        headers=headers,
+        body=body,
+    )
+
+
+class SyncFnClient:
+    """A blocking variant of FnClient running its own event loop.
+
+    Use it as a context manager to run the lifespan protocol."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        base_url: str = "http://testserver",
+        lifespan: bool = True,
+    ) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.client = FnClient(app, base_url=base_url, lifespan=lifespan)
+
+    def __enter__(self) -> SyncFnClient:
+        self.loop.run_until_complete(self.client.__aenter__())
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        try:
+            self.loop.run_until_complete(
+                self.client.__aexit__(exc_type, exc_value, traceback)
+            )
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.loop.close()
+
+    def request(self, method: str, url: str, **kwargs: Any) -> FnResponse:
+        return self.loop.run_until_complete(self.client.request(method, url, **kwargs))
+
+    def get(self, url: str, **kwargs: Any) -> FnResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> FnResponse:
+        return self.request("POST", url, **kwargs)
+
+    def send(self, request: FnRequest) -> FnResponse:
+        return self.loop.run_until_complete(self.client.send(request))
+
+    def gather(
+        self, requests: Iterable[FnRequest], *, concurrency: int = 100
+    ) -> list[FnResponse]:
+        return self.loop.run_until_complete(
+            self.client.gather(requests, concurrency=concurrency)
+        )
+
+    def call(self, fn_headers: Headers, body: bytes = b"") -> FnResponse:
+        return self.loop.run_until_complete(self.client.call(fn_headers, body))
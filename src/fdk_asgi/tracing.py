@@ -0,0 +1,429 @@
+"""Tracing Fn calls with spans exported to a local file or socket.
+
+FnMiddleware opens a span per call, continuing the trace of the caller if a
+traceparent (W3C) or b3 (Zipkin, as used by OCI APM) header was sent, either
+as a translated HTTP header or as a header of the Fn call itself.
+Apps find the span in the TRACING scope extension and may open child spans:
+
+    span = scope["extensions"]["fdk_asgi.tracing"]["span"]
+    with span.child("query users", db="users"):
+        ...
+    headers["traceparent"] = span.traceparent  # propagate to downstream calls
+
+Sampling is decided once per trace (head-based): calls that are not sampled
+get NOOP_SPAN, which records nothing. Finished spans are batched and written
+as OTLP/JSON, one export request per line, by a background thread."""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import random
+import re
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Awaitable, Callable, Optional, Tuple
+
+from fdk_asgi import __version__
+from fdk_asgi.accesslog import route_of
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+    from fdk_asgi.types import Message, Receive, Scope, Send
+
+TRACING = "fdk_asgi.tracing"
+UNIX_PREFIX = "unix:"
+# see https://opentelemetry.io/docs/specs/otel/trace/api/#spankind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_ERROR = 2
+
+logger = logging.getLogger(__name__)
+
+
+class NoopSpan:
+    """A span of a trace that is not sampled, recording nothing."""
+
+    traceparent = None
+    sampled = False
+
+    def child(self, name: str, **attributes: Any) -> NoopSpan:
+        return self
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> NoopSpan:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Span:
+    """A sampled span. Use it as a context manager to end and export it."""
+
+    __slots__ = (
+        "attributes",
+        "end_time",
+        "error",
+        "kind",
+        "name",
+        "parent_span_id",
+        "span_id",
+        "start_time",
+        "trace_id",
+        "tracer",
+    )
+    sampled = True
+
+    def __init__(
+        self,
+        tracer: Tracer,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None = None,
+        *,
+        kind: int = SPAN_KIND_INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = _random_id(64)
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_time = time.time_ns()
+        self.end_time = 0
+        self.attributes = attributes or {}
+        self.error = False
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def child(self, name: str, **attributes: Any) -> Span:
+        return Span(
+            self.tracer, name, self.trace_id, self.span_id, attributes=attributes
+        )
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.end_time = time.time_ns()
+        self.tracer.exporter.export(self)
+
+    def __enter__(self) -> Span:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_value is not None:
+            self.error = True
+            self.attributes["exception.type"] = type(exc_value).__name__
+        self.end()
+
+    def to_otlp(self) -> dict[str, Any]:
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_span_id is not None:
+            span["parentSpanId"] = self.parent_span_id
+        if self.error:
+            span["status"] = {"code": STATUS_CODE_ERROR}
+        return span
+
+
+def _random_id(bits: int) -> str:
+    value = 0
+    while not value:  # all zeros are invalid
+        value = random.getrandbits(bits)
+    return f"{value:0{bits // 4}x}"
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    result = []
+    for key, value in attributes.items():
+        otlp_value: dict[str, Any]
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        result.append({"key": key, "value": otlp_value})
+    return result
+
+
+# see https://www.w3.org/TR/trace-context/#traceparent-header
+TRACEPARENT = re.compile(
+    r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-[^-].*)?"
+)
+# see https://github.com/openzipkin/b3-propagation
+B3 = re.compile(r"([0-9a-f]{16}|[0-9a-f]{32})-([0-9a-f]{16})(?:-([01d])(?:-.*)?)?")
+B3_TRACE_ID = re.compile(r"[0-9a-f]{16}|[0-9a-f]{32}")
+B3_SPAN_ID = re.compile(r"[0-9a-f]{16}")
+
+TraceContext = Tuple[Optional[str], Optional[str], Optional[bool]]
+
+
+def _valid_ids(trace_id: str, span_id: str) -> bool:
+    return trace_id.strip("0") != "" and span_id.strip("0") != ""
+
+
+def _parse_traceparent(value: str) -> TraceContext | None:
+    match = TRACEPARENT.fullmatch(value)
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest is not None):
+        return None
+    if not _valid_ids(trace_id, span_id):
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def _parse_b3(value: str) -> TraceContext | None:
+    if value in {"0", "1", "d"}:  # only the sampling decision
+        return None, None, value != "0"
+    match = B3.fullmatch(value)
+    if match is None or not _valid_ids(match[1], match[2]):
+        return None
+    sampled = None if match[3] is None else match[3] != "0"
+    return match[1].rjust(32, "0"), match[2], sampled
+
+
+def _parse_x_b3(b3: dict[bytes, bytes]) -> TraceContext | None:
+    flag = b3.get(b"x-b3-sampled", b"").decode("latin-1").strip().lower()
+    sampled = None if not flag else flag in {"1", "true"}
+    if b3.get(b"x-b3-flags", b"").strip() == b"1":
+        sampled = True  # debug
+    trace_id = b3.get(b"x-b3-traceid", b"").decode("latin-1").strip().lower()
+    span_id = b3.get(b"x-b3-spanid", b"").decode("latin-1").strip().lower()
+    if (
+        B3_TRACE_ID.fullmatch(trace_id)
+        and B3_SPAN_ID.fullmatch(span_id)
+        and _valid_ids(trace_id, span_id)
+    ):
+        return trace_id.rjust(32, "0"), span_id, sampled
+    return None if sampled is None else (None, None, sampled)
+
+
+def parse_trace_context(headers: list[tuple[bytes, bytes]]) -> TraceContext | None:
+    """Returns trace id, parent span id and whether the trace is sampled
+    (None if the caller left that up to us) from traceparent or b3 headers.
+    Either id is None if the caller only sent a sampling decision.
+    Malformed headers are ignored, as if they were missing."""
+    b3: dict[bytes, bytes] = {}
+    for key, value in headers:
+        key_lower = key.lower()
+        if key_lower == b"traceparent":
+            context = _parse_traceparent(value.decode("latin-1").strip())
+            if context is not None:
+                return context
+        elif key_lower == b"b3" or key_lower.startswith(b"x-b3-"):
+            b3[key_lower] = value
+    if b"b3" in b3:
+        context = _parse_b3(b3[b"b3"].decode("latin-1").strip().lower())
+        if context is not None:
+            return context
+    return _parse_x_b3(b3)
+
+
+class SpanExporter:
+    """Writes finished spans as OTLP/JSON lines to a file, or to a unix socket
+    if the target starts with "unix:", from a background thread.
+
+    Spans are batched: a line is written once max_batch_size spans are queued
+    or flush_interval seconds passed. If the queue is full, spans are dropped."""
+
+    def __init__(
+        self,
+        target: str,
+        *,
+        service_name: str = "fdk-asgi",
+        max_batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 65536,
+    ) -> None:
+        self.target = target
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.exported = 0
+        self._resource = {
+            "attributes": _otlp_attributes(
+                {
+                    "service.name": service_name,
+                    "telemetry.sdk.name": "fdk-asgi",
+                    "telemetry.sdk.version": __version__,
+                }
+            )
+        }
+        self._queue: queue.Queue[Span | None] = queue.Queue(max_queue_size)
+        self._stream: IO[bytes] | None = None
+        self._thread = threading.Thread(
+            target=self._run, name="fdk-asgi-tracing", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Writes all queued spans and stops the background thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            batch: list[Span] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                try:
+                    span = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if span is None:
+                    running = False
+                    break
+                batch.append(span)
+            if batch:
+                self._write(batch)
+        if self._stream is not None:
+            self._stream.close()
+
+    def _write(self, spans: list[Span]) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self._resource,
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": "fdk_asgi", "version": __version__},
+                                "spans": [span.to_otlp() for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+        ).encode()
+        try:
+            stream = self._stream or self._open()
+            stream.write(line + b"\n")
+            stream.flush()
+        except OSError:
+            logger.exception("Could not export %d spans to %s", len(spans), self.target)
+            self.dropped += len(spans)
+            self._stream = None
+            return
+        self.exported += len(spans)
+
+    def _open(self) -> IO[bytes]:
+        if self.target.startswith(UNIX_PREFIX):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.target[len(UNIX_PREFIX) :])
+            self._stream = sock.makefile("wb")
+            sock.close()  # the file keeps the connection open
+        else:
+            self._stream = Path(self.target).open("ab")  # noqa: SIM115
+        return self._stream
+
+
+class Tracer:
+    """Opens a span per Fn call, sampling sample_rate of all traces
+    that were not sampled (or not) by the caller already."""
+
+    def __init__(self, exporter: SpanExporter, *, sample_rate: float = 0.1) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_span(
+        self, scope: Scope, fn_headers: list[tuple[bytes, bytes]]
+    ) -> Span | NoopSpan:
+        context = parse_trace_context(scope["headers"]) or parse_trace_context(
+            fn_headers
+        )
+        trace_id, parent_span_id, sampled = context or (None, None, None)
+        if trace_id is None:
+            trace_id = _random_id(128)
+        if sampled is None:
+            sampled = random.random() < self.sample_rate  # noqa: S311
+        if not sampled:
+            return NOOP_SPAN
+        attributes = {"http.request.method": scope["method"], "url.path": scope["path"]}
+        for key, value in fn_headers:
+            if key.lower() == b"fn-call-id":
+                attributes["faas.invocation_id"] = value.decode("latin-1")
+        return Span(
+            self,
+            scope["method"],
+            trace_id,
+            parent_span_id,
+            kind=SPAN_KIND_SERVER,
+            attributes=attributes,
+        )
+
+    async def handle(
+        self,
+        scope: Scope,
+        fn_headers: list[tuple[bytes, bytes]],
+        receive: Receive,
+        send: Send,
+        *,
+        call: Callable[
+            [Scope, list[tuple[bytes, bytes]], Receive, Send], Awaitable[None]
+        ],
+    ) -> None:
+        span = self.start_span(scope, fn_headers)
+        scope["extensions"] = {
+            **(scope.get("extensions") or {}),
+            TRACING: {"span": span},
+        }
+        if isinstance(span, NoopSpan):
+            return await call(scope, fn_headers, receive, send)
+
+        async def wrapped_send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status = int(message["status"])
+                span.attributes["http.response.status_code"] = status
+                span.error = status >= 500
+            await send(message)
+
+        with span:
+            await call(scope, fn_headers, receive, wrapped_send)
+            # the app may have resolved the route by now
+            route = route_of(scope)
+            span.attributes["http.route"] = route
+            span.name = f"{scope['method']} {route}"
+        return None
+
+    def close(self) -> None:
+        self.exporter.close()
@@ -0,0 +1,98 @@
+"""Choosing the fastest event loop and HTTP protocol for an app by benchmarking it.
+
+The autotune command serves the app with every available combination and saves the
+fastest one to a tuning file. serve --tuning-file picks it up from there, unless
+--loop or --http are given explicitly."""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from fdk_asgi.types import HTTPProtocolType, LoopSetupType
+
+if TYPE_CHECKING:
+    from typing import Sequence
+
+    from fdk_asgi.agent import FnRequest
+    from fdk_asgi.loadgen import LoadReport
+
+TUNING_FILE = Path("fdk-asgi-tuning.json")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Tuning:
+    """A loop and HTTP protocol, with the throughput and p99 latency
+    (in seconds) measured for them."""
+
+    loop: LoopSetupType
+    http: HTTPProtocolType
+    throughput: float = 0.0
+    p99: float = 0.0
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=2) + "\n")
+
+    def apply(
+        self, loop: LoopSetupType | None, http: HTTPProtocolType | None
+    ) -> tuple[LoopSetupType, HTTPProtocolType]:
+        """Returns the tuned loop and HTTP protocol, unless others were chosen."""
+        return (
+            self.loop if loop is None else loop,
+            self.http if http is None else http,
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> Tuning | None:
+        """Reads a tuning file, returning None if there is none or it is invalid."""
+        try:
+            data = json.loads(path.read_text())
+            return cls(
+                loop=LoopSetupType(data["loop"]),
+                http=HTTPProtocolType(data["http"]),
+                throughput=float(data.get("throughput", 0.0)),
+                p99=float(data.get("p99", 0.0)),
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("Ignoring invalid tuning file %s.", path)
+            return None
+
+
+def autotune(
+    app_uri: str,
+    requests: Sequence[FnRequest],
+    *,
+    total: int,
+    concurrency: int = 1,
+    warm_up: int = 0,
+    env: dict[str, str] | None = None,
+) -> list[tuple[Tuning, LoadReport]]:
+    """Benchmarks APP with every available loop and HTTP protocol.
+    Returns the results ranked by throughput, combinations with errors last."""
+    from fdk_asgi.loadgen import available_loops, available_protocols, benchmark_server
+
+    results = []
+    for loop in available_loops():
+        for http in available_protocols():
+            report = benchmark_server(
+                app_uri,
+                requests,
+                loop=loop,
+                http=http,
+                total=total,
+                concurrency=concurrency,
+                warm_up=warm_up,
+                env=env,
+            )
+            results.append(
+                (Tuning(loop, http, report.throughput, report.percentile(99)), report)
+            )
+    results.sort(key=lambda result: (result[1].errors > 0, -result[0].throughput))
+    return results
@@ -28,3 +28,24 @@ class LoopSetupType(StrEnum):
     auto = "auto"
     asyncio = "asyncio"
     uvloop = "uvloop"
+
+
+class GCMode(StrEnum):
+    off = "off"
+    thresholds = "thresholds"
+    suspend = "suspend"
+
+
+class DeferredPolicy(StrEnum):
+    before_response = "before-response"
+    idle = "idle"
+
+
+class InterfaceType(StrEnum):
+    asgi = "asgi"
+    wsgi = "wsgi"
+
+
+class RecycleMode(StrEnum):
+    exit = "exit"
+    restart = "restart"
@@ -1,6 +1,10 @@
+from __future__ import annotations
+
 import urllib.parse
+from typing import TYPE_CHECKING
 
-from fdk_asgi.types import Scope
+if TYPE_CHECKING:
+    from fdk_asgi.types import Scope
 
 # Code taken from uvicorn.protocols.utils
 
@@ -0,0 +1,340 @@
+"""Running WSGI applications (e.g. Flask or Django) under Fn.
+
+WSGIBridge is an ASGI app calling a WSGI app on a thread pool of fixed size.
+Request and response bodies are streamed between the event loop and the
+worker thread chunk by chunk, so neither is ever buffered as a whole.
+The worker thread waits for each chunk to be sent before producing the next,
+so slow clients cannot make responses pile up in memory."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, Tuple
+
+from fdk_asgi.executor import InstrumentedThreadPoolExecutor
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+    from fdk_asgi.types import Message, Receive, Scope, Send
+
+    ExcInfo = Tuple[type[BaseException], BaseException, TracebackType]
+    StartResponse = Callable[..., Callable[[bytes], None]]
+    WSGIApp = Callable[[Dict[str, Any], StartResponse], Iterable[bytes]]
+
+logger = logging.getLogger(__name__)
+
+
+class WSGIInput:
+    """The wsgi.input stream, receiving the request body from the event loop
+    whenever the WSGI app asks for more than has been received so far.
+
+    The first message may be received in advance, which saves the worker thread
+    a round trip to the event loop for bodies received at once."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        receive: Receive,
+        first_message: Message | None = None,
+    ) -> None:
+        self.loop = loop
+        self.receive = receive
+        self.first_message = first_message
+        self.buffer = b""
+        self.offset = 0
+        self.more_body = True
+
+    def _receive_message(self) -> Message:
+        message = self.first_message
+        if message is not None:
+            self.first_message = None
+            return message
+        return asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+
+    def _receive_chunk(self) -> bool:
+        """Receives the next chunk of the body. Returns False at its end."""
+        while self.more_body:
+            message = self._receive_message()
+            if message["type"] != "http.request":
+                self.more_body = False
+                break
+            self.more_body = message.get("more_body", False)
+            chunk = message.get("body", b"")
+            if chunk:
+                if self.offset < len(self.buffer):
+                    self.buffer = self.buffer[self.offset :] + chunk
+                else:
+                    self.buffer = chunk
+                self.offset = 0
+                return True
+        return False
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                if self.offset < len(self.buffer):
+                    chunks.append(self._take(len(self.buffer)))
+                if not self._receive_chunk():
+                    break
+            return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        while len(self.buffer) - self.offset < size and self._receive_chunk():
+            pass
+        return self._take(self.offset + size)
+
+    def readline(self, size: int = -1) -> bytes:
+        while True:
+            end = self.buffer.find(b"\n", self.offset)
+            if end >= 0:
+                end += 1
+                break
+            if not self._receive_chunk():
+                end = len(self.buffer)
+                break
+        if size is not None and size >= 0:
+            end = min(end, self.offset + size)
+        return self._take(end)
+
+    def readlines(self, hint: int = -1) -> list[bytes]:
+        lines = []
+        total = 0
+        while line := self.readline():
+            lines.append(line)
+            total += len(line)
+            if 0 < hint <= total:
+                break
+        return lines
+
+    def __iter__(self) -> Iterator[bytes]:
+        while line := self.readline():
+            yield line
+
+    def _take(self, end: int) -> bytes:
+        if self.offset == 0 and end >= len(self.buffer):
+            # the common case of a body received at once is not copied
+            data, self.buffer = self.buffer, b""
+            return data
+        data = self.buffer[self.offset : end]
+        self.offset = end
+        return data
+
+
+class WSGIResponse:
+    """Implements start_response and passes the response on to the event loop.
+
+    The worker thread hands over chunks of the body without waiting for each
+    to be sent, but waits once window chunks are in flight. The last chunk
+    is sent after the WSGI app returned, without a round trip."""
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, send: Send, *, window: int = 4
+    ) -> None:
+        self.loop = loop
+        self.send = send
+        self.start: Message | None = None
+        self.started = False
+        self.final_messages: list[Message] = []
+        self._queue: asyncio.Queue[list[Message] | None] = asyncio.Queue()
+        self._window = threading.Semaphore(window)
+        self._error: BaseException | None = None
+        self._sender: asyncio.Task[None] | None = None
+
+    def start_response(
+        self,
+        status: str,
+        headers: list[tuple[str, str]],
+        exc_info: ExcInfo | None = None,
+    ) -> Callable[[bytes], None]:
+        if exc_info is not None and self.started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.start = {
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [
+                (key.lower().encode("latin-1"), value.encode("latin-1"))
+                for key, value in headers
+            ],
+        }
+        return self.write
+
+    def write(self, data: bytes) -> None:
+        """Hands over a chunk of the body (along with the headers, if not sent yet),
+        waiting if too many chunks are in flight already."""
+        self._window.acquire()
+        if self._error is not None:
+            raise self._error
+        messages = self._messages(data, more_body=True)
+        self.loop.call_soon_threadsafe(self._put, messages)
+
+    def send_body(self, body: Iterable[bytes]) -> None:
+        """Hands over the response iterable but its last chunk."""
+        previous = None
+        for chunk in body:
+            if not chunk:
+                continue
+            if previous is not None:
+                self.write(previous)
+            previous = chunk
+        self.final_messages = self._messages(previous or b"", more_body=False)
+
+    def _messages(self, data: bytes, *, more_body: bool) -> list[Message]:
+        messages = []
+        if not self.started:
+            if self.start is None:
+                msg = "start_response() was not called before the response body."
+                raise RuntimeError(msg)
+            messages.append(self.start)
+            self.started = True
+        messages.append(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+        return messages
+
+    def _put(self, messages: list[Message] | None) -> None:
+        # most responses consist of a single chunk, which needs no sender task
+        if self._sender is None and messages is not None:
+            self._sender = self.loop.create_task(self._send_queued())
+        self._queue.put_nowait(messages)
+
+    async def _send_queued(self) -> None:
+        while (messages := await self._queue.get()) is not None:
+            try:
+                for message in messages:
+                    await self.send(message)
+            except BaseException as exception:
+                # unblock the worker thread, which raises the exception then
+                self._error = exception
+                self._window.release()
+                raise
+            self._window.release()
+
+    async def finish(self) -> None:
+        """Sends the last chunk, after all others."""
+        if self._sender is not None:
+            self._put(None)
+            await self._sender
+        for message in self.final_messages:
+            await self.send(message)
+
+    def cancel(self) -> None:
+        if self._sender is not None:
+            self._put(None)
+
+
+def build_environ(scope: Scope, wsgi_input: WSGIInput) -> dict[str, Any]:
+    """Maps a (translated) HTTP connection scope to a WSGI environ."""
+    server = scope.get("server") or ("localhost", 80)
+    environ: dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": wsgi_input,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    client = scope.get("client")
+    if client:
+        environ["REMOTE_ADDR"] = str(client[0])
+        environ["REMOTE_PORT"] = str(client[1])
+
+    for key, value in scope["headers"]:
+        name = key.decode("latin-1").upper().replace("-", "_")
+        if name not in {"CONTENT_TYPE", "CONTENT_LENGTH"}:
+            name = "HTTP_" + name
+        if name in environ:
+            # note that the Fn agent and the client may both send e.g. a host header,
+            # the latter of which is the one to keep
+            if name in {"CONTENT_TYPE", "CONTENT_LENGTH", "HTTP_HOST"}:
+                environ[name] = value.decode("latin-1")
+                continue
+            # see https://www.rfc-editor.org/rfc/rfc6265#section-5.4
+            separator = "; " if name == "HTTP_COOKIE" else ","
+            environ[name] += separator + value.decode("latin-1")
+        else:
+            environ[name] = value.decode("latin-1")
+    return environ
+
+
+class WSGIBridge:
+    """An ASGI app running a WSGI app on its own pool of worker threads."""
+
+    def __init__(
+        self,
+        app: WSGIApp,
+        *,
+        workers: int = 8,
+        wait_warning_threshold: float | None = None,
+    ) -> None:
+        self.app = app
+        self.executor = InstrumentedThreadPoolExecutor(
+            workers,
+            wait_warning_threshold=wait_warning_threshold,
+            thread_name_prefix="fdk-asgi-wsgi",
+            name="WSGI executor",
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            msg = f"WSGI apps do not support {scope['type']} connections."
+            raise RuntimeError(msg)
+
+        loop = asyncio.get_running_loop()
+        environ = build_environ(scope, WSGIInput(loop, receive, await receive()))
+        response = WSGIResponse(loop, send)
+        try:
+            await loop.run_in_executor(self.executor, self._run, environ, response)
+        except BaseException:
+            response.cancel()
+            raise
+        await response.finish()
+
+    def _run(self, environ: dict[str, Any], response: WSGIResponse) -> None:
+        try:
+            self._call_app(environ, response)
+        except Exception:
+            if response.started:
+                raise
+            logger.exception("Exception in WSGI app")
+            self._send_error(response)
+
+    def _call_app(self, environ: dict[str, Any], response: WSGIResponse) -> None:
+        body = self.app(environ, response.start_response)
+        try:
+            response.send_body(body)
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def _send_error(response: WSGIResponse) -> None:
+        response.start_response(
+            "500 Internal Server Error", [("content-type", "text/plain; charset=utf-8")]
+        )
+        response.send_body([HTTPStatus.INTERNAL_SERVER_ERROR.phrase.encode()])
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                self.executor.log_stats()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -39,8 +39,15 @@ async def users_create(request: Request) -> Response:
     return JSONResponse(payload, status_code=status.HTTP_201_CREATED)
 
 
+def error(_: Request) -> Response:
+    return PlainTextResponse(
+        "Something went wrong!", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+    )
+
+
 routes = [
     Route("/", homepage),
+    Route("/error", error),
     Route("/users", users_list),
     Route("/users/{username}", users_get),
     Route("/users/{username}", users_create, methods=["POST"]),
@@ -63,9 +70,9 @@ def mounted_app(app: ASGIApp) -> ASGIApp:
     return Starlette(debug=True, routes=[Mount("/mounted", app=app)])
 
 
-@pytest.fixture()
-def fn_app(app: ASGIApp) -> FnMiddleware:
-    return FnMiddleware(app)
+@pytest.fixture(params=[False, True], ids=["dict_scope", "compact_scope"])
+def fn_app(app: ASGIApp, request: pytest.FixtureRequest) -> FnMiddleware:
+    return FnMiddleware(app, compact_scope=request.param)
 
 
 @dataclass
@@ -194,5 +201,6 @@ def mapped_scope() -> MappedScope:
             "raw_path": b"/",
             "query_string": b"",
             "path_params": {},
+            "extensions": {"http.response.pathsend": {}},
         },
     )
@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+from fdk_asgi.accesslog import (
+    AccessLogBuffer,
+    read_access_log,
+    route_of,
+    routes_path,
+    summarize,
+)
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp
+from starlette import status
+from starlette.routing import Route
+
+
+@pytest.fixture()
+def buffer_path(tmp_path: Path) -> Path:
+    return tmp_path / "access.log"
+
+
+def test_route_of() -> None:
+    assert route_of({"path": "/users"}) == "/users"
+    assert (
+        route_of(
+            {"path": "/users/foo/posts/1", "path_params": {"id": 1, "user": "foo"}}
+        )
+        == "/users/{user}/posts/{id}"
+    )
+    # each parameter is replaced once only, and may span several segments
+    assert (
+        route_of({"path": "/users/foo/posts/foo", "path_params": {"user": "foo"}})
+        == "/users/{user}/posts/foo"
+    )
+    assert (
+        route_of({"path": "/files/a/b.txt", "path_params": {"path": "a/b.txt"}})
+        == "/files/{path}"
+    )
+    # the template of the matched route is preferred
+    route = Route("/posts/{id:int}", lambda _: None)
+    scope = {
+        "path": "/api/blog/posts/1",
+        "root_path": "/api/blog",
+        "path_params": {"id": 1},
+        "route": route,
+    }
+    assert route_of(scope) == "/api/blog/posts/{id}"
+
+
+def test_access_log_buffer(app: ASGIApp, buffer_path: Path) -> None:
+    access_log = AccessLogBuffer(buffer_path, capacity=8)
+    with SyncFnClient(FnMiddleware(app, access_log=access_log)) as client:
+        client.post("/users/foo", json={"username": "foo"})
+        client.get("/users/foo")
+        client.get("/users/bar")
+        client.request("PROPFIND", "/")
+
+    position, records = read_access_log(buffer_path)
+    assert position == 4
+    assert [(record.method, record.route, record.status) for record in records] == [
+        ("POST", "/users/{username}", status.HTTP_201_CREATED),
+        ("GET", "/users/{username}", status.HTTP_200_OK),
+        ("GET", "/users/{username}", status.HTTP_404_NOT_FOUND),
+        ("OTHER", "/", status.HTTP_405_METHOD_NOT_ALLOWED),
+    ]
+    assert all(record.latency > 0 for record in records)
+    assert read_access_log(buffer_path, since=3) == (4, records[3:])
+    # each route is stored only once
+    assert routes_path(buffer_path).read_text() == "/users/{username}\n/\n"
+
+
+def test_access_log_buffer_wraps_around(buffer_path: Path) -> None:
+    access_log = AccessLogBuffer(buffer_path, capacity=4, max_routes=2)
+    for index in range(10):
+        access_log.record(
+            {"method": "GET", "path": f"/{index}"}, status.HTTP_200_OK, index
+        )
+    access_log.close()
+
+    position, records = read_access_log(buffer_path)
+    assert position == 10
+    assert [record.latency for record in records] == [6, 7, 8, 9]
+    assert {record.route for record in records} == {"<other>"}
+
+    # reopening continues the buffer
+    access_log = AccessLogBuffer(buffer_path, capacity=4)
+    access_log.record({"method": "GET", "path": "/0"}, status.HTTP_200_OK, 10)
+    access_log.close()
+    position, records = read_access_log(buffer_path, since=10)
+    assert position == 11
+    assert [(record.route, record.latency) for record in records] == [("/0", 10)]
+
+    # a different capacity starts over
+    AccessLogBuffer(buffer_path, capacity=2).close()
+    assert read_access_log(buffer_path) == (0, [])
+
+
+def test_summarize(buffer_path: Path) -> None:
+    access_log = AccessLogBuffer(buffer_path)
+    for latency in range(1, 101):
+        access_log.record({"method": "GET", "path": "/a"}, status.HTTP_200_OK, latency)
+    access_log.record({"method": "POST", "path": "/a"}, status.HTTP_502_BAD_GATEWAY, 1)
+    access_log.close()
+
+    get, post = summarize(read_access_log(buffer_path)[1])
+    assert (get.method, get.route, get.requests, get.errors) == ("GET", "/a", 100, 0)
+    assert get.latencies == sorted(get.latencies)
+    assert (post.method, post.requests, post.errors) == ("POST", 1, 1)
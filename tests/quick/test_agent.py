@@ -0,0 +1,59 @@
+import math
+
+from fdk_asgi.agent import FnRequest, from_fn_headers, to_fn_headers
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.loadgen import LoadReport, percentile
+
+from ..conftest import MappedScope
+
+
+def test_to_fn_headers_reverses_mapping(
+    mapped_scope: MappedScope, fn_app: FnMiddleware
+) -> None:
+    scope = dict(mapped_scope.scope)
+    scope["headers"] = to_fn_headers(
+        "PUT",
+        b"https://foo.bar/users?active=1",
+        [(b"content-type", b"application/json"), (b"x-custom", b"foo")],
+    )
+
+    mapped = fn_app._map_http_scope(scope)
+    assert mapped["method"] == "PUT"
+    assert mapped["path"] == "/users"
+    assert mapped["query_string"] == b"active=1"
+    assert mapped["headers"] == [
+        (b"content-type", b"application/json"),
+        (b"x-custom", b"foo"),
+    ]
+
+
+def test_from_fn_headers() -> None:
+    assert from_fn_headers(
+        [
+            (b"content-type", b"text/plain"),
+            (b"fn-http-h-x-custom", b"foo"),
+            (b"fn-http-status", b"404"),
+            (b"fn-fdk-version", b"fdk-asgi/0.0.0"),
+        ]
+    ) == (404, [(b"content-type", b"text/plain"), (b"x-custom", b"foo")])
+
+
+def test_parse_request() -> None:
+    assert FnRequest.parse("get /") == FnRequest("GET", b"/")
+    assert FnRequest.parse('POST /users {"username": "foo"}') == FnRequest(
+        "POST", b"/users", body=b'{"username": "foo"}'
+    )
+
+
+def test_percentile() -> None:
+    assert math.isnan(percentile([], 50))
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0) == 1
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+
+    report = LoadReport(duration=2, latencies=[0.1, 0.3, 0.2], errors=1)
+    assert report.requests == 4
+    assert report.throughput == 2
+    assert report.percentile(50) == 0.2
@@ -0,0 +1,101 @@
+import base64
+import typing
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.batch import BatchHandler
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp, Receive, Scope, Send
+from starlette import status
+
+
+@pytest.fixture()
+def client(app: ASGIApp) -> typing.Iterator[SyncFnClient]:
+    with SyncFnClient(FnMiddleware(app, "/api", batch=BatchHandler())) as client:
+        yield client
+
+
+def test_batch(app: ASGIApp) -> None:
+    # items are handled one after another, so the user exists when fetched
+    fn_app = FnMiddleware(app, "/api", batch=BatchHandler(concurrency=1))
+    with SyncFnClient(fn_app) as client:
+        response = client.post(
+            "/api/_batch",
+            json={
+                "requests": [
+                    {
+                        "method": "POST",
+                        "url": "/api/users/foo",
+                        "headers": {"content-type": "application/json"},
+                        "body": '{"username": "foo"}',
+                    },
+                    {"url": "/api/users/foo"},
+                    {"url": "/api/users/bar"},
+                    {"method": "GET", "url": "/api/"},
+                ]
+            },
+            headers={"x-custom": "inherited"},
+        )
+    assert response.status == status.HTTP_200_OK
+    created, fetched, missing, homepage = response.json()["responses"]
+    assert created["status"] == status.HTTP_201_CREATED
+    assert ["content-type", "application/json"] in created["headers"]
+    assert created["body"] == '{"username":"foo"}'
+    assert fetched["status"] == status.HTTP_200_OK
+    assert fetched["body"] == '{"username":"foo"}'
+    assert missing["status"] == status.HTTP_404_NOT_FOUND
+    assert missing["body"] == "User not in database!"
+    assert homepage == {
+        "status": status.HTTP_200_OK,
+        "headers": [
+            ["content-length", "13"],
+            ["content-type", "text/plain; charset=utf-8"],
+        ],
+        "body": "Hello, world!",
+    }
+
+
+def test_batch_errors(client: SyncFnClient) -> None:
+    response = client.get("/api/_batch")
+    assert response.status == status.HTTP_405_METHOD_NOT_ALLOWED
+
+    response = client.post("/api/_batch", content=b"[")
+    assert response.status == status.HTTP_400_BAD_REQUEST
+
+    response = client.post("/api/_batch", json={"requests": [{"url": "/"}] * 101})
+    assert response.status == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    for body in ({"username": "foo"}, 1, None):
+        response = client.post(
+            "/api/_batch", json={"requests": [{"url": "/", "body": body}]}
+        )
+        assert response.status == status.HTTP_400_BAD_REQUEST
+        assert b"must be a string" in response.body
+
+    response = client.post(
+        "/api/_batch", json={"requests": [{"url": "/api/_batch", "method": "POST"}]}
+    )
+    assert response.status == status.HTTP_200_OK
+    assert response.json()["responses"][0]["status"] == status.HTTP_400_BAD_REQUEST
+
+
+def test_batch_item_errors() -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        if scope["path"] == "/fail":
+            msg = "Boom!"
+            raise RuntimeError(msg)
+        headers = [(b"x-header", b"inherited" if scope["headers"] else b"none")]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"\xff"})
+
+    with SyncFnClient(FnMiddleware(app, batch=BatchHandler("/batch"))) as client:
+        response = client.post(
+            "/batch",
+            json={"requests": [{"url": "/fail"}, {"url": "/ok"}]},
+            headers={"authorization": "secret"},
+        )
+    failed, ok = response.json()["responses"]
+    assert failed == {"status": 500, "headers": [], "body": ""}
+    assert ok["headers"] == [["x-header", "inherited"]]
+    assert base64.b64decode(ok["body_base64"]) == b"\xff"
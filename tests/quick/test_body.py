@@ -0,0 +1,146 @@
+import asyncio
+import tempfile
+import threading
+import typing
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.body import REQUEST_BODY, BodyBuffering, BufferedBody
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import Message, Receive, Scope, Send
+
+CHUNKS = [b"0123456789abcdef" * 64] * 8
+
+
+def make_receive(
+    chunks: typing.List[bytes], last: typing.Optional[Message] = None
+) -> Receive:
+    messages: typing.List[Message] = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks
+    ]
+    messages.append(last or {"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive() -> Message:
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    return receive
+
+
+def read(
+    buffering: BodyBuffering,
+    receive: Receive,
+    headers: typing.Optional[typing.List[typing.Tuple[bytes, bytes]]] = None,
+) -> typing.Tuple[BufferedBody, typing.Optional[Message]]:
+    return asyncio.run(buffering.read({"headers": headers or []}, receive))
+
+
+@pytest.mark.parametrize("content_length", [None, b"8192", b"1000", b"invalid"])
+def test_buffer_in_memory(content_length: typing.Optional[bytes]) -> None:
+    headers = [] if content_length is None else [(b"content-length", content_length)]
+    body, pending = read(BodyBuffering(), make_receive(CHUNKS), headers)
+    assert pending is None
+    assert not body.spooled
+    assert body.size == len(b"".join(CHUNKS))
+    assert body.view() == b"".join(CHUNKS)
+    assert body.view().readonly
+    # the buffer is handed over, not copied
+    assert isinstance(body.data, bytearray)
+
+
+@pytest.mark.parametrize("content_length", [None, b"8192"])
+def test_spool_to_file(tmp_path: Path, content_length: typing.Optional[bytes]) -> None:
+    buffering = BodyBuffering(spool_threshold=4096, spool_directory=tmp_path)
+    headers = [] if content_length is None else [(b"content-length", content_length)]
+    body, _ = read(buffering, make_receive(CHUNKS), headers)
+    body.chunk_size = 4096
+    assert body.spooled
+    assert body.size == len(b"".join(CHUNKS))
+    with body.view() as view:
+        assert view == b"".join(CHUNKS)
+
+    async def receive_all() -> typing.List[Message]:
+        receive = body.wrap_receive(make_receive([]))
+        return [await receive() for _ in range(2)]
+
+    messages = asyncio.run(receive_all())
+    assert [message["more_body"] for message in messages] == [True, False]
+    assert b"".join(message["body"] for message in messages) == b"".join(CHUNKS)
+    assert all(type(message["body"]) is bytes for message in messages)
+    body.close()
+
+
+def test_spool_file_created_off_the_loop(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    threads: typing.List[threading.Thread] = []
+    temporary_file = tempfile.TemporaryFile
+
+    def create_file(**kwargs: typing.Any) -> typing.Any:
+        threads.append(threading.current_thread())
+        return temporary_file(**kwargs)
+
+    monkeypatch.setattr(tempfile, "TemporaryFile", create_file)
+    buffering = BodyBuffering(spool_threshold=4096, spool_directory=tmp_path)
+    body, _ = read(buffering, make_receive(CHUNKS), [(b"content-length", b"8192")])
+    body.close()
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+
+
+def test_single_chunk_is_not_copied() -> None:
+    chunk = b"x" * 100
+    body, _ = read(
+        BodyBuffering(), make_receive([], {"type": "http.request", "body": chunk})
+    )
+    assert body.data is chunk
+
+
+def test_disconnect_is_passed_on() -> None:
+    disconnect: Message = {"type": "http.disconnect"}
+    body, pending = read(BodyBuffering(), make_receive(CHUNKS[:2], disconnect))
+    assert pending == disconnect
+    assert body.size == len(CHUNKS[0]) * 2
+
+    async def receive_all() -> typing.List[Message]:
+        receive = body.wrap_receive(make_receive([]), pending)
+        return [await receive(), await receive()]
+
+    request, message = asyncio.run(receive_all())
+    assert request["body"] == b"".join(CHUNKS[:2])
+    assert not request["more_body"]
+    assert message == disconnect
+
+
+def test_middleware() -> None:
+    received: typing.List[Message] = []
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        received.append(await receive())
+        body = scope["extensions"][REQUEST_BODY]["body"]
+        with body.view() as view:
+            size = str(len(view)).encode()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": size})
+
+    middleware = FnMiddleware(app, request_body=BodyBuffering())
+    with SyncFnClient(middleware, lifespan=False) as client:
+        assert client.post("/", content=b"small").body == b"5"
+        assert client.post("/").body == b"0"
+    assert received == [
+        {"type": "http.request", "body": b"small", "more_body": False},
+        {"type": "http.request", "body": b"", "more_body": False},
+    ]
+
+
+def test_messages_hold_bytes() -> None:
+    async def receive_all(body: BufferedBody) -> Message:
+        return await body.wrap_receive(make_receive([]))()
+
+    data = bytearray(b"small")
+    body = BufferedBody(data)
+    message = asyncio.run(receive_all(body))
+    assert type(message["body"]) is bytes
+    # the buffer is not exposed to the app
+    data[:] = b"large"
+    assert message["body"] == b"small"
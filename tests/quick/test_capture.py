@@ -0,0 +1,128 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.capture import (
+    MAGIC,
+    CapturedCall,
+    TrafficCapture,
+    read_capture,
+    replay,
+)
+from fdk_asgi.testing import FnClient, SyncFnClient
+from fdk_asgi.types import ASGIApp
+from starlette import status
+
+
+@pytest.fixture()
+def capture_file(tmp_path: Path) -> Path:
+    return tmp_path / "fdk-asgi.capture"
+
+
+def test_captured_call_round_trip() -> None:
+    call = CapturedCall(
+        started=1700000000.5,
+        duration=0.25,
+        status=201,
+        fn_headers=[(b"fn-http-method", b"POST"), (b"content-length", b"5")],
+        method=b"POST",
+        path=b"/users/foo",
+        query_string=b"a=b",
+        body=b"{",
+        body_size=5,
+    )
+    record = call.to_bytes()
+    assert CapturedCall.from_bytes(record[4:]) == call
+    assert call.truncated
+    assert call.replay_headers() == [
+        (b"fn-http-method", b"POST"),
+        (b"content-length", b"1"),
+    ]
+
+
+def test_capture_middleware(app: ASGIApp, capture_file: Path) -> None:
+    capture = TrafficCapture(capture_file, max_body_size=8)
+    with SyncFnClient(FnMiddleware(app, capture=capture)) as client:
+        client.post(
+            "/users/foo?x=1",
+            json={"username": "foo"},
+            headers={"Authorization": "Bearer secret"},
+        )
+        client.get("/users/foo")
+    assert capture.captured == 2
+
+    created, fetched = read_capture(capture_file)
+    assert created.method == b"POST"
+    assert created.path == b"/users/foo"
+    assert created.query_string == b"x=1"
+    assert created.status == status.HTTP_201_CREATED
+    assert created.body == b'{"userna'
+    assert created.body_size == len(b'{"username": "foo"}')
+    assert (b"fn-http-h-authorization", b"*" * len(b"Bearer secret")) in (
+        created.fn_headers
+    )
+    assert fetched.method == b"GET"
+    assert fetched.status == status.HTTP_200_OK
+    assert fetched.duration > 0
+
+    request = created.to_request()
+    assert request.method == "POST"
+    assert request.url == b"http://testserver/users/foo?x=1"
+    assert (b"content-type", b"application/json") in request.headers
+    assert request.body == b'{"userna'
+
+
+def test_capture_sampling(fn_app: FnMiddleware, capture_file: Path) -> None:
+    fn_app.capture = TrafficCapture(capture_file, sample_rate=0)
+    with SyncFnClient(fn_app) as client:
+        client.get("/")
+    assert not capture_file.exists()
+
+
+def test_read_capture_skips_incomplete_record(capture_file: Path) -> None:
+    capture = TrafficCapture(capture_file)
+    capture.write(CapturedCall(started=1.0, duration=0.1, status=200))
+    capture.write(CapturedCall(started=2.0, duration=0.1, status=200))
+    capture.close()
+    capture_file.write_bytes(capture_file.read_bytes()[:-1])
+    assert [call.started for call in read_capture(capture_file)] == [1.0]
+
+    capture_file.write_bytes(b"not a capture")
+    with pytest.raises(ValueError, match="not a capture file"):
+        list(read_capture(capture_file))
+
+
+def test_replay(app: ASGIApp, capture_file: Path) -> None:
+    capture = TrafficCapture(capture_file, max_body_size=0)
+    with SyncFnClient(FnMiddleware(app, capture=capture)) as client:
+        client.post("/users/foo", json={"username": "foo"})
+        for _ in range(9):
+            client.get("/users")
+    calls = list(read_capture(capture_file))
+    assert capture_file.read_bytes().startswith(MAGIC)
+
+    async def run() -> None:
+        async with FnClient(FnMiddleware(app)) as client:
+            report = await replay(client, calls, speed=0)
+        # the body of the POST request was not captured
+        assert report.errors == 1
+        assert len(report.latencies) == 9
+
+    asyncio.run(run())
+
+
+def test_replay_counts_errors_of_the_app(app: ASGIApp, capture_file: Path) -> None:
+    capture = TrafficCapture(capture_file)
+    with SyncFnClient(FnMiddleware(app, capture=capture)) as client:
+        client.get("/error")
+        client.get("/users")
+    calls = list(read_capture(capture_file))
+
+    async def run() -> None:
+        async with FnClient(FnMiddleware(app)) as client:
+            report = await replay(client, calls, speed=0)
+        assert report.errors == 1
+        assert len(report.latencies) == 1
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.cors import CORSPolicy
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp, Receive, Scope, Send
+from starlette import status
+
+PREFLIGHT_HEADERS = {
+    "origin": "https://example.com",
+    "access-control-request-method": "POST",
+    "access-control-request-headers": "x-token",
+}
+
+
+def test_preflight_without_calling_app() -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        raise AssertionError
+
+    cors = CORSPolicy(allow_methods=["GET", "POST"], allow_headers=["X-Token"])
+    with SyncFnClient(FnMiddleware(app, cors=cors), lifespan=False) as client:
+        response = client.request("OPTIONS", "/users", headers=PREFLIGHT_HEADERS)
+    assert response.status == status.HTTP_204_NO_CONTENT
+    assert response.get_header("access-control-allow-origin") == "*"
+    assert response.get_header("access-control-allow-methods") == "GET, POST"
+    assert response.get_header("access-control-allow-headers") == "x-token"
+    assert response.get_header("access-control-max-age") == "600"
+    assert cors.preflights == 1
+
+
+def test_disallowed_preflight(app: ASGIApp) -> None:
+    cors = CORSPolicy(allow_origins=["https://example.com"], allow_methods=["GET"])
+    with SyncFnClient(FnMiddleware(app, cors=cors)) as client:
+        wrong_method = client.request("OPTIONS", "/", headers=PREFLIGHT_HEADERS)
+        wrong_origin = client.request(
+            "OPTIONS",
+            "/",
+            headers={**PREFLIGHT_HEADERS, "origin": "https://evil.example"},
+        )
+    assert wrong_method.status == status.HTTP_400_BAD_REQUEST
+    assert wrong_origin.status == status.HTTP_400_BAD_REQUEST
+    assert wrong_origin.get_header("access-control-allow-origin") is None
+
+
+def test_response_headers(app: ASGIApp) -> None:
+    cors = CORSPolicy(
+        allow_origins=["https://example.com"],
+        expose_headers=["x-total"],
+        allow_credentials=True,
+    )
+    with SyncFnClient(FnMiddleware(app, cors=cors)) as client:
+        allowed = client.get("/users", headers={"origin": "https://example.com"})
+        other = client.get("/users", headers={"origin": "https://evil.example"})
+        same_origin = client.get("/users")
+    assert allowed.status == status.HTTP_200_OK
+    assert allowed.get_header("access-control-allow-origin") == "https://example.com"
+    assert allowed.get_header("access-control-allow-credentials") == "true"
+    assert allowed.get_header("access-control-expose-headers") == "x-total"
+    assert allowed.get_header("vary") == "Origin"
+    for response in (other, same_origin):
+        assert response.status == status.HTTP_200_OK
+        assert response.get_header("access-control-allow-origin") is None
+
+
+def test_from_file(tmp_path: Path) -> None:
+    path = tmp_path / "cors.json"
+    path.write_text(json.dumps({"allow_origins": ["https://example.com"]}))
+    assert CORSPolicy.from_file(path).allow_origins == {b"https://example.com"}
+
+    path.write_text(json.dumps({"allow_origin": "*"}))
+    with pytest.raises(ValueError, match="Invalid CORS configuration"):
+        CORSPolicy.from_file(path)
+
+    for config in (
+        {"allow_origins": "https://example.com"},
+        {"allow_headers": ["x-custom", 1]},
+        ["https://example.com"],
+    ):
+        path.write_text(json.dumps(config))
+        with pytest.raises(ValueError, match="Invalid CORS configuration"):
+            CORSPolicy.from_file(path)
@@ -0,0 +1,98 @@
+import asyncio
+import typing
+
+import pytest
+from fdk_asgi.agent import FnRequest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.deferred import DEFERRED, DeferredWork
+from fdk_asgi.testing import FnClient
+from fdk_asgi.types import DeferredPolicy, Message, Receive, Scope, Send
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+
+def make_app(events: typing.List[str]) -> Starlette:
+    async def background(name: str) -> None:
+        await asyncio.sleep(0.01)
+        events.append(f"background {name}")
+
+    def users_get(request: Request) -> Response:
+        name = request.path_params["username"]
+        return PlainTextResponse(name, background=BackgroundTask(background, name))
+
+    return Starlette(routes=[Route("/users/{username}", users_get)])
+
+
+def recording_send(events: typing.List[str], send: Send) -> Send:
+    async def wrapped_send(message: Message) -> None:
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            events.append("response complete")
+        await send(message)
+
+    return wrapped_send
+
+
+@pytest.mark.parametrize(
+    ("policy", "expected_events"),
+    [
+        (DeferredPolicy.before_response, ["background foo", "response complete"]),
+        (DeferredPolicy.idle, ["response complete", "background foo"]),
+    ],
+)
+def test_background_tasks(
+    policy: DeferredPolicy, expected_events: typing.List[str]
+) -> None:
+    events: typing.List[str] = []
+    deferred = DeferredWork(policy)
+    fn_app = FnMiddleware(make_app(events), deferred=deferred)
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await fn_app(scope, receive, recording_send(events, send))
+
+    async def main() -> None:
+        async with FnClient(app) as client:
+            response = await client.get("/users/foo")
+        assert response.text == "foo"
+
+    asyncio.run(main())
+    assert events == expected_events
+    cost = deferred.costs["/users/{username}"]
+    assert cost.count == 1
+    assert cost.max >= 0.01
+
+
+@pytest.mark.parametrize("policy", list(DeferredPolicy))
+def test_explicit_deferral(policy: DeferredPolicy) -> None:
+    events: typing.List[str] = []
+    deferred = DeferredWork(policy)
+
+    async def work(name: str) -> None:
+        events.append(f"deferred {name}")
+
+    async def failing_work() -> None:
+        msg = "Boom!"
+        raise RuntimeError(msg)
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        scope["extensions"][DEFERRED]["defer"](work, scope["path"])
+        scope["extensions"][DEFERRED]["defer"](failing_work)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"OK"})
+
+    fn_app = FnMiddleware(app, deferred=deferred)
+
+    async def main() -> None:
+        async with FnClient(fn_app, lifespan=False) as client:
+            await client.gather(
+                [FnRequest("GET", path, [], b"") for path in (b"/a", b"/b")],
+                concurrency=2,
+            )
+            await deferred.drain()
+
+    asyncio.run(main())
+    assert sorted(events) == ["deferred /a", "deferred /b"]
+    # the app itself after the response, and both deferred functions
+    assert deferred.costs["/a"].count == 3
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+from fdk_asgi.executor import InstrumentedThreadPoolExecutor
+
+
+def test_collects_stats() -> None:
+    with InstrumentedThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(pow, 2, exponent) for exponent in range(10)]
+        assert [future.result() for future in futures] == [2**i for i in range(10)]
+
+    assert executor.stats.submitted == 10
+    assert executor.stats.started == 10
+    assert executor.stats.queue_depth == 0
+    assert 1 <= executor.stats.max_queue_depth <= 10
+    assert executor.stats.max_wait_time >= executor.stats.mean_wait_time >= 0
+
+
+def test_warns_when_saturated(caplog: pytest.LogCaptureFixture) -> None:
+    release = threading.Event()
+    with InstrumentedThreadPoolExecutor(
+        1, wait_warning_threshold=0.01
+    ) as executor, caplog.at_level(logging.WARNING, logger="fdk_asgi.executor"):
+        blocking = executor.submit(release.wait)
+        waiting = executor.submit(lambda: None)
+        threading.Timer(0.05, release.set).start()
+        blocking.result()
+        waiting.result()
+
+    assert executor.stats.slow_tasks == 1
+    assert executor.stats.max_wait_time > 0.01
+    assert "Default executor saturated" in caplog.text
+
+
+def test_usable_as_default_executor() -> None:
+    async def main() -> str:
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(executor)
+        return await loop.run_in_executor(None, str, 42)
+
+    executor = InstrumentedThreadPoolExecutor(1)
+    assert asyncio.run(main()) == "42"
+    assert executor.stats.started == 1
@@ -0,0 +1,99 @@
+import gc
+import typing
+
+import pytest
+from fdk_asgi.app import FN_HTTP_REQUEST_METHOD, FN_HTTP_REQUEST_URL, FnMiddleware
+from fdk_asgi.gc_policy import GCPolicy
+from fdk_asgi.types import GCMode
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+FN_HEADERS = {
+    FN_HTTP_REQUEST_URL: b"https://foo.bar/",
+    FN_HTTP_REQUEST_METHOD: b"GET",
+}
+
+
+async def report_gc_state(_: Request) -> Response:
+    return JSONResponse({"enabled": gc.isenabled(), "threshold": gc.get_threshold()})
+
+
+@pytest.fixture()
+def restore_gc() -> typing.Iterator[None]:
+    threshold = gc.get_threshold()
+    yield
+    gc.unfreeze()
+    gc.enable()
+    gc.set_threshold(*threshold)
+
+
+@pytest.mark.usefixtures("restore_gc")
+def test_suspends_gc_during_requests() -> None:
+    policy = GCPolicy(GCMode.suspend)
+    app = FnMiddleware(
+        Starlette(routes=[Route("/", report_gc_state)]), gc_policy=policy
+    )
+
+    with TestClient(app) as client:
+        assert gc.get_freeze_count() > 0
+
+        response = client.post("/call", headers=FN_HEADERS)
+        assert response.json()["enabled"] is False
+        assert gc.isenabled()
+        assert policy.in_flight == 0
+
+    assert policy.stats.idle_collections >= 1
+    assert gc.callbacks.count(policy._on_collection) == 0
+
+
+@pytest.mark.usefixtures("restore_gc")
+def test_raises_thresholds_during_requests() -> None:
+    policy = GCPolicy(GCMode.thresholds, busy_threshold=123_456)
+    app = FnMiddleware(
+        Starlette(routes=[Route("/", report_gc_state)]), gc_policy=policy
+    )
+    threshold = gc.get_threshold()
+
+    with TestClient(app) as client:
+        response = client.post("/call", headers=FN_HEADERS)
+        assert response.json()["enabled"] is True
+        assert response.json()["threshold"][0] == 123_456
+        assert gc.get_threshold() == threshold
+
+
+@pytest.mark.usefixtures("restore_gc")
+def test_collects_when_idle() -> None:
+    policy = GCPolicy(GCMode.suspend, freeze_after_startup=False)
+    policy.request_started()
+    for _ in range(gc.get_threshold()[0] * 2):
+        cycle: typing.List[typing.Any] = []
+        cycle.append(cycle)
+    del cycle
+    assert policy.stats.busy_collections == 0
+
+    policy.request_finished()
+    assert policy.stats.idle_collections == 1
+    policy.uninstall()
+
+
+@pytest.mark.usefixtures("restore_gc")
+def test_collects_between_overlapping_requests() -> None:
+    policy = GCPolicy(GCMode.suspend, busy_threshold=1000, freeze_after_startup=False)
+    policy.request_started()
+    for _ in range(10):
+        # there is always another request in flight
+        policy.request_started()
+        for _ in range(2000):
+            cycle: typing.List[typing.Any] = []
+            cycle.append(cycle)
+        del cycle
+        policy.request_finished()
+        assert not gc.isenabled()
+    assert policy.stats.busy_collections >= 10
+    assert gc.get_count()[0] < 2000
+
+    policy.request_finished()
+    policy.uninstall()
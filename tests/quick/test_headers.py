@@ -0,0 +1,75 @@
+import copy
+import logging
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.headers import HeaderPolicy, Patterns
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp
+
+from ..conftest import MappedScope
+
+
+def test_patterns() -> None:
+    patterns = Patterns(["OCI-*", " fn-call-id", ""])
+    assert patterns
+    assert patterns.match(b"oci-subject-id")
+    assert patterns.match(b"fn-call-id")
+    assert not patterns.match(b"fn-deadline")
+    assert not Patterns([""])
+
+
+def test_deny(app: ASGIApp, mapped_scope: MappedScope) -> None:
+    policy = HeaderPolicy(deny=["oci-*", "fn-*", "x-content-sha256"])
+    fn_app = FnMiddleware(app, header_policy=policy)
+    scope = fn_app._map_http_scope(copy.deepcopy(mapped_scope.scope))
+    assert scope["headers"] == [
+        (key, value)
+        for key, value in mapped_scope.mapped_scope["headers"]
+        if not key.startswith((b"oci-", b"fn-", b"x-content-sha256"))
+    ]
+    assert policy.stats.requests == 1
+    assert policy.stats.headers_removed == 9
+    assert policy.stats.bytes_removed == sum(
+        len(key) + len(value)
+        for key, value in mapped_scope.mapped_scope["headers"]
+        if key.startswith((b"oci-", b"fn-", b"x-content-sha256"))
+    )
+
+
+def test_allow_and_collapse(app: ASGIApp, mapped_scope: MappedScope) -> None:
+    policy = HeaderPolicy(allow=["accept*", "x-forwarded-for"], collapse=["accept"])
+    fn_app = FnMiddleware(app, header_policy=policy)
+    fn_scope = copy.deepcopy(mapped_scope.scope)
+    fn_scope["headers"].append((b"fn-http-h-accept", b"text/html"))
+    scope = fn_app._map_http_scope(fn_scope)
+    # content-type is always kept, as is transfer-encoding
+    assert scope["headers"] == [
+        (b"transfer-encoding", b"chunked"),
+        (b"content-type", b"application/octet-stream"),
+        (b"accept", b"*/*, text/html"),
+        (b"content-type", b"application/octet-stream"),
+        (b"x-forwarded-for", b"123.123.123.123"),
+        (b"accept-encoding", b"gzip"),
+    ]
+
+
+def test_collapse_cookies(app: ASGIApp, mapped_scope: MappedScope) -> None:
+    policy = HeaderPolicy(allow=["cookie"], collapse=["cookie"])
+    fn_app = FnMiddleware(app, header_policy=policy)
+    fn_scope = copy.deepcopy(mapped_scope.scope)
+    fn_scope["headers"].append((b"fn-http-h-cookie", b"a=1"))
+    fn_scope["headers"].append((b"fn-http-h-cookie", b"b=2"))
+    scope = fn_app._map_http_scope(fn_scope)
+    assert (b"cookie", b"a=1; b=2") in scope["headers"]
+
+
+def test_stats_are_logged(app: ASGIApp, caplog: pytest.LogCaptureFixture) -> None:
+    policy = HeaderPolicy.from_options(None, "x-custom", None)
+    caplog.set_level(logging.INFO)
+    with SyncFnClient(FnMiddleware(app, header_policy=policy)) as client:
+        response = client.get("/", headers={"x-custom": "dropped"})
+    assert response.text == "Hello, world!"
+    assert policy.stats.requests == 1
+    assert policy.stats.bytes_removed == len(b"x-custom" + b"dropped")
+    assert "Removed 1.0 request headers (15 bytes) per request" in caplog.text
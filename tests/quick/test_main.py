@@ -0,0 +1,88 @@
+import inspect
+import sys
+import typing
+
+import pytest
+import typer.main
+from fdk_asgi import main, server
+from fdk_asgi.cli import app
+from fdk_asgi.types import LoopSetupType, RecycleMode
+
+
+def test_env_options_match_cli() -> None:
+    command = typer.main.get_command(app)
+    cli_options = {
+        param.name: param
+        for param in command.params
+        if param.name not in {"app_uri", "install_completion", "show_completion"}
+    }
+    assert set(cli_options) == set(main.ENV_OPTIONS)
+
+    run_parameters = inspect.signature(server.run).parameters
+    for name, (envvar, _) in main.ENV_OPTIONS.items():
+        assert cli_options[name].envvar == envvar
+        assert cli_options[name].default == run_parameters[name].default, name
+
+
+def test_options_from_env() -> None:
+    assert main.options_from_env({}) == {}
+    assert main.options_from_env(
+        {
+            "FN_LISTENER": "unix:/tmp/iofs/lsnr.sock",
+            "FDK_ASGI_LOOP": "asyncio",
+            "FDK_ASGI_PROXY_HEADERS": "off",
+            "FDK_ASGI_TIMEOUT_KEEP_ALIVE": "42",
+            "FDK_ASGI_RECYCLE": "restart",
+            "FDK_ASGI_PREFIX": "",
+        }
+    ) == {
+        "uds": "unix:/tmp/iofs/lsnr.sock",
+        "loop": LoopSetupType.asyncio,
+        "proxy_headers": False,
+        "timeout_keep_alive": 42,
+        "recycle": RecycleMode.restart,
+    }
+
+    with pytest.raises(ValueError):  # noqa: PT011
+        main.options_from_env({"FDK_ASGI_LOOP": "invalid"})
+    with pytest.raises(ValueError):  # noqa: PT011
+        main.options_from_env({"FDK_ASGI_FACTORY": "maybe"})
+
+
+def test_serve_skips_typer(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: typing.List[typing.Tuple[str, typing.Dict[str, typing.Any]]] = []
+
+    def run(app_uri: str, **options: typing.Any) -> None:
+        calls.append((app_uri, options))
+
+    monkeypatch.setattr(server, "run", run)
+    monkeypatch.setattr("sys.argv", ["fdk-asgi-serve", "package.module:app"])
+    monkeypatch.setenv("FDK_ASGI_FACTORY", "true")
+
+    main.serve()
+    assert calls == [("package.module:app", {"factory": True})]
+
+
+@pytest.mark.parametrize(
+    ("argv", "serve"),
+    [
+        (["/venv/bin/fdk-asgi-serve", "package.module:app"], main.serve),
+        (["/venv/bin/fdk-asgi", "serve", "package.module:app"], main.main),
+    ],
+)
+def test_restart_command(
+    monkeypatch: pytest.MonkeyPatch,
+    argv: typing.List[str],
+    serve: typing.Callable[[], None],
+) -> None:
+    monkeypatch.setattr(server, "run", lambda *_, **__: None)
+    monkeypatch.setattr("sys.argv", argv)
+    monkeypatch.setattr(main, "serve_args", None)
+
+    serve()
+    assert main.restart_command() == [
+        sys.executable,
+        "-c",
+        "from fdk_asgi.main import serve; serve()",
+        "package.module:app",
+    ]
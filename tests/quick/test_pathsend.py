@@ -0,0 +1,70 @@
+import asyncio
+import typing
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FN_HTTP_REQUEST_METHOD, FN_HTTP_REQUEST_URL, FnMiddleware
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@pytest.fixture()
+def large_file(tmp_path: Path) -> Path:
+    path = tmp_path / "export.csv"
+    path.write_bytes(b"0123456789abcdef" * 10_000)
+    return path
+
+
+@pytest.fixture()
+def file_app(large_file: Path) -> ASGIApp:
+    content_length = str(large_file.stat().st_size).encode()
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        assert "http.response.pathsend" in scope["extensions"]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-length", content_length)],
+            }
+        )
+        await send({"type": "http.response.pathsend", "path": str(large_file)})
+
+    return app
+
+
+def test_pathsend_is_emulated(file_app: ASGIApp, large_file: Path) -> None:
+    with SyncFnClient(FnMiddleware(file_app)) as client:
+        response = client.get("/export")
+    assert response.get_header("content-length") == str(large_file.stat().st_size)
+    assert response.body == large_file.read_bytes()
+
+
+def test_pathsend_is_passed_through(file_app: ASGIApp, large_file: Path) -> None:
+    messages: typing.List[Message] = []
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    scope: Scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/call",
+        "headers": [
+            (FN_HTTP_REQUEST_URL, b"/export"),
+            (FN_HTTP_REQUEST_METHOD, b"GET"),
+        ],
+        "http_version": "1.1",
+        "client": None,
+        "extensions": {"http.response.pathsend": {}},
+    }
+    asyncio.run(FnMiddleware(file_app)(scope, receive, send))
+    assert [message["type"] for message in messages] == [
+        "http.response.start",
+        "http.response.pathsend",
+    ]
+    assert messages[1]["path"] == str(large_file)
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import time
+import typing
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.pools import ConnectionPool, PoolRegistry, TCPConnection, tcp_pool
+from fdk_asgi.testing import FnClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+
+class EchoServer:
+    """A local stand-in for a downstream service, echoing lines."""
+
+    def __init__(self) -> None:
+        self.connections: typing.List[asyncio.StreamWriter] = []
+
+    async def __aenter__(self) -> "EchoServer":
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections.append(writer)
+        while line := await reader.readline():
+            writer.write(line)
+        writer.close()
+
+    def close_connections(self) -> None:
+        for writer in self.connections:
+            writer.close()
+
+
+async def echo(connection: TCPConnection, line: bytes) -> bytes:
+    connection.writer.write(line)
+    return await connection.reader.readline()
+
+
+def test_pool_reconnects_stale_connections() -> None:
+    async def main() -> None:
+        async with EchoServer() as server:
+            pool = tcp_pool("127.0.0.1", server.port, min_size=2)
+            await pool.open()
+            assert len(server.connections) == 2
+
+            for _ in range(3):
+                async with pool.connection() as connection:
+                    assert await echo(connection, b"hi\n") == b"hi\n"
+            assert pool.stats.opened == 2
+
+            server.close_connections()
+            await asyncio.sleep(0.05)
+            await pool.refresh()
+            assert pool.stats.validated == 5  # on each of 3 acquires, and 2 idle
+            assert pool.stats.reconnects == 2
+            async with pool.connection() as connection:
+                assert await echo(connection, b"again\n") == b"again\n"
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_pool_discards_closed_and_broken_connections() -> None:
+    async def main() -> None:
+        async with EchoServer() as server:
+            pool = tcp_pool("127.0.0.1", server.port, min_size=1)
+            await pool.open()
+            server.close_connections()
+            await asyncio.sleep(0.05)
+            async with pool.connection():
+                pass
+            assert pool.stats.stale == 1
+
+            with pytest.raises(RuntimeError):
+                async with pool.connection():
+                    raise RuntimeError
+            assert pool.stats.broken == 1
+            assert pool.size == 0
+            assert pool.stats.reconnects == 1
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_pool_survives_freezes_longer_than_max_idle(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def main() -> None:
+        async with EchoServer() as server:
+            pool = tcp_pool("127.0.0.1", server.port, min_size=1)
+            await pool.open()
+            frozen_at = time.monotonic()
+            monkeypatch.setattr(
+                time, "monotonic", lambda: frozen_at + pool.max_idle + 3600
+            )
+            async with pool.connection() as connection:
+                assert await echo(connection, b"thawed\n") == b"thawed\n"
+            assert pool.stats.opened == 1
+            assert pool.stats.reconnects == 0
+            await pool.close()
+
+    asyncio.run(main())
+
+
+def test_pool_without_validation_discards_by_age() -> None:
+    async def connect() -> object:
+        return object()
+
+    async def main() -> None:
+        pool: ConnectionPool[object] = ConnectionPool(connect, max_idle=0.01)
+        async with pool.connection() as first:
+            pass
+        await asyncio.sleep(0.02)
+        async with pool.connection() as second:
+            assert second is not first
+        assert pool.stats.stale == 1
+
+    asyncio.run(main())
+
+
+def test_refresh_stays_within_max_size() -> None:
+    gates: typing.List[asyncio.Event] = []
+
+    async def connect() -> object:
+        await gates[0].wait()
+        return object()
+
+    async def use(pool: ConnectionPool[object]) -> None:
+        async with pool.connection():
+            pass
+
+    async def main() -> None:
+        gates.append(asyncio.Event())  # bound to the running loop on Python < 3.10
+        pool: ConnectionPool[object] = ConnectionPool(connect, min_size=2, max_size=2)
+        # both connections are being opened for calls when the refresh starts
+        calls = [asyncio.ensure_future(use(pool)) for _ in range(2)]
+        await asyncio.sleep(0)
+        refresh = asyncio.ensure_future(pool.refresh())
+        await asyncio.sleep(0)
+        gates[0].set()
+        await asyncio.gather(*calls, refresh)
+        assert pool.size == 2
+        assert pool.stats.opened == 2
+
+    asyncio.run(main())
+
+
+def test_registry_in_lifespan_state() -> None:
+    def size_get(request: Request) -> Response:
+        return PlainTextResponse(str(request.state.fdk_asgi_pools["echo"].size))
+
+    async def echo_get(request: Request) -> Response:
+        pool = request.state.fdk_asgi_pools["echo"]
+        async with pool.connection() as connection:
+            line = await echo(connection, b"hello\n")
+        return PlainTextResponse(line)
+
+    app = Starlette(routes=[Route("/size", size_get), Route("/echo", echo_get)])
+
+    async def main() -> None:
+        async with EchoServer() as server:
+            registry = PoolRegistry(refresh_interval=3600)
+            registry.add("echo", tcp_pool("127.0.0.1", server.port, min_size=2))
+            async with FnClient(FnMiddleware(app, pools=registry)) as client:
+                # opened before the first call
+                assert (await client.get("/size")).text == "2"
+                server.close_connections()
+                await asyncio.sleep(0.05)
+                # refreshed right after the call, not refresh_interval later
+                assert (await client.get("/size")).text == "2"
+                await asyncio.sleep(0.05)  # the idle window after the call
+                assert registry["echo"].stats.reconnects == 2
+                assert (await client.get("/echo")).text == "hello\n"
+            assert registry["echo"].stats.reconnects == 2
+            assert registry["echo"].size == 0
+
+    asyncio.run(main())
+
+
+def test_registry_from_file(tmp_path: Path) -> None:
+    path = tmp_path / "pools.json"
+    path.write_text(json.dumps({"users": {"host": "localhost", "port": 8000}}))
+    registry = PoolRegistry.from_file(path)
+    assert "users" in registry
+    assert registry["users"].min_size == 1
+
+    path.write_text(json.dumps({"users": {"hostname": "localhost"}}))
+    with pytest.raises(ValueError, match="Invalid connection pool users"):
+        PoolRegistry.from_file(path)
@@ -0,0 +1,91 @@
+import os
+import typing
+
+import pytest
+from fdk_asgi import main
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.cli import app as cli_app
+from fdk_asgi.ratelimit import RateLimiter
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp
+from starlette import status
+from typer.testing import CliRunner
+
+
+def test_token_bucket() -> None:
+    limiter = RateLimiter(2, 3)
+    assert [limiter.acquire(b"a", now=10) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(b"a", now=10) == pytest.approx(0.5)
+    # refilled at two tokens per second, but no more than the burst
+    assert limiter.acquire(b"a", now=10.5) == 0
+    assert limiter.acquire(b"a", now=10.5) == pytest.approx(0.5)
+    assert [limiter.acquire(b"a", now=100) for _ in range(4)][-1] > 0
+    assert limiter.acquire(b"b", now=10) == 0
+
+
+def test_lru_eviction() -> None:
+    limiter = RateLimiter(1, 1, max_clients=2)
+    limiter.acquire(b"a", now=0)
+    limiter.acquire(b"b", now=0)
+    limiter.acquire(b"a", now=0)
+    limiter.acquire(b"c", now=0)
+    assert list(limiter.buckets) == [b"a", b"c"]
+    # b starts with a full bucket again
+    assert limiter.acquire(b"b", now=0) == 0
+
+
+def test_client_key() -> None:
+    limiter = RateLimiter(1, key_header="X-Forwarded-For")
+    scope = {
+        "headers": [(b"x-forwarded-for", b"1.1.1.1, 2.2.2.2")],
+        "client": ("3.3.3.3", 1234),
+    }
+    assert limiter.client_key(scope) == b"2.2.2.2"
+    assert limiter.client_key({**scope, "headers": []}) == b"3.3.3.3"
+    assert limiter.client_key({"headers": []}) == b""
+
+
+def test_rejection(app: ASGIApp) -> None:
+    limiter = RateLimiter(0.001, 2)
+    with SyncFnClient(FnMiddleware(app, rate_limit=limiter)) as client:
+        responses = [
+            client.get("/", headers={"x-forwarded-for": "1.1.1.1"}) for _ in range(3)
+        ]
+        other = client.get("/", headers={"x-forwarded-for": "2.2.2.2"})
+    assert [response.status for response in responses] == [
+        status.HTTP_200_OK,
+        status.HTTP_200_OK,
+        status.HTTP_429_TOO_MANY_REQUESTS,
+    ]
+    assert responses[2].get_header("retry-after") == "1000"
+    assert other.status == status.HTTP_200_OK
+    assert limiter.rejected == 1
+
+
+@pytest.mark.parametrize(("rate", "burst"), [(0, None), (-1, None), (1, 0)])
+def test_invalid_limits(rate: float, burst: typing.Optional[int]) -> None:
+    with pytest.raises(ValueError, match="must be"):
+        RateLimiter(rate, burst)
+
+
+def test_invalid_limits_on_command_line() -> None:
+    result = CliRunner().invoke(cli_app, ["--rate-limit", "0", "module:app"])
+    assert result.exit_code == 2
+    assert "must be positive" in result.output
+
+
+@pytest.mark.parametrize(
+    ("envvar", "value"),
+    [("FDK_ASGI_RATE_LIMIT", "0"), ("FDK_ASGI_RATE_LIMIT_BURST", "0")],
+)
+def test_invalid_limits_in_environment(
+    monkeypatch: pytest.MonkeyPatch, envvar: str, value: str
+) -> None:
+    monkeypatch.setenv(envvar, value)
+    with pytest.raises(ValueError, match="not positive"):
+        main.options_from_env(os.environ)
+    # left to typer, which reports a usage error instead of a traceback
+    assert not main.serve_from_env(["module:app"])
+    result = CliRunner().invoke(cli_app, ["module:app"])
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
@@ -0,0 +1,94 @@
+import copy
+import typing
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.headers import HeaderPolicy
+from fdk_asgi.scope import CompactScope
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp, Receive, Scope, Send
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+from ..conftest import MappedScope
+
+
+def test_mutable_mapping() -> None:
+    scope = CompactScope({"type": "http", "path": "/", "custom": 1})
+    assert scope == {"type": "http", "path": "/", "custom": 1}
+    assert len(scope) == 3
+    assert "method" not in scope
+    assert scope.get("method") is None
+    with pytest.raises(KeyError):
+        scope["method"]
+
+    scope["method"] = "GET"
+    del scope["custom"]
+    del scope["path"]
+    assert list(scope) == ["type", "method"]
+    with pytest.raises(KeyError):
+        del scope["path"]
+    assert isinstance(scope.copy(), dict)
+    assert not hasattr(scope, "__dict__")
+
+
+def test_deferred_headers() -> None:
+    calls: typing.List[int] = []
+
+    def translate() -> typing.List[typing.Tuple[bytes, bytes]]:
+        calls.append(1)
+        return [(b"accept", b"*/*")]
+
+    scope = CompactScope({"type": "http", "headers": [(b"fn-http-h-accept", b"*/*")]})
+    scope.defer_headers(translate)
+    assert "headers" in scope
+    assert not calls
+    assert scope["headers"] == [(b"accept", b"*/*")]
+    assert scope.get("headers") == [(b"accept", b"*/*")]
+    assert len(calls) == 1
+
+    scope.defer_headers(translate)
+    scope["headers"] = []
+    assert scope["headers"] == []
+    assert len(calls) == 1
+
+
+def test_headers_translated_lazily(app: ASGIApp, mapped_scope: MappedScope) -> None:
+    fn_app = FnMiddleware(app, compact_scope=True)
+    scope = fn_app._map_http_scope(copy.deepcopy(mapped_scope.scope))
+    assert isinstance(scope, CompactScope)
+    assert scope._deferred_headers is not None
+    assert scope["method"] == "GET"
+    assert scope["headers"] == mapped_scope.mapped_scope["headers"]
+
+
+def test_compact_scope_with_apps() -> None:
+    async def raw_app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        await PlainTextResponse(type(scope).__name__)(scope, receive, send)
+
+    async def header_app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return
+        request = Request(scope, receive)
+        await PlainTextResponse(request.headers["user-agent"])(scope, receive, send)
+
+    with SyncFnClient(FnMiddleware(raw_app, compact_scope=True)) as client:
+        assert client.get("/").text == "CompactScope"
+    with SyncFnClient(FnMiddleware(header_app, compact_scope=True)) as client:
+        assert client.get("/", headers={"user-agent": "test"}).text == "test"
+
+
+def test_headers_filtered_right_away(app: ASGIApp, mapped_scope: MappedScope) -> None:
+    policy = HeaderPolicy(deny=["oci-*"])
+    fn_app = FnMiddleware(app, header_policy=policy, compact_scope=True)
+    scope = fn_app._map_http_scope(copy.deepcopy(mapped_scope.scope))
+    assert isinstance(scope, CompactScope)
+    assert scope._deferred_headers is None
+    assert policy.stats.requests == 1
+    assert scope["headers"] == [
+        (key, value)
+        for key, value in mapped_scope.mapped_scope["headers"]
+        if not key.startswith(b"oci-")
+    ]
@@ -0,0 +1,36 @@
+import asyncio
+
+import uvicorn
+from fdk_asgi.server import RecycleLimits, Server, get_rss
+
+
+def make_server(recycle_limits: RecycleLimits) -> Server:
+    config = uvicorn.Config(app="tests.conftest:app_factory", factory=True)
+    return Server(config, recycle_limits=recycle_limits)
+
+
+def test_get_rss() -> None:
+    assert get_rss() > 0
+
+
+def test_recycles_after_max_requests() -> None:
+    server = make_server(RecycleLimits(max_requests=10))
+
+    server.server_state.total_requests = 9
+    assert asyncio.run(server.on_tick(0)) is False
+    assert server.recycle_reason is None
+
+    server.server_state.total_requests = 10
+    assert asyncio.run(server.on_tick(1)) is False  # only checked once per second
+    assert asyncio.run(server.on_tick(10)) is True
+    assert server.recycle_reason == "handled 10 of at most 10 requests"
+
+
+def test_recycles_after_max_memory() -> None:
+    server = make_server(RecycleLimits(max_memory=get_rss() * 1000))
+    assert asyncio.run(server.on_tick(0)) is False
+
+    server.recycle_limits = RecycleLimits(max_memory=1)
+    assert asyncio.run(server.on_tick(0)) is True
+    assert server.recycle_reason is not None
+    assert "resident set size" in server.recycle_reason
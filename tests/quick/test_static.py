@@ -0,0 +1,136 @@
+import gzip
+import typing
+from pathlib import Path
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.static import StaticAssets, parse_accept_encoding
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import ASGIApp
+from starlette import status
+
+SCRIPT = b"console.log('Hello, world!');\n" * 100
+
+
+@pytest.fixture()
+def static_directory(tmp_path: Path) -> Path:
+    (tmp_path / "index.html").write_bytes(b"<h1>Hello, world!</h1>")
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_bytes(SCRIPT)
+    (tmp_path / "js" / "app.js.br").write_bytes(b"precompressed")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG" + bytes(2000))
+    (tmp_path / "export.csv").write_bytes(b"a,b\n" * 1000)
+    return tmp_path
+
+
+@pytest.fixture()
+def client(app: ASGIApp, static_directory: Path) -> typing.Iterator[SyncFnClient]:
+    static = StaticAssets(static_directory, "/", max_size=3000)
+    with SyncFnClient(FnMiddleware(app, "/api", static=static)) as client:
+        yield client
+
+
+def test_parse_accept_encoding() -> None:
+    assert parse_accept_encoding(b"gzip, deflate;q=0.5, br;q=0, *;q=x") == {
+        "gzip": 1.0,
+        "deflate": 0.5,
+        "br": 0.0,
+        "*": 0.0,
+    }
+
+
+def test_static_assets(static_directory: Path) -> None:
+    static = StaticAssets(static_directory)
+    assert sorted(static.assets) == [
+        "/static",
+        "/static/",
+        "/static/export.csv",
+        "/static/image.png",
+        "/static/index.html",
+        "/static/js/app.js",
+    ]
+    assert static.assets["/static/"] is static.assets["/static/index.html"]
+    assert static.redirects == {"/static"}
+    script = static.assets["/static/js/app.js"]
+    # either application/javascript or text/javascript, depending on the platform
+    assert script.content_type.endswith(b"/javascript; charset=utf-8")
+    assert sorted(script.variants) == ["br", "gzip", "identity"]
+    assert script.variants["br"].body == b"precompressed"
+    assert gzip.decompress(script.variants["gzip"].body) == SCRIPT
+    # too small or not compressible
+    assert list(static.assets["/static/"].variants) == ["identity"]
+    assert list(static.assets["/static/image.png"].variants) == ["identity"]
+
+
+def test_static_responses(client: SyncFnClient) -> None:
+    response = client.get("/api/")
+    assert response.status == status.HTTP_200_OK
+    assert response.text == "<h1>Hello, world!</h1>"
+    assert response.get_header("content-type") == "text/html; charset=utf-8"
+    assert response.get_header("vary") is None
+
+    response = client.get("/api/js/app.js", headers={"accept-encoding": "gzip"})
+    assert response.get_header("content-encoding") == "gzip"
+    assert response.get_header("vary") == "accept-encoding"
+    assert gzip.decompress(response.body) == SCRIPT
+    etag = response.get_header("etag")
+    assert etag is not None
+
+    response = client.get(
+        "/api/js/app.js",
+        headers={"accept-encoding": "gzip, br", "if-none-match": f'"x", {etag}'},
+    )
+    assert response.body == b"precompressed"
+    response = client.get(
+        "/api/js/app.js",
+        headers={"accept-encoding": "gzip", "if-none-match": f'"x", {etag}'},
+    )
+    assert response.status == status.HTTP_304_NOT_MODIFIED
+    assert response.body == b""
+
+    response = client.get("/api/js/app.js", headers={"accept-encoding": "br;q=0"})
+    assert response.get_header("content-encoding") is None
+    assert response.body == SCRIPT
+
+    response = client.request("HEAD", "/api/js/app.js")
+    assert response.get_header("content-length") == str(len(SCRIPT))
+    assert response.body == b""
+
+    # too large to be kept in memory
+    response = client.get("/api/export.csv")
+    assert response.get_header("content-type") == "text/csv; charset=utf-8"
+    assert response.body == b"a,b\n" * 1000
+
+    # everything else is passed on to the app
+    response = client.get("/api/users")
+    assert response.json() == []
+    response = client.post("/api/index.html")
+    assert response.status == status.HTTP_404_NOT_FOUND
+
+
+def test_redirect_to_directory(app: ASGIApp, static_directory: Path) -> None:
+    static = StaticAssets(static_directory)
+    with SyncFnClient(FnMiddleware(app, "/api", static=static)) as client:
+        response = client.get("/api/static?lang=en")
+        assert response.status == status.HTTP_308_PERMANENT_REDIRECT
+        assert response.get_header("location") == "/api/static/?lang=en"
+        assert client.get("/api/static/").text == "<h1>Hello, world!</h1>"
+
+
+def test_static_ignores_agent_headers(static_directory: Path) -> None:
+    static = StaticAssets(static_directory)
+    client = SyncFnClient(FnMiddleware(static_app, static=static), lifespan=False)
+    # the Fn agent itself accepts gzip, but the client does not
+    response = client.call(
+        [
+            (b"fn-http-request-url", b"/static/js/app.js"),
+            (b"fn-http-method", b"GET"),
+            (b"accept-encoding", b"gzip"),
+        ]
+    )
+    client.close()
+    assert response.body == SCRIPT
+
+
+async def static_app(*_: typing.Any) -> None:  # pragma: no cover
+    raise AssertionError
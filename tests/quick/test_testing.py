@@ -0,0 +1,74 @@
+import typing
+from contextlib import asynccontextmanager
+
+import pytest
+from fdk_asgi.agent import FnRequest
+from fdk_asgi.app import FN_HTTP_REQUEST_METHOD, FN_HTTP_REQUEST_URL, FnMiddleware
+from fdk_asgi.testing import FnClient, SyncFnClient
+from fdk_asgi.types import ASGIApp
+from starlette import status
+from starlette.applications import Starlette
+
+
+def test_sync_client(fn_app: FnMiddleware) -> None:
+    with SyncFnClient(fn_app) as client:
+        response = client.get("/")
+        assert response.fn_status == status.HTTP_200_OK
+        assert response.status == status.HTTP_200_OK
+        assert response.text == "Hello, world!"
+        assert response.get_header("Content-Type") == "text/plain; charset=utf-8"
+        assert response.get_header("content-length") == "13"
+
+        user_obj = {"username": "foo"}
+        response = client.post("/users/foo", json=user_obj)
+        assert response.fn_status == status.HTTP_200_OK
+        assert response.status == status.HTTP_201_CREATED
+        assert response.json() == user_obj
+
+        response = client.get("/users/bar")
+        assert response.status == status.HTTP_404_NOT_FOUND
+
+
+def test_sync_client_raw_call(fn_app: FnMiddleware) -> None:
+    client = SyncFnClient(fn_app, lifespan=False)
+    try:
+        response = client.call(
+            [(FN_HTTP_REQUEST_URL, b"/users"), (FN_HTTP_REQUEST_METHOD, b"GET")]
+        )
+        assert response.json() == []
+
+        response = client.call([(FN_HTTP_REQUEST_URL, b"/users")])
+        assert response.fn_status == status.HTTP_400_BAD_REQUEST
+        assert response.status == status.HTTP_400_BAD_REQUEST
+    finally:
+        client.close()
+
+
+@pytest.mark.anyio()
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_async_client_gather(app: ASGIApp) -> None:
+    async with FnClient(FnMiddleware(app)) as client:
+        responses = await client.gather(
+            FnRequest("POST", f"/users/user{i}".encode(), body=b'{"id": %d}' % i)
+            for i in range(1000)
+        )
+        assert [response.status for response in responses] == [
+            status.HTTP_201_CREATED
+        ] * 1000
+        assert [response.json()["id"] for response in responses] == list(range(1000))
+
+        response = await client.get("/users")
+        assert len(response.json()) == 1000
+
+
+@pytest.mark.anyio()
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_async_client_lifespan() -> None:
+    @asynccontextmanager
+    async def lifespan(_: Starlette) -> typing.AsyncIterator[typing.Dict[str, str]]:
+        yield {"greeting": "Hello from the lifespan state!"}
+
+    app = Starlette(lifespan=lifespan)
+    client = FnClient(FnMiddleware(app))
+    async with client:
+        assert client.state == {"greeting": "Hello from the lifespan state!"}
@@ -0,0 +1,172 @@
+import json
+import socket
+import threading
+import typing
+from pathlib import Path
+
+import pytest
+from fdk_asgi.agent import FnRequest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.tracing import (
+    NOOP_SPAN,
+    TRACING,
+    SpanExporter,
+    Tracer,
+    parse_trace_context,
+)
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def users_get(request: Request) -> Response:
+    span = request.scope["extensions"][TRACING]["span"]
+    with span.child("load user", user=request.path_params["username"]):
+        pass
+    return PlainTextResponse(str(span.traceparent))
+
+
+app = Starlette(routes=[Route("/users/{username}", users_get)])
+
+
+def read_spans(path: Path) -> typing.List[typing.Dict[str, typing.Any]]:
+    return [
+        span
+        for line in path.read_text().splitlines()
+        for resource_spans in json.loads(line)["resourceSpans"]
+        for scope_spans in resource_spans["scopeSpans"]
+        for span in scope_spans["spans"]
+    ]
+
+
+@pytest.mark.parametrize(
+    ("headers", "expected"),
+    [
+        (
+            [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01".encode())],
+            (TRACE_ID, PARENT_ID, True),
+        ),
+        (
+            [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-00".encode())],
+            (TRACE_ID, PARENT_ID, False),
+        ),
+        (
+            [(b"b3", f"{TRACE_ID}-{PARENT_ID}-1".encode())],
+            (TRACE_ID, PARENT_ID, True),
+        ),
+        (
+            [(b"b3", f"{TRACE_ID[16:]}-{PARENT_ID}".encode())],
+            (TRACE_ID[16:].rjust(32, "0"), PARENT_ID, None),
+        ),
+        ([(b"b3", b"0")], (None, None, False)),
+        (
+            [
+                (b"X-B3-TraceId", TRACE_ID.encode()),
+                (b"X-B3-SpanId", PARENT_ID.encode()),
+                (b"X-B3-Sampled", b"0"),
+            ],
+            (TRACE_ID, PARENT_ID, False),
+        ),
+    ],
+)
+def test_parse_trace_context(
+    headers: typing.List[typing.Tuple[bytes, bytes]],
+    expected: typing.Tuple[
+        typing.Optional[str], typing.Optional[str], typing.Optional[bool]
+    ],
+) -> None:
+    assert parse_trace_context(headers) == expected
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        [(b"traceparent", b"invalid")],
+        [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-zz".encode())],
+        [(b"traceparent", f"00-{TRACE_ID.upper()}-{PARENT_ID}-01".encode())],
+        [(b"traceparent", f"00-{'0' * 32}-{PARENT_ID}-01".encode())],
+        [(b"traceparent", f"00-{TRACE_ID}-{'0' * 16}-01".encode())],
+        [(b"traceparent", f"ff-{TRACE_ID}-{PARENT_ID}-01".encode())],
+        [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01-extra".encode())],
+        [(b"b3", f"{TRACE_ID}-xyz-1".encode())],
+        [(b"x-b3-traceid", b"g" * 32), (b"x-b3-spanid", PARENT_ID.encode())],
+    ],
+)
+def test_malformed_trace_context(
+    headers: typing.List[typing.Tuple[bytes, bytes]],
+) -> None:
+    assert parse_trace_context(headers) is None
+
+
+def test_malformed_trace_context_is_ignored(tmp_path: Path) -> None:
+    trace_file = tmp_path / "spans.jsonl"
+    tracer = Tracer(SpanExporter(str(trace_file)), sample_rate=1)
+    with SyncFnClient(FnMiddleware(app, tracing=tracer)) as client:
+        response = client.get(
+            "/users/foo",
+            headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-zz"},
+        )
+    assert response.status == 200
+    _, server_span = sorted(read_spans(trace_file), key=lambda s: s["kind"])
+    assert server_span["traceId"] != TRACE_ID
+    assert not server_span.get("parentSpanId")
+
+
+def test_spans(tmp_path: Path) -> None:
+    trace_file = tmp_path / "spans.jsonl"
+    tracer = Tracer(SpanExporter(str(trace_file)), sample_rate=0)
+    with SyncFnClient(FnMiddleware(app, tracing=tracer)) as client:
+        request = FnRequest(
+            "GET",
+            b"http://testserver/users/foo",
+            [(b"traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01".encode())],
+            b"",
+        )
+        traced = client.call([*request.to_fn_headers(), (b"fn-call-id", b"01ABC")])
+        untraced = client.get("/users/bar")
+    assert untraced.text == "None"
+
+    child_span, server_span = sorted(read_spans(trace_file), key=lambda s: s["kind"])
+    assert traced.text == f"00-{TRACE_ID}-{server_span['spanId']}-01"
+    assert server_span["name"] == "GET /users/{username}"
+    assert server_span["traceId"] == TRACE_ID
+    assert server_span["parentSpanId"] == PARENT_ID
+    attributes = {a["key"]: a["value"] for a in server_span["attributes"]}
+    assert attributes["faas.invocation_id"] == {"stringValue": "01ABC"}
+    assert attributes["http.response.status_code"] == {"intValue": "200"}
+    assert child_span["name"] == "load user"
+    assert child_span["parentSpanId"] == server_span["spanId"]
+    assert int(child_span["endTimeUnixNano"]) <= int(server_span["endTimeUnixNano"])
+
+
+def test_noop_span() -> None:
+    with NOOP_SPAN.child("anything") as span:
+        span.set_attribute("key", "value")
+    assert span is NOOP_SPAN
+
+
+def test_unix_socket(tmp_path: Path) -> None:
+    path = tmp_path / "spans.socket"
+    received = bytearray()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(path))
+        server.listen()
+
+        def accept() -> None:
+            connection, _ = server.accept()
+            with connection:
+                while chunk := connection.recv(65536):
+                    received.extend(chunk)
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        tracer = Tracer(SpanExporter(f"unix:{path}"), sample_rate=1)
+        with SyncFnClient(FnMiddleware(app, tracing=tracer)) as client:
+            client.get("/users/foo")
+        thread.join()
+    assert len(json.loads(received)["resourceSpans"][0]["scopeSpans"][0]["spans"]) == 2
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from fdk_asgi import loadgen
+from fdk_asgi.agent import FnRequest
+from fdk_asgi.loadgen import LoadReport
+from fdk_asgi.tuning import Tuning, autotune
+from fdk_asgi.types import HTTPProtocolType, LoopSetupType
+
+
+def test_tuning_file(tmp_path: Path) -> None:
+    path = tmp_path / "fdk-asgi-tuning.json"
+    assert Tuning.load(path) is None
+
+    tuning = Tuning(LoopSetupType.uvloop, HTTPProtocolType.httptools, 1234.5, 0.002)
+    tuning.save(path)
+    assert Tuning.load(path) == tuning
+
+    path.write_text('{"loop": "invalid"}')
+    assert Tuning.load(path) is None
+
+
+def test_explicit_options_take_precedence() -> None:
+    tuning = Tuning(LoopSetupType.uvloop, HTTPProtocolType.h11)
+    assert tuning.apply(None, None) == (LoopSetupType.uvloop, HTTPProtocolType.h11)
+    assert tuning.apply(LoopSetupType.asyncio, None) == (
+        LoopSetupType.asyncio,
+        HTTPProtocolType.h11,
+    )
+    # explicitly chosen, even if they are the defaults
+    assert tuning.apply(LoopSetupType.none, HTTPProtocolType.auto) == (
+        LoopSetupType.none,
+        HTTPProtocolType.auto,
+    )
+
+
+def test_failing_combinations_rank_last(monkeypatch: pytest.MonkeyPatch) -> None:
+    reports = {
+        # faster, but every request failed
+        LoopSetupType.asyncio: LoadReport(duration=1, errors=1000),
+        LoopSetupType.uvloop: LoadReport(duration=1, latencies=[0.01] * 10),
+    }
+    monkeypatch.setattr(loadgen, "available_loops", lambda: list(reports))
+    monkeypatch.setattr(
+        loadgen, "available_protocols", lambda: [HTTPProtocolType.httptools]
+    )
+    monkeypatch.setattr(
+        loadgen, "benchmark_server", lambda *_, loop, **__: reports[loop]
+    )
+
+    results = autotune("package.module:app", [FnRequest.parse("GET /")], total=10)
+    assert [tuning.loop for tuning, _ in results] == [
+        LoopSetupType.uvloop,
+        LoopSetupType.asyncio,
+    ]
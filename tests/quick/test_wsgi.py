@@ -0,0 +1,116 @@
+import asyncio
+import typing
+
+import pytest
+from fdk_asgi.app import FnMiddleware
+from fdk_asgi.testing import SyncFnClient
+from fdk_asgi.types import Message
+from fdk_asgi.wsgi import WSGIBridge, WSGIInput, build_environ
+from starlette import status
+
+StartResponse = typing.Callable[..., typing.Callable[[bytes], None]]
+Environ = typing.Dict[str, typing.Any]
+
+
+def wsgi_app(environ: Environ, start_response: StartResponse) -> typing.Iterable[bytes]:
+    path = environ["PATH_INFO"]
+    if path == "/fail":
+        msg = "Boom!"
+        raise RuntimeError(msg)
+    if path == "/lines":
+        lines = environ["wsgi.input"].readlines()
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [str(len(lines)).encode()]
+    if path == "/stream":
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return (str(i).encode() for i in range(5))
+    body = environ["wsgi.input"].read()
+    start_response(
+        "201 Created",
+        [
+            ("Content-Type", "text/plain"),
+            ("X-Script-Name", environ["SCRIPT_NAME"]),
+            ("X-Query", environ["QUERY_STRING"]),
+            ("X-Custom", environ.get("HTTP_X_CUSTOM", "")),
+        ],
+    )
+    return [body]
+
+
+@pytest.fixture()
+def client() -> typing.Iterator[SyncFnClient]:
+    with SyncFnClient(FnMiddleware(WSGIBridge(wsgi_app, workers=2), "/api")) as client:
+        yield client
+
+
+def test_wsgi_bridge(client: SyncFnClient) -> None:
+    response = client.post(
+        "/api/echo?a=1", content=b"Hello, world!", headers={"x-custom": "yes"}
+    )
+    assert response.status == status.HTTP_201_CREATED
+    assert response.body == b"Hello, world!"
+    assert response.get_header("x-script-name") == "/api"
+    assert response.get_header("x-query") == "a=1"
+    assert response.get_header("x-custom") == "yes"
+
+    response = client.get("/api/stream")
+    assert response.text == "01234"
+
+    response = client.post("/api/lines", content=b"a\nb\nc")
+    assert response.text == "3"
+
+    response = client.get("/api/fail")
+    assert response.status == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def test_build_environ() -> None:
+    scope = {
+        "method": "GET",
+        "path": "/ä",
+        "query_string": b"",
+        "http_version": "1.1",
+        "server": None,
+        "client": ("1.2.3.4", 5678),
+        "headers": [
+            (b"host", b"agent"),
+            (b"content-type", b"text/plain"),
+            (b"accept", b"text/html"),
+            (b"accept", b"*/*"),
+            (b"host", b"example.com"),
+            (b"cookie", b"a=1"),
+            (b"cookie", b"b=2"),
+        ],
+    }
+    environ = build_environ(scope, typing.cast(WSGIInput, None))
+    assert environ["PATH_INFO"] == "/ä".encode().decode("latin-1")
+    assert environ["SERVER_NAME"] == "localhost"
+    assert environ["REMOTE_ADDR"] == "1.2.3.4"
+    assert environ["CONTENT_TYPE"] == "text/plain"
+    assert environ["HTTP_ACCEPT"] == "text/html,*/*"
+    assert environ["HTTP_HOST"] == "example.com"
+    assert environ["HTTP_COOKIE"] == "a=1; b=2"
+
+
+def test_wsgi_input() -> None:
+    chunks = [b"first line\nsec", b"ond line\n", b"rest"]
+
+    async def receive() -> Message:
+        body = chunks.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(chunks)}
+
+    async def read() -> typing.List[bytes]:
+        loop = asyncio.get_running_loop()
+        wsgi_input = WSGIInput(loop, receive)
+
+        def read_all() -> typing.List[bytes]:
+            return [
+                wsgi_input.readline(),
+                wsgi_input.read(3),
+                wsgi_input.readline(2),
+                wsgi_input.read(),
+                wsgi_input.read(),
+            ]
+
+        return await loop.run_in_executor(None, read_all)
+
+    assert asyncio.run(read()) == [b"first line\n", b"sec", b"on", b"d line\nrest", b""]
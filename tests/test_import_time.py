@@ -0,0 +1,32 @@
+from fdk_asgi.importtime import measure, parse, total_time
+
+HEAVY_MODULES = {"importlib.metadata", "typer", "click", "uvicorn"}
+
+
+def test_parse() -> None:
+    records = parse(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       307 |       1000 |   uvicorn.config\n"
+        "import time:       100 |       1100 | uvicorn\n"
+    )
+    assert [(record.name, record.depth) for record in records] == [
+        ("uvicorn.config", 1),
+        ("uvicorn", 0),
+    ]
+    assert total_time(records) == 1100
+
+
+def test_middleware_import_is_lean() -> None:
+    modules = {record.name for record in measure("import fdk_asgi.app")}
+    assert "fdk_asgi.app" in modules
+    assert modules.isdisjoint(HEAVY_MODULES)
+
+
+def test_entry_point_defers_typer_and_uvicorn() -> None:
+    modules = {record.name for record in measure("import fdk_asgi.main")}
+    assert modules.isdisjoint(HEAVY_MODULES)
+
+    # serving needs uvicorn, but still no command line parsing library
+    modules = {record.name for record in measure("import fdk_asgi.server")}
+    assert "uvicorn" in modules
+    assert "typer" not in modules
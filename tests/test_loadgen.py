@@ -0,0 +1,79 @@
+from pathlib import Path
+
+from fdk_asgi.agent import FnRequest
+from fdk_asgi.cli import cli
+from fdk_asgi.loadgen import available_loops, available_protocols, benchmark_server
+from fdk_asgi.tuning import autotune
+from fdk_asgi.types import HTTPProtocolType, LoopSetupType
+from typer.testing import CliRunner
+
+
+def test_available_implementations() -> None:
+    assert LoopSetupType.asyncio in available_loops()
+    assert HTTPProtocolType.httptools in available_protocols()
+
+
+def test_benchmark_server() -> None:
+    report = benchmark_server(
+        "tests.conftest:app_factory",
+        [FnRequest.parse("GET /"), FnRequest.parse("GET /users/unknown")],
+        loop=LoopSetupType.asyncio,
+        http=HTTPProtocolType.httptools,
+        total=20,
+        concurrency=2,
+        warm_up=2,
+        env={"FDK_ASGI_FACTORY": "true"},
+    )
+    assert report.requests == 20
+    assert report.errors == 0
+    assert report.throughput > 0
+
+
+def test_autotune() -> None:
+    results = autotune(
+        "tests.conftest:app_factory",
+        [FnRequest.parse("GET /")],
+        total=10,
+        warm_up=2,
+        env={"FDK_ASGI_FACTORY": "true"},
+    )
+    assert len(results) == len(available_loops()) * len(available_protocols())
+    throughputs = [tuning.throughput for tuning, _ in results]
+    assert throughputs == sorted(throughputs, reverse=True)
+    assert all(report.errors == 0 for _, report in results)
+
+
+def test_benchmark_server_counts_errors_of_the_app() -> None:
+    report = benchmark_server(
+        "tests.conftest:app_factory",
+        [FnRequest.parse("GET /"), FnRequest.parse("GET /error")],
+        loop=LoopSetupType.asyncio,
+        http=HTTPProtocolType.httptools,
+        total=10,
+        env={"FDK_ASGI_FACTORY": "true"},
+    )
+    assert report.requests == 10
+    assert report.errors == 5
+    assert len(report.latencies) == 5
+
+
+def test_autotune_does_not_save_failing_combinations(tmp_path: Path) -> None:
+    tuning_file = tmp_path / "fdk-asgi-tuning.json"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "autotune",
+            "tests.conftest:app_factory",
+            "--factory",
+            "--request",
+            "GET /error",
+            "--requests",
+            "5",
+            "--warm-up",
+            "0",
+            "--tuning-file",
+            str(tuning_file),
+        ],
+    )
+    assert result.exit_code == 1
+    assert not tuning_file.exists()
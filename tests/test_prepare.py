@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from fdk_asgi.importtime import ImportRecord
+from fdk_asgi.preload import PreloadManifest, preload, preload_manifest
+from fdk_asgi.prepare import (
+    WarmUpRun,
+    build_manifest,
+    find_compile_roots,
+    is_stdlib,
+    warm_up,
+)
+
+APP_URI = "tests.conftest:app_factory"
+
+
+def test_build_manifest() -> None:
+    run = WarmUpRun(
+        records=[
+            ImportRecord("json.decoder", 1, 1, 1),
+            ImportRecord("json", 1, 2, 0),
+            ImportRecord("builtin", 1, 1, 0),
+        ],
+        module_files={"json": "json/__init__.py", "json.decoder": "json/decoder.py"},
+    )
+    manifest = build_manifest(APP_URI, run)
+    assert manifest.modules == ["json.decoder", "json"]
+
+
+def test_find_compile_roots(tmp_path: Path) -> None:
+    roots = find_compile_roots(
+        {
+            "pkg": str(tmp_path / "pkg" / "__init__.py"),
+            "pkg.sub": str(tmp_path / "pkg" / "sub" / "__init__.py"),
+            "pkg.sub.mod": str(tmp_path / "pkg" / "sub" / "mod.py"),
+            "mod": str(tmp_path / "mod.py"),
+            "ext": str(tmp_path / "ext.so"),
+            "builtin": None,
+            "json": json.__file__,
+        }
+    )
+    assert roots == [tmp_path.resolve() / "mod.py", tmp_path.resolve() / "pkg"]
+    assert is_stdlib(Path(json.__file__).parent)
+
+
+def test_preload(tmp_path: Path) -> None:
+    assert preload(["json", "fdk_asgi.does_not_exist"]) == 0
+
+    manifest_path = tmp_path / "manifest.json"
+    PreloadManifest(app=APP_URI, modules=["json"], python="2.7.18").dump(manifest_path)
+    preload_manifest(manifest_path)  # ignores manifests of other Python versions
+    preload_manifest(tmp_path / "missing.json")
+
+
+def test_warm_up(tmp_path: Path) -> None:
+    before = warm_up(APP_URI, factory=True)
+    assert "starlette.applications" in before.module_files
+    assert before.total_time > 0
+
+    manifest = build_manifest(APP_URI, before)
+    # dependencies come first
+    assert manifest.modules.index("starlette.routing") < manifest.modules.index(
+        "starlette.applications"
+    )
+    manifest_path = tmp_path / "manifest.json"
+    manifest.dump(manifest_path)
+    assert PreloadManifest.load(manifest_path) == manifest
+
+    after = warm_up(APP_URI, factory=True, manifest=manifest_path)
+    assert set(after.module_files).issuperset(manifest.modules)